@@ -1,5 +1,5 @@
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
@@ -7,64 +7,68 @@ import secrets
 
 from .models import User, RefreshToken, UserRole
 from .config import settings
+from .token_cache import token_cache
+from .token_denylist import token_denylist
+from .password_hasher import password_hasher
 from fastapi import HTTPException, status
 
 class AuthService:
-    """Servicio de autenticación para manejo de usuarios y tokens"""
-    
-    def __init__(self, db: Session):
-        self.db = db
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    """
+    Servicio de autenticación para manejo de usuarios y tokens.
+
+    Es un objeto ligero por petición: solo guarda la sesión de base de datos.
+    El hash y la verificación de contraseñas se hacen siempre en el pool de
+    bcrypt (ver password_hasher), nunca en el event loop.
+    """
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verificar contraseña"""
-        return self.pwd_context.verify(plain_password, hashed_password)
+    __slots__ = ("db",)
     
-    def get_password_hash(self, password: str) -> str:
-        """Generar hash de contraseña"""
-        return self.pwd_context.hash(password)
+    def __init__(self, db: AsyncSession):
+        self.db = db
     
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    async def get_user_by_username(self, username: str) -> Optional[User]:
         """Obtener usuario por nombre de usuario"""
-        return self.db.query(User).filter(User.username == username).first()
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
     
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    async def get_user_by_email(self, email: str) -> Optional[User]:
         """Obtener usuario por email"""
-        return self.db.query(User).filter(User.email == email).first()
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
     
-    def get_user_by_id(self, user_id: int) -> Optional[User]:
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Obtener usuario por ID"""
-        return self.db.query(User).filter(User.id == user_id).first()
+        return await self.db.get(User, user_id)
     
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
-        """Autenticar usuario con credenciales"""
-        user = self.get_user_by_username(username)
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        """Autenticar usuario con credenciales (bcrypt se verifica en el pool dedicado)"""
+        user = await self.get_user_by_username(username)
         if not user:
             return None
-        if not self.verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         if not user.is_active:
             return None
         
         # Actualizar último login
         user.last_login = datetime.utcnow()
-        self.db.commit()
+        await self.db.commit()
         
         return user
     
-    def create_user(self, username: str, email: str, password: str, 
+    async def create_user(self, username: str, email: str, password: str, 
                    full_name: Optional[str] = None, role: UserRole = UserRole.USER, 
                    is_active: bool = True) -> User:
         """Crear nuevo usuario"""
         # Verificar que no exista el usuario
-        if self.get_user_by_username(username):
+        if await self.get_user_by_username(username):
             raise ValueError("El nombre de usuario ya existe")
         
-        if self.get_user_by_email(email):
+        if await self.get_user_by_email(email):
             raise ValueError("El email ya está registrado")
         
         # Crear usuario
-        hashed_password = self.get_password_hash(password)
+        hashed_password = await password_hasher.hash(password)
         user = User(
             username=username,
             email=email,
@@ -75,8 +79,8 @@ class AuthService:
         )
         
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        await self.db.commit()
+        await self.db.refresh(user)
         
         return user
     
@@ -92,7 +96,7 @@ class AuthService:
                 detail="Acceso denegado. Se requieren privilegios de administrador"
             )
     
-    def get_current_user_from_token(self, token: str) -> Optional[User]:
+    async def get_current_user_from_token(self, token: str) -> Optional[User]:
         """Obtener usuario actual desde token JWT"""
         try:
             payload = self.verify_token(token)
@@ -103,7 +107,7 @@ class AuthService:
             if user_id is None:
                 return None
             
-            return self.get_user_by_id(user_id)
+            return await self.get_user_by_id(user_id)
         except Exception:
             return None
     
@@ -121,7 +125,7 @@ class AuthService:
         
         return encoded_jwt
     
-    def create_refresh_token(self, user_id: int) -> str:
+    async def create_refresh_token(self, user_id: int) -> str:
         """Crear token de refresh y guardarlo en la base de datos"""
         # Generar token único
         token_data = {
@@ -139,13 +143,13 @@ class AuthService:
         
         # Guardar en base de datos
         db_token = RefreshToken(
-            token=refresh_token,
+            token_hash=RefreshToken.hash_token(refresh_token),
             user_id=user_id,
             expires_at=expire
         )
         
         self.db.add(db_token)
-        self.db.commit()
+        await self.db.commit()
         
         return refresh_token
     
@@ -167,33 +171,86 @@ class AuthService:
             # Token inválido o expirado
             return None
     
-    def get_refresh_token(self, token: str) -> Optional[RefreshToken]:
+    async def get_refresh_token(self, token: str) -> Optional[RefreshToken]:
         """Obtener refresh token de la base de datos"""
-        return self.db.query(RefreshToken).filter(
-            RefreshToken.token == token,
+        result = await self.db.execute(select(RefreshToken).where(
+            RefreshToken.token_hash == RefreshToken.hash_token(token),
             RefreshToken.is_revoked == False
-        ).first()
+        ))
+        return result.scalars().first()
     
-    def revoke_refresh_token(self, token: str) -> bool:
+    async def revoke_refresh_token(self, token: str) -> bool:
         """Revocar refresh token"""
-        db_token = self.get_refresh_token(token)
+        db_token = await self.get_refresh_token(token)
         if db_token:
             db_token.is_revoked = True
-            self.db.commit()
+            await self.db.commit()
             return True
         return False
     
-    def revoke_all_user_tokens(self, user_id: int) -> int:
-        """Revocar todos los refresh tokens de un usuario"""
-        count = self.db.query(RefreshToken).filter(
+    async def _bump_token_generation(self, user_id: int) -> int:
+        """Incrementar la generación de tokens del usuario (sin commit). Devuelve la nueva"""
+        await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_generation=User.token_generation + 1, tokens_revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        generation = await self.db.scalar(select(User.token_generation).where(User.id == user_id))
+        return generation or 0
+    
+    def _forget_access_tokens(self, user_id: int, generation: int) -> None:
+        """Aplicar localmente una revocación ya confirmada en la base de datos"""
+        token_denylist.update(user_id, generation)
+        token_cache.invalidate_user(user_id)
+    
+    async def revoke_all_user_tokens(self, user_id: int) -> int:
+        """Revocar todos los refresh tokens de un usuario y sus access tokens emitidos"""
+        result = await self.db.execute(update(RefreshToken).where(
             RefreshToken.user_id == user_id,
             RefreshToken.is_revoked == False
-        ).update({"is_revoked": True})
+        ).values(is_revoked=True))
+        count = result.rowcount
+        
+        # Los access tokens emitidos con la generación anterior dejan de ser válidos
+        generation = await self._bump_token_generation(user_id)
         
-        self.db.commit()
+        await self.db.commit()
+        
+        self._forget_access_tokens(user_id, generation)
         return count
     
-    def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, str]]:
+    async def purge_refresh_tokens(self, batch_size: int) -> int:
+        """Eliminar un lote acotado de refresh tokens expirados o revocados"""
+        stale_ids = select(RefreshToken.id).where(or_(
+            RefreshToken.expires_at < datetime.utcnow(),
+            RefreshToken.is_revoked == True
+        )).limit(batch_size)
+        
+        result = await self.db.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.id.in_(stale_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return result.rowcount
+    
+    async def set_user_active(self, user_id: int, is_active: bool) -> Optional[User]:
+        """Activar o desactivar un usuario"""
+        user = await self.get_user_by_id(user_id)
+        if not user:
+            return None
+        
+        user.is_active = is_active
+        generation = await self._bump_token_generation(user_id) if not is_active else None
+        await self.db.commit()
+        
+        if generation is not None:
+            self._forget_access_tokens(user_id, generation)
+        
+        return user
+    
+    async def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, str]]:
         """Generar nuevo access token usando refresh token"""
         # Verificar refresh token
         payload = self.verify_token(refresh_token, "refresh")
@@ -201,21 +258,23 @@ class AuthService:
             return None
         
         # Verificar que existe en la base de datos y no está revocado
-        db_token = self.get_refresh_token(refresh_token)
+        db_token = await self.get_refresh_token(refresh_token)
         if not db_token or not db_token.is_valid():
             return None
         
         # Obtener usuario
-        user = self.get_user_by_id(payload["user_id"])
+        user = await self.get_user_by_id(payload["user_id"])
         if not user or not user.is_active:
             return None
         
         # Revocar el refresh token actual
-        self.revoke_refresh_token(refresh_token)
+        await self.revoke_refresh_token(refresh_token)
         
         # Crear nuevos tokens
-        access_token = self.create_access_token(data={"sub": user.username, "user_id": user.id})
-        new_refresh_token = self.create_refresh_token(user.id)
+        access_token = self.create_access_token(
+            data={"sub": user.username, "user_id": user.id, "gen": user.token_generation}
+        )
+        new_refresh_token = await self.create_refresh_token(user.id)
         
         return {
             "access_token": access_token,
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tareas únicas de la base de datos, fuera del arranque de los workers.
+
+Uso:
+  python -m app.cli init-db [--seed]   # Migraciones, tablas y marcador de esquema
+  python -m app.cli seed               # Usuario de prueba (admin / admin123)
+  python -m app.cli check              # Código de salida 1 si el esquema no está al día
+
+Se ejecuta init-db una vez antes de iniciar los workers de uvicorn (la
+imagen Docker lo hace en su comando de inicio), de modo que ningún worker
+migre ni calcule hashes bcrypt al arrancar.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from .database import SCHEMA_VERSION, init_db, get_schema_version, create_test_user, engine
+from .password_hasher import password_hasher
+
+async def _seed() -> None:
+    password_hasher.start()
+    try:
+        await create_test_user()
+    finally:
+        password_hasher.shutdown()
+
+async def _run(args: argparse.Namespace) -> int:
+    try:
+        if args.command == "init-db":
+            await init_db()
+            if args.seed:
+                await _seed()
+        elif args.command == "seed":
+            await _seed()
+        elif args.command == "check":
+            version = await get_schema_version()
+            print(f"Esquema de la base de datos: {f'v{version}' if version is not None else 'sin marcador'} "
+                  f"(se espera v{SCHEMA_VERSION})")
+            if version is None or version < SCHEMA_VERSION:
+                return 1
+        return 0
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Tareas de la base de datos de Atom OCR AI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    init_parser = subparsers.add_parser("init-db", help="Aplicar migraciones y registrar la versión del esquema")
+    init_parser.add_argument("--seed", action="store_true", help="Crear también el usuario de prueba")
+    subparsers.add_parser("seed", help="Crear el usuario de prueba si no existe")
+    subparsers.add_parser("check", help="Comprobar que el esquema está al día")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(_run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,22 @@ class Settings(BaseSettings):
     
     # Configuración de la base de datos
     database_url: str = "sqlite:///./atom_ocr_ai.db"
+    db_profile: str = "development"  # "development" o "production"
+    sql_echo: Optional[bool] = None  # None = según DEBUG en desarrollo, siempre apagado en producción
+    
+    # Pool de conexiones (perfil de producción)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    
+    # Arranque de los workers: con el marcador de esquema al día no se migra ni se crea el usuario de prueba
+    db_auto_migrate: bool = False  # True = el worker migra al arrancar (desarrollo con un solo worker)
+    
+    # PRAGMAs de SQLite (perfil de producción)
+    sqlite_mmap_size: int = 268435456  # 256 MB
+    sqlite_cache_size: int = -65536  # Negativo = KiB (64 MB)
+    sqlite_busy_timeout_ms: int = 5000
     
     # Configuración JWT
     secret_key: str = "your-secret-key-change-in-production"
@@ -14,6 +30,26 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 1440  # 24 horas para facilitar pruebas
     refresh_token_expire_days: int = 30  # 30 días
     
+    # Limpieza periódica de refresh tokens expirados o revocados
+    refresh_token_sweep_interval_seconds: int = 3600  # 0 = deshabilitada
+    refresh_token_sweep_batch_size: int = 500
+    
+    # Caché en proceso de tokens de acceso verificados
+    token_cache_enabled: bool = True
+    token_cache_max_size: int = 10000
+    token_cache_ttl_seconds: int = 300  # Máximo tiempo que una entrada puede vivir aunque el token siga vigente
+    
+    # Revocación de access tokens por generación (sincronización incremental entre workers)
+    token_revocation_sync_seconds: float = 5.0
+    
+    # Métricas en formato Prometheus (GET /metrics)
+    metrics_enabled: bool = True
+    
+    # Sonda de disponibilidad (GET /ready); por encima de estos límites responde 503
+    ready_db_timeout_seconds: float = 2.0  # Tiempo máximo del SELECT 1, incluida la espera del pool
+    ready_db_max_latency_ms: float = 500.0
+    ready_extraction_max_queue: int = 64  # Imágenes esperando un worker de extracción
+    
     # Configuración de la aplicación
     app_name: str = "Atom OCR AI"
     debug: bool = True
@@ -21,6 +57,42 @@ class Settings(BaseSettings):
     # Configuración de seguridad
     bcrypt_rounds: int = 12
     
+    # Pool de hashing de contraseñas (bcrypt fuera del event loop)
+    password_hash_executor: str = "thread"  # "thread" o "process"
+    password_hash_workers: int = 0  # 0 = número de CPUs
+    password_hash_max_queue: int = 64  # Operaciones en espera antes de responder 503
+    
+    # Extracción de QR por lote
+    extraction_workers: int = 0  # 0 = número de CPUs
+    extraction_max_files: int = 500
+    extraction_max_image_bytes: int = 15 * 1024 * 1024  # 15 MB por imagen
+    extraction_max_batch_bytes: int = 200 * 1024 * 1024  # Total del lote (imágenes ya extraídas de los zips)
+    extraction_strategy_stats_path: Optional[str] = None  # Histograma de estrategias generado con el CLI
+    extraction_mask_dir: Optional[str] = None  # None = samples/mask/editables
+    extraction_localize: bool = True  # Ubicar el QR por sus patrones de posición antes de las regiones fijas
+    extraction_skip_unlocated: bool = False  # Omitir las regiones fijas si no se ubica ningún QR
+    extraction_pyramid: bool = True  # Intentar primero versiones reducidas de las imágenes grandes
+    extraction_timings: bool = False  # Tiempos por etapa en cada resultado (ver stage_timings.py)
+    
+    # API de visión usada como último recurso en la extracción
+    openai_api_key: Optional[str] = None
+    vision_api_base_url: Optional[str] = None  # None = OPENAI_BASE_URL o api.openai.com
+    vision_api_max_concurrency: int = 8
+    vision_api_rate_per_second: float = 5.0
+    vision_api_timeout_seconds: float = 30.0
+    vision_api_max_retries: int = 3
+    vision_api_batch_size: int = 4  # Imágenes por solicitud; 1 = sin agrupar
+    vision_api_batch_wait_ms: float = 250.0
+    vision_api_image_detail: str = "low"  # Las regiones se envían de 512 px o menos (un bloque)
+    extraction_api_budget_usd: Optional[float] = 1.0  # Costo máximo de API por lote; None = sin límite
+    
+    # Caché de resultados de extracción por contenido de la imagen
+    extraction_cache_enabled: bool = True
+    extraction_cache_path: Optional[str] = None  # Archivo SQLite compartido; None = solo en memoria
+    extraction_cache_ttl_seconds: int = 30 * 24 * 3600
+    extraction_cache_max_entries: int = 100000
+    extraction_cache_memory_entries: int = 10000  # Por proceso worker
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
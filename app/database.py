@@ -1,36 +1,190 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.declarative import declarative_base
-from typing import Generator
+from sqlalchemy import event, inspect, text, select, delete, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import AsyncGenerator, Dict, Any, Optional
 import os
 
 from .config import settings
-from .models import Base
+from .metrics import timed_pool_class, instrument_engine
+from .models import Base, RefreshToken, SchemaVersion
 
-# Crear el motor de base de datos
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    echo=settings.debug  # Mostrar queries SQL en modo debug
-)
+# Versión del esquema que espera este código. Incrementar al cambiar los
+# modelos o _migrate_schema para que los workers (o el CLI) vuelvan a migrar.
+SCHEMA_VERSION = 2
 
-# Crear la sesión de base de datos
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _is_sqlite(url: str) -> bool:
+    """Indica si la URL apunta a SQLite"""
+    return url.startswith("sqlite")
 
-def init_db():
-    """Inicializar la base de datos creando todas las tablas"""
-    Base.metadata.create_all(bind=engine)
-    print("Base de datos inicializada correctamente")
+def _is_sqlite_memory(url: str) -> bool:
+    """Indica si la URL es una base SQLite en memoria"""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
 
-def get_db() -> Generator[Session, None, None]:
-    """Dependencia para obtener una sesión de base de datos"""
-    db = SessionLocal()
+def _async_url(url: str) -> str:
+    """Convertir DATABASE_URL al driver asíncrono (aiosqlite o asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return url
+    
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+def _engine_options() -> Dict[str, Any]:
+    """Opciones de create_engine según el perfil configurado (DB_PROFILE)"""
+    production = settings.db_profile == "production"
+    
+    # En producción nunca se imprimen las queries; en desarrollo depende de DEBUG
+    echo = settings.sql_echo if settings.sql_echo is not None else settings.debug
+    options: Dict[str, Any] = {"echo": echo and not production}
+    
+    if _is_sqlite(settings.database_url):
+        options["connect_args"] = {"check_same_thread": False}
+    
+    if production and not _is_sqlite_memory(settings.database_url):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=not _is_sqlite(settings.database_url),
+        )
+    
+    if settings.metrics_enabled:
+        # Misma clase de pool (la del perfil o la del dialecto), midiendo la espera de checkout
+        url = make_url(_async_url(settings.database_url))
+        options["poolclass"] = timed_pool_class(options.get("poolclass") or url.get_dialect().get_pool_class(url))
+    
+    return options
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    PRAGMAs de producción para SQLite, aplicados a cada conexión nueva.
+    
+    WAL permite lecturas concurrentes mientras se escriben last_login y
+    refresh tokens; synchronous=NORMAL es seguro con WAL y evita un fsync
+    por commit.
+    """
+    cursor = dbapi_connection.cursor()
     try:
-        yield db
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
     finally:
-        db.close()
+        cursor.close()
+
+# Crear el motor de base de datos (asíncrono)
+engine = create_async_engine(_async_url(settings.database_url), **_engine_options())
+
+if settings.db_profile == "production" and _is_sqlite(settings.database_url) \
+        and not _is_sqlite_memory(settings.database_url):
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+if settings.metrics_enabled:
+    instrument_engine(engine.sync_engine)
+
+# Crear la sesión de base de datos. Sin expire_on_commit los objetos siguen
+# siendo legibles tras el commit sin una nueva consulta implícita.
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def _migrate_schema(connection) -> None:
+    """
+    Migraciones ligeras sobre bases de datos creadas con esquemas anteriores.
+    
+    - refresh_tokens guardaba el JWT completo en la columna token; ahora se
+      guarda token_hash. Los refresh tokens son desechables: la tabla se
+      recrea y los usuarios solo deben volver a iniciar sesión.
+    - users gana token_generation y tokens_revoked_at para la revocación de
+      access tokens.
+    - clients: el índice del listado por cursor sigue su orden (created_at,
+      id); create_all no agrega índices a tablas existentes.
+    """
+    inspector = inspect(connection)
+    
+    if inspector.has_table("refresh_tokens"):
+        columns = {column["name"] for column in inspector.get_columns("refresh_tokens")}
+        if "token_hash" not in columns:
+            RefreshToken.__table__.drop(connection)
+            print("Tabla refresh_tokens migrada a token_hash (tokens anteriores descartados)")
+    
+    if inspector.has_table("users"):
+        columns = {column["name"] for column in inspector.get_columns("users")}
+        if "token_generation" not in columns:
+            connection.execute(text("ALTER TABLE users ADD COLUMN token_generation INTEGER NOT NULL DEFAULT 0"))
+        if "tokens_revoked_at" not in columns:
+            connection.execute(text("ALTER TABLE users ADD COLUMN tokens_revoked_at TIMESTAMP"))
+            connection.execute(text("CREATE INDEX ix_users_tokens_revoked_at ON users (tokens_revoked_at)"))
+    
+    if inspector.has_table("clients"):
+        connection.execute(text("DROP INDEX IF EXISTS ix_clients_user_active_id"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_clients_user_active_created "
+            "ON clients (user_id, is_active, created_at, id)"
+        ))
+
+def _stamp_schema(connection) -> None:
+    """Registrar SCHEMA_VERSION en el marcador"""
+    connection.execute(delete(SchemaVersion))
+    connection.execute(insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION))
+
+async def init_db():
+    """Inicializar la base de datos: migraciones, creación de tablas y marcador de versión"""
+    async with engine.begin() as conn:
+        await conn.run_sync(_migrate_schema)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_stamp_schema)
+    print(f"Base de datos inicializada correctamente (esquema v{SCHEMA_VERSION})")
+
+async def get_schema_version() -> Optional[int]:
+    """Versión registrada en la base de datos; None si aún no existe el marcador"""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1))
+        except DBAPIError:
+            # Base de datos nueva o creada antes del marcador
+            return None
+        return result.scalar_one_or_none()
+
+async def ensure_schema() -> bool:
+    """
+    Comprobación del esquema al arrancar un worker.
+    
+    Con el marcador al día basta una consulta por clave primaria: no se
+    inspeccionan las tablas ni se ejecuta create_all. Si falta o es anterior
+    a SCHEMA_VERSION se migra con init_db() (DB_AUTO_MIGRATE) o se aborta el
+    arranque pidiendo ejecutar el CLI. Devuelve True si migró.
+    """
+    version = await get_schema_version()
+    if version == SCHEMA_VERSION:
+        return False
+    if version is not None and version > SCHEMA_VERSION:
+        # Despliegue gradual: la base ya fue migrada por una versión más nueva
+        print(f"Esquema de la base de datos v{version} más nuevo que el esperado (v{SCHEMA_VERSION})")
+        return False
+    if not settings.db_auto_migrate:
+        found = f"v{version}" if version is not None else "sin marcador"
+        raise RuntimeError(
+            f"Esquema de la base de datos desactualizado ({found}, se espera v{SCHEMA_VERSION}); "
+            "ejecutar `python -m app.cli init-db` antes de iniciar los workers"
+        )
+    await init_db()
+    return True
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependencia para obtener una sesión de base de datos"""
+    async with SessionLocal() as db:
+        yield db
 
-def create_test_user():
+async def create_test_user():
     """Crear un usuario de prueba para desarrollo"""
     from .auth_service import AuthService
     from .models import UserRole
@@ -40,10 +194,10 @@ def create_test_user():
         auth_service = AuthService(db)
         
         # Verificar si ya existe el usuario de prueba
-        existing_user = auth_service.get_user_by_username("admin")
+        existing_user = await auth_service.get_user_by_username("admin")
         if not existing_user:
             # Crear usuario administrador de prueba
-            user = auth_service.create_user(
+            user = await auth_service.create_user(
                 username="admin",
                 email="admin@atomocr.ai",
                 password="admin123",
@@ -58,4 +212,4 @@ def create_test_user():
     except Exception as e:
         print(f"Error al crear usuario de prueba: {e}")
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
\ No newline at end of file
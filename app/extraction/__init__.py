@@ -0,0 +1 @@
+# Paquete de extracción de códigos QR
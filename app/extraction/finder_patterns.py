@@ -0,0 +1,245 @@
+"""
+Búsqueda de los patrones de posición (finder patterns) de un código QR.
+
+Cada esquina del QR tiene un cuadrado oscuro de 7x7 módulos con un hueco
+claro de 5x5 y un centro oscuro de 3x3. En la jerarquía de contornos de la
+imagen binarizada aparece como un contorno con nieto casi cuadrado y
+concéntrico, lo que permite ubicar el QR y estimar el tamaño del módulo sin
+decodificarlo.
+
+localize() busca los QR de una imagen completa una sola vez (sobre una
+versión reducida si es grande) y QRLocation.rectify() devuelve cada uno
+enderezado, de frente y con zona de silencio, listo para el decodificador.
+"""
+
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Optional, Tuple, List
+
+import cv2
+import numpy as np
+
+Rect = Tuple[int, int, int, int]  # (y0, y1, x0, x1), como en strategies.py
+
+# Ventana del umbral adaptativo, como fracción del lado mayor de la imagen
+THRESHOLD_WINDOW = 0.15
+
+# Módulos que mide un patrón de posición por lado
+FINDER_MODULES = 7
+
+# Tamaño mínimo de un patrón, en px por lado
+MIN_FINDER_SIZE = 9
+
+# Proporción área(centro) / área(patrón): 9/49 en un patrón ideal
+MIN_CENTER_RATIO = 0.08
+MAX_CENTER_RATIO = 0.40
+
+# Relación de aspecto máxima del rectángulo de un patrón
+MAX_FINDER_ASPECT = 1.5
+
+# Diferencia de tamaño tolerada entre los tres patrones de un mismo QR
+MAX_SIZE_SPREAD = 0.45
+
+# Tolerancia del ángulo recto entre los tres patrones (coseno)
+MAX_CORNER_COS = 0.35
+
+# Candidatos (los más grandes) que se combinan al buscar el trío del QR
+MAX_CANDIDATES = 8
+
+# Lado mayor de la imagen sobre la que se buscan los QR en localize()
+LOCATE_MAX_SIDE = 1024
+
+# Ventana del umbral en localize(): del orden de un patrón de posición, no de
+# la imagen completa (con ventanas grandes el texto se funde con los patrones)
+LOCATE_WINDOW = 31
+
+# QR ubicados por imagen que se intentan decodificar
+MAX_LOCATIONS = 3
+
+# Resolución del QR enderezado
+RECTIFY_MODULE_PX = 6
+RECTIFY_QUIET_ZONE = 4
+
+@dataclass(frozen=True)
+class FinderPattern:
+    """Patrón de posición: centro y lado en px"""
+    x: float
+    y: float
+    size: float
+
+    @property
+    def module(self) -> float:
+        return self.size / FINDER_MODULES
+
+@dataclass(frozen=True)
+class QRLocation:
+    """Tres patrones de un QR; corner es el de la esquina del ángulo recto"""
+    corner: FinderPattern
+    first: FinderPattern
+    second: FinderPattern
+
+    @property
+    def module(self) -> float:
+        """Tamaño promedio del módulo en px"""
+        return (self.corner.module + self.first.module + self.second.module) / 3
+
+    def corners(self) -> np.ndarray:
+        """Centros de los cuatro patrones (el cuarto se deduce del paralelogramo)"""
+        fourth = (self.first.x + self.second.x - self.corner.x, self.first.y + self.second.y - self.corner.y)
+        return np.array([
+            (self.corner.x, self.corner.y),
+            (self.first.x, self.first.y),
+            fourth,
+            (self.second.x, self.second.y),
+        ], dtype=np.float32)
+
+    def bounding_rect(self, height: int, width: int, margin_modules: float = 4) -> Rect:
+        """Rectángulo (y0, y1, x0, x1) que contiene el QR más la zona de silencio"""
+        points = self.corners()
+        # Del centro de un patrón al borde del QR hay 3.5 módulos
+        pad = (FINDER_MODULES / 2 + margin_modules) * self.module
+        x0, y0 = points.min(axis=0) - pad
+        x1, y1 = points.max(axis=0) + pad
+        return (
+            max(0, int(y0)),
+            min(height, int(np.ceil(y1))),
+            max(0, int(x0)),
+            min(width, int(np.ceil(x1))),
+        )
+
+    def scaled(self, factor: float) -> "QRLocation":
+        """La misma ubicación en una imagen factor veces más grande"""
+        return QRLocation(*(
+            FinderPattern(p.x * factor, p.y * factor, p.size * factor)
+            for p in (self.corner, self.first, self.second)
+        ))
+
+    def rectify(self, gray: np.ndarray, module_px: int = RECTIFY_MODULE_PX,
+                quiet_zone: int = RECTIFY_QUIET_ZONE) -> np.ndarray:
+        """
+        QR enderezado (transformación afín de los tres patrones a sus
+        posiciones nominales), a module_px px por módulo y con zona de silencio.
+        """
+        corner, right, down = self.corner, self.first, self.second
+        # En coordenadas de imagen (y hacia abajo) el patrón derecho va antes
+        # que el inferior en sentido horario
+        if (right.x - corner.x) * (down.y - corner.y) - (right.y - corner.y) * (down.x - corner.x) < 0:
+            right, down = down, right
+
+        # Versión del QR (17 + 4v módulos por lado) según la distancia entre patrones
+        distance = (np.hypot(right.x - corner.x, right.y - corner.y) +
+                    np.hypot(down.x - corner.x, down.y - corner.y)) / 2
+        version = max(1, round((distance / self.module + FINDER_MODULES - 17) / 4))
+        modules = 17 + 4 * version
+
+        near = FINDER_MODULES / 2 + quiet_zone
+        far = modules - FINDER_MODULES / 2 + quiet_zone
+        source = np.float32([(corner.x, corner.y), (right.x, right.y), (down.x, down.y)])
+        target = np.float32([(near, near), (far, near), (near, far)]) * module_px
+        size = int((modules + 2 * quiet_zone) * module_px)
+        return cv2.warpAffine(gray, cv2.getAffineTransform(source, target), (size, size),
+                              flags=cv2.INTER_LINEAR, borderValue=255)
+
+def binarize(gray: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+    """
+    Umbral adaptativo (módulos oscuros en 0, fondo en 255). Con un umbral
+    global (Otsu) los reflejos y sombras de las fotos borran patrones enteros.
+    La ventana por defecto es proporcional a la imagen (para regiones ya
+    recortadas alrededor del QR).
+    """
+    if window is None:
+        window = int(max(gray.shape[:2]) * THRESHOLD_WINDOW)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                 max(11, window) | 1, 5)
+
+def find_finder_patterns(binary: np.ndarray) -> List[FinderPattern]:
+    """Patrones de posición de una imagen binarizada, del más grande al más pequeño"""
+    contours, hierarchy = cv2.findContours(255 - binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+
+    patterns = []
+    for index, contour in enumerate(contours):
+        child = hierarchy[index][2]
+        if child < 0:
+            continue
+        grandchild = hierarchy[child][2]
+        if grandchild < 0:
+            continue
+
+        x, y, w, h = cv2.boundingRect(contour)
+        if min(w, h) < MIN_FINDER_SIZE or max(w, h) > MAX_FINDER_ASPECT * min(w, h):
+            continue
+
+        area = cv2.contourArea(contour)
+        center_area = cv2.contourArea(contours[grandchild])
+        if area <= 0 or not MIN_CENTER_RATIO <= center_area / area <= MAX_CENTER_RATIO:
+            continue
+
+        # El centro debe estar en el medio del patrón
+        cx, cy, cw, ch = cv2.boundingRect(contours[grandchild])
+        if abs((cx + cw / 2) - (x + w / 2)) > w / 4 or abs((cy + ch / 2) - (y + h / 2)) > h / 4:
+            continue
+
+        patterns.append(FinderPattern(x + w / 2, y + h / 2, (w + h) / 2))
+
+    patterns.sort(key=lambda p: p.size, reverse=True)
+    return patterns
+
+def _as_location(a: FinderPattern, b: FinderPattern, c: FinderPattern) -> Optional[QRLocation]:
+    """Trío de patrones si forman una escuadra; la esquina es la opuesta al lado más largo"""
+    sizes = (a.size, b.size, c.size)
+    if max(sizes) - min(sizes) > MAX_SIZE_SPREAD * max(sizes):
+        return None
+
+    trio = (a, b, c)
+    best = None
+    for corner in trio:
+        first, second = (p for p in trio if p is not corner)
+        v1 = np.array((first.x - corner.x, first.y - corner.y))
+        v2 = np.array((second.x - corner.x, second.y - corner.y))
+        n1, n2 = np.linalg.norm(v1), np.linalg.norm(v2)
+        # Los patrones de un QR están separados al menos por su propio tamaño
+        if min(n1, n2) < corner.size or max(n1, n2) > 1.5 * min(n1, n2):
+            continue
+        cos = abs(float(v1 @ v2) / (n1 * n2))
+        if cos <= MAX_CORNER_COS and (best is None or cos < best[0]):
+            best = (cos, QRLocation(corner, first, second))
+    return best[1] if best else None
+
+def locate_all(patterns: List[FinderPattern], limit: int = MAX_LOCATIONS) -> List[QRLocation]:
+    """Tríos de patrones que forman un QR, empezando por los más grandes"""
+    locations = []
+    for trio in combinations(patterns[:MAX_CANDIDATES], 3):
+        location = _as_location(*trio)
+        if location is not None:
+            locations.append(location)
+            if len(locations) >= limit:
+                break
+    return locations
+
+def locate_qr(binary: np.ndarray, patterns: Optional[List[FinderPattern]] = None) -> Optional[QRLocation]:
+    """Ubicación del QR más grande de la imagen binarizada (o de patrones ya buscados), o None"""
+    if patterns is None:
+        patterns = find_finder_patterns(binary)
+    locations = locate_all(patterns, limit=1)
+    return locations[0] if locations else None
+
+def localize(gray: np.ndarray, max_side: int = LOCATE_MAX_SIDE,
+             limit: int = MAX_LOCATIONS) -> List[QRLocation]:
+    """
+    QR candidatos de una imagen completa en escala de grises, en coordenadas
+    de la imagen original. La búsqueda se hace sobre una copia reducida a
+    max_side px si la imagen es mayor.
+    """
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    small = gray
+    if scale < 1:
+        size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    locations = locate_all(find_finder_patterns(binarize(small, LOCATE_WINDOW)), limit)
+    if scale < 1:
+        locations = [location.scaled(1 / scale) for location in locations]
+    return locations
@@ -0,0 +1,1130 @@
+#!/usr/bin/env python3
+"""
+QR Extractor Pro - Sistema avanzado de extracción de códigos QR
+Soporte para múltiples estrategias de detección y procesamiento masivo
+"""
+
+import os
+import sys
+import json
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional, Tuple, Dict, List, Any, Iterator, Iterable, Set, Union, Callable
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+from .result_cache import ResultCache
+from .region_encoding import encode_region
+from .stage_timings import (
+    StageTimer, STAGES, ATTEMPT_BUCKETS, new_histogram, record_timings, merge_timings, histogram_quantile
+)
+from .vision_client import VisionClient, BackgroundVisionClient, VisionAnswer, CostBudget
+from .templates import TemplateRegistry, get_template_registry, DEFAULT_MASK_DIR
+from .strategies import (
+    StrategyEngine, StrategyHistogram, ImagePlanes, PYRAMID_SCALES, crop, to_gray, enhance_gray,
+    template_from_path, rect_exact, rect_right, rect_right_top, rect_right_bottom, rect_center_right
+)
+
+# Cargar variables de entorno
+load_dotenv()
+
+DEFAULT_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+
+# Imágenes por tarea enviada al pool de procesos
+DEFAULT_CHUNK_SIZE = 16
+
+# Respuestas de la API pendientes antes de esperar la más antigua (mantiene el orden acotado)
+MAX_PENDING_FALLBACKS = 64
+
+# Archivos leídos por adelantado (en un hilo) mientras se decodifica el actual
+PREFETCH_DEPTH = 8
+
+# Extractor propio de cada proceso worker de process_directory
+_worker_extractor: Optional["QRExtractorPro"] = None
+
+def _init_directory_worker(api_key: Optional[str], debug: bool, prune_overlap_ratio: Optional[float],
+                           strategy_stats: Optional[StrategyHistogram], mask_dir: Optional[str],
+                           cache_options: Optional[Dict[str, Any]], localize: bool, skip_unlocated: bool,
+                           pyramid: bool, timings: bool) -> None:
+    """Crear el extractor del proceso worker una sola vez"""
+    global _worker_extractor
+    # El paralelismo lo dan los procesos; se evita sobresuscribir núcleos con los hilos de OpenCV
+    cv2.setNumThreads(1)
+    _worker_extractor = QRExtractorPro(
+        api_key=api_key, debug=debug, prune_overlap_ratio=prune_overlap_ratio, mask_dir=mask_dir,
+        cache=ResultCache(**cache_options) if cache_options is not None else None,
+        localize=localize,
+        skip_unlocated=skip_unlocated,
+        pyramid=pyramid,
+        timings=timings
+    )
+    if strategy_stats is not None:
+        _worker_extractor.set_histogram(strategy_stats)
+
+def read_ahead(image_paths: Iterable[str], depth: int = PREFETCH_DEPTH
+               ) -> Iterator[Tuple[str, Union[bytes, OSError]]]:
+    """
+    Leer los archivos en un hilo con una cola acotada a depth archivos, de
+    modo que la lectura de disco se solapa con la decodificación sin cargar
+    el directorio completo en memoria. Emite (ruta, bytes) o (ruta, OSError).
+    """
+    files: "queue.Queue[Optional[Tuple[str, Union[bytes, OSError]]]]" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    failure: List[BaseException] = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                files.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader() -> None:
+        try:
+            for image_path in image_paths:
+                try:
+                    with open(image_path, 'rb') as f:
+                        item = (image_path, f.read())
+                except OSError as e:
+                    item = (image_path, e)
+                if not put(item):
+                    return
+        except BaseException as e:
+            # p. ej. un error del iterador de rutas: se relanza en el consumidor
+            failure.append(e)
+        finally:
+            put(None)
+
+    thread = threading.Thread(target=reader, name="qr-read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = files.get()
+            if item is None:
+                if failure:
+                    raise failure[0]
+                return
+            yield item
+    finally:
+        # El consumidor dejó de iterar (o terminó): liberar al hilo lector
+        stop.set()
+        thread.join()
+
+def _process_chunk(image_paths: List[str], template: Optional[str]
+                   ) -> Tuple[List[Dict[str, Any]], Dict[str, Any], StrategyHistogram]:
+    """
+    Procesar un bloque de imágenes dentro de un worker.
+
+    Devuelve los resultados del bloque, las estadísticas y lo aprendido por
+    el histograma de estrategias solo en ese bloque, que el proceso principal
+    suma a lo suyo.
+    """
+    extractor = _worker_extractor
+    extractor.stats = QRExtractorPro.new_stats()
+    histogram_before = extractor.histogram.copy()
+
+    results = []
+    for image_path, data in read_ahead(image_paths):
+        result = extractor.process_file(image_path, data, template, defer_api=True)
+        # Los resultados que esperan la API se cuentan al completarse en el proceso principal
+        if '_fallback' not in result:
+            extractor.update_stats(result)
+        results.append(result)
+
+    return results, extractor.stats, extractor.histogram.difference(histogram_before)
+
+class QRExtractorPro:
+    """Extractor avanzado de códigos QR con múltiples estrategias"""
+
+    def __init__(self, api_key: Optional[str] = None, debug: bool = False,
+                 prune_overlap_ratio: Optional[float] = None,
+                 strategy_stats_path: Optional[str] = None,
+                 mask_dir: Optional[str] = None,
+                 cache: Optional[ResultCache] = None,
+                 vision: Optional[BackgroundVisionClient] = None,
+                 api_budget: Optional[float] = None,
+                 localize: bool = True,
+                 skip_unlocated: bool = False,
+                 pyramid: bool = True,
+                 timings: bool = False):
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.debug = debug
+        self.stats = self.new_stats()
+        self.prune_overlap_ratio = prune_overlap_ratio
+        self.localize = localize
+        self.skip_unlocated = skip_unlocated
+        self.pyramid = pyramid
+        # Tiempos por etapa en cada resultado (ver stage_timings.py)
+        self.timings = timings
+
+        # Histograma de éxito por plantilla: ordena las estrategias y se
+        # persiste en strategy_stats_path (o QR_STRATEGY_STATS) si se indica
+        self.strategy_stats_path = strategy_stats_path or os.getenv('QR_STRATEGY_STATS')
+        self.histogram = (
+            StrategyHistogram.load(self.strategy_stats_path) if self.strategy_stats_path
+            else StrategyHistogram()
+        )
+
+        # Plantillas de samples/mask/editables (o QR_MASK_DIR): recorte directo del QR
+        self.mask_dir = mask_dir or os.getenv('QR_MASK_DIR') or str(DEFAULT_MASK_DIR)
+        self.templates: TemplateRegistry = get_template_registry(self.mask_dir)
+
+        # Caché de resultados por contenido (None = deshabilitada)
+        self.cache = cache
+
+        # Cliente de la API de visión (se crea al primer uso) y presupuesto de la ejecución
+        self._vision = vision
+        self.budget = CostBudget(api_budget)
+
+        self.engine = StrategyEngine(
+            self.is_valid_ine_qr,
+            templates=self.templates,
+            prune_overlap_ratio=prune_overlap_ratio,
+            on_region=self._save_debug_region if debug else None,
+            log=self.log_debug,
+            histogram=self.histogram,
+            localize=localize,
+            skip_unlocated=skip_unlocated,
+            pyramid=PYRAMID_SCALES if pyramid else ()
+        )
+
+    @property
+    def vision(self) -> BackgroundVisionClient:
+        """Cliente de la API compartido por todas las llamadas de este extractor"""
+        if self._vision is None:
+            self._vision = BackgroundVisionClient(VisionClient(self.api_key))
+        return self._vision
+
+    def close(self) -> None:
+        """Cerrar el pool de conexiones de la API si se creó"""
+        if self._vision is not None:
+            self._vision.close()
+
+    def set_histogram(self, histogram: StrategyHistogram) -> None:
+        """Reemplazar el histograma de estrategias (p. ej. el recibido por un worker)"""
+        self.histogram = histogram
+        self.engine.histogram = histogram
+
+    def save_strategy_stats(self) -> Optional[str]:
+        """Persistir el histograma de estrategias si hay un archivo configurado"""
+        if not self.strategy_stats_path:
+            return None
+        self.histogram.save(self.strategy_stats_path)
+        return self.strategy_stats_path
+
+    @staticmethod
+    def new_stats() -> Dict[str, Any]:
+        """Estadísticas vacías"""
+        return {
+            'total_processed': 0,
+            'successful': 0,
+            'failed': 0,
+            'total_tokens': 0,
+            'total_cost': 0.0,
+            'decode_passes': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'api_calls': 0,
+            'api_bytes': 0,
+            'api_latency_ms': 0,
+            'methods_used': {},
+            # Histogramas de los tiempos por etapa (solo con timings)
+            'tiempos_ms': {},
+            'decodificacion_ms': {},
+            'intentos_decodificacion': new_histogram(ATTEMPT_BUCKETS)
+        }
+
+    def log_debug(self, message: str) -> None:
+        """Registra mensajes de debug si está habilitado"""
+        if self.debug:
+            print(f"[DEBUG] {message}")
+
+    def save_debug_image(self, image: np.ndarray, filename: str) -> None:
+        """Guarda imagen de debug si está habilitado"""
+        if self.debug:
+            debug_dir = Path("debug_regions")
+            debug_dir.mkdir(exist_ok=True)
+            cv2.imwrite(str(debug_dir / filename), image)
+
+    def _save_debug_region(self, method_name: str, region: np.ndarray) -> None:
+        """Guarda la región que intenta una estrategia"""
+        self.save_debug_image(region, f"{method_name}.png")
+
+    def enhance_image(self, image: np.ndarray) -> np.ndarray:
+        """Mejora la imagen para mejor detección de QR"""
+        return enhance_gray(to_gray(image))
+
+    def extract_region_full(self, image: np.ndarray) -> np.ndarray:
+        """Extrae la imagen completa"""
+        return image
+
+    def extract_region_exact(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Extrae región exacta del QR (560px-723px, altura completa)"""
+        rect = rect_exact(*image.shape[:2])
+        return crop(image, rect) if rect else None
+
+    def extract_region_right(self, image: np.ndarray) -> np.ndarray:
+        """Extrae región derecha (70% del ancho hacia la derecha)"""
+        return crop(image, rect_right(*image.shape[:2]))
+
+    def extract_region_right_top(self, image: np.ndarray) -> np.ndarray:
+        """Extrae región superior derecha"""
+        return crop(image, rect_right_top(*image.shape[:2]))
+
+    def extract_region_right_bottom(self, image: np.ndarray) -> np.ndarray:
+        """Extrae región inferior derecha"""
+        return crop(image, rect_right_bottom(*image.shape[:2]))
+
+    def extract_region_center_right(self, image: np.ndarray) -> np.ndarray:
+        """Extrae región centro derecha"""
+        return crop(image, rect_center_right(*image.shape[:2]))
+
+    def is_valid_ine_qr(self, qr_data: str) -> bool:
+        """Valida si el QR es válido para INE"""
+        return (
+            qr_data.startswith('http://qr.ine.mx/') and 
+            len(qr_data) > 30 and
+            '/P/' in qr_data
+        )
+
+    def encode_for_api(self, image: np.ndarray) -> Tuple[bytes, str]:
+        """Codificar la región que se envía a la API (bytes, tipo MIME; ver region_encoding.py)"""
+        encoded = encode_region(image)
+        self.log_debug(
+            f"Región para la API: {encoded.width}x{encoded.height} {encoded.mime}, {len(encoded.data)} bytes"
+            f"{' binarizada' if encoded.binarized else ''}{' recortada al QR' if encoded.cropped else ''}"
+        )
+        return encoded.data, encoded.mime
+
+    def fallback_region(self, image: np.ndarray, template: Optional[str] = None) -> np.ndarray:
+        """Mejor región para la API: recorte de la plantilla, región exacta, derecha o imagen completa"""
+        best_region = self.templates.qr_crop(image, template) if template else None
+        if best_region is None:
+            best_region = self.extract_region_exact(image)
+        if best_region is None:
+            best_region = self.extract_region_right(image)
+        if best_region is None:
+            best_region = image
+        return best_region
+
+    def api_result(self, archivo: str, answer: VisionAnswer) -> Dict[str, Any]:
+        """Resultado de una imagen resuelta (o no) por la API"""
+        if answer.content and self.is_valid_ine_qr(answer.content):
+            result = {
+                "archivo": archivo,
+                "status": "ÉXITO",
+                "qr_url": answer.content,
+                "metodo": "api_fallback",
+                "tokens": answer.tokens,
+                "costo": answer.cost
+            }
+        else:
+            if answer.skipped == "presupuesto":
+                metodo = "api_sin_presupuesto"
+            elif answer.error is not None or (answer.skipped is None and answer.content is None):
+                # La API no respondió por esta imagen (red, 5xx tras los reintentos, sin
+                # línea en una respuesta agrupada): se puede reintentar
+                metodo = "api_error"
+            else:
+                metodo = "ninguno"
+            result = {
+                "archivo": archivo,
+                "status": "FALLO",
+                "qr_url": "",
+                "metodo": metodo,
+                "tokens": answer.tokens,
+                "costo": answer.cost
+            }
+
+        # Medición de cada consulta realizada (tamaño enviado y latencia)
+        if answer.skipped is None and answer.image_bytes:
+            result["bytes_api"] = answer.image_bytes
+            result["latencia_api_ms"] = round(answer.latency * 1000)
+        return result
+
+    def finish_fallback(self, result: Dict[str, Any], answer: VisionAnswer) -> Dict[str, Any]:
+        """Completar un resultado diferido (defer_api) con la respuesta de la API"""
+        result.pop('_fallback', None)
+        cache_key = result.pop('_cache_key', None)
+        result.update(self.api_result(result['archivo'], answer))
+        if 'tiempos_ms' in result and answer.skipped is None:
+            result['tiempos_ms']['api'] = round(answer.latency * 1000, 2)
+
+        # Solo si el modelo respondió por esta imagen: omisiones, presupuesto
+        # agotado, errores e imágenes ausentes de una respuesta agrupada no son definitivos
+        if cache_key is not None and self.cache is not None and answer.content is not None \
+                and answer.skipped is None and answer.error is None:
+            self.cache.set(cache_key, result)
+        return result
+
+    @staticmethod
+    def error_result(archivo: str, error: str) -> Dict[str, Any]:
+        """Resultado estándar para una imagen que no se pudo procesar"""
+        return {
+            "archivo": archivo,
+            "status": "ERROR",
+            "error": error,
+            "qr_url": "",
+            "metodo": "error",
+            "tokens": 0,
+            "costo": 0.0
+        }
+
+    def process_image(self, image_path: str, template: Optional[str] = None,
+                      defer_api: bool = False) -> Dict[str, Any]:
+        """
+        Procesa una imagen con todas las estrategias disponibles. Si no se
+        indica la plantilla (p. ej. "t1_back") se infiere de la ruta.
+        """
+        self.log_debug(f"Procesando: {image_path}")
+
+        # Cargar imagen (los bytes codificados sirven también como clave de caché)
+        started = time.perf_counter()
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            data = e
+        read_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        result = self.process_file(image_path, data, template, defer_api)
+        if 'tiempos_ms' in result:
+            result['tiempos_ms']['lectura'] = read_ms
+        return result
+
+    def process_file(self, image_path: str, data: Union[bytes, OSError], template: Optional[str] = None,
+                     defer_api: bool = False) -> Dict[str, Any]:
+        """Procesa el contenido ya leído de un archivo (o el error al leerlo, ver read_ahead)"""
+        if isinstance(data, OSError):
+            return self.error_result(os.path.basename(image_path), str(data))
+        return self.process_bytes(data, os.path.basename(image_path),
+                                  template=template or template_from_path(image_path), defer_api=defer_api)
+
+    def _with_timer(self, process: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+        """
+        Ejecutar process midiendo los tiempos por etapa de la imagen, si están
+        habilitados y no hay ya una medición en curso (process_bytes llama a
+        process_array con la suya).
+        """
+        if not self.timings or self.engine.timer is not None:
+            return process(*args)
+        timer = self.engine.timer = StageTimer()
+        try:
+            result = process(*args)
+        finally:
+            self.engine.timer = None
+        return timer.attach(result)
+
+    def process_bytes(self, data: bytes, archivo: str, use_api: bool = True,
+                      template: Optional[str] = None, defer_api: bool = False) -> Dict[str, Any]:
+        """
+        Procesa una imagen codificada (PNG/JPEG) recibida en memoria.
+
+        Con defer_api no se llama a la API: si hace falta, el resultado queda
+        como FALLO con la región codificada en '_fallback' para que quien
+        llama la envíe (de forma asíncrona) y lo complete con finish_fallback.
+        """
+        return self._with_timer(self._process_bytes, data, archivo, use_api, template, defer_api)
+
+    def _process_bytes(self, data: bytes, archivo: str, use_api: bool,
+                       template: Optional[str], defer_api: bool) -> Dict[str, Any]:
+        self.log_debug(f"Procesando: {archivo} ({len(data)} bytes)")
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.engine.timed("cache", self.cache.key, data)
+            cached = self.engine.timed("cache", self.cache.get, cache_key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                self.log_debug(f"Resultado en caché para {archivo}")
+                # Un acierto de caché no vuelve a consumir tokens
+                return {
+                    "archivo": archivo,
+                    "status": cached['status'],
+                    "qr_url": cached['qr_url'],
+                    "metodo": cached['metodo'],
+                    "tokens": 0,
+                    "costo": 0.0,
+                    "cache": True
+                }
+            self.stats['cache_misses'] += 1
+
+        # Las imágenes grandes se decodifican primero reducidas (ver ImagePlanes.from_encoded)
+        try:
+            planes = self.engine.timed("carga", ImagePlanes.from_encoded, data)
+            result = self.process_array(planes, archivo, use_api=use_api,
+                                        template=template or template_from_path(archivo), defer_api=defer_api)
+        except ValueError as e:
+            return self.error_result(archivo, str(e))
+
+        if '_fallback' in result:
+            # Se guarda en caché cuando llegue la respuesta de la API
+            result['_cache_key'] = cache_key
+            return result
+
+        # Un fallo solo es definitivo si la API respondió sin un QR válido
+        # (no si se omitió por presupuesto o la solicitud falló: api_sin_presupuesto, api_error)
+        if cache_key is not None and (
+            result['status'] == 'ÉXITO'
+            or (result['status'] == 'FALLO' and result['metodo'] == 'ninguno' and use_api and self.api_key)
+        ):
+            self.cache.set(cache_key, result)
+
+        return result
+
+    def process_array(self, image: Union[np.ndarray, ImagePlanes], archivo: str, use_api: bool = True,
+                      template: Optional[str] = None, defer_api: bool = False) -> Dict[str, Any]:
+        """Aplica las estrategias de extracción a una imagen decodificada (o a sus planos)"""
+        return self._with_timer(self._process_array, image, archivo, use_api, template, defer_api)
+
+    def _process_array(self, image: Union[np.ndarray, ImagePlanes], archivo: str, use_api: bool,
+                       template: Optional[str], defer_api: bool) -> Dict[str, Any]:
+        # Estrategias locales sobre planos compartidos (ver strategies.py)
+        planes = image if isinstance(image, ImagePlanes) else ImagePlanes(image)
+        passes_before = self.engine.decode_passes
+        found = self.engine.run(planes, template)
+        self.stats['decode_passes'] += self.engine.decode_passes - passes_before
+
+        if found:
+            method_name, qr_url = found
+            self.log_debug(f"QR encontrado con {method_name} (escala {self.engine.last_scale:g}): {qr_url}")
+            return {
+                "archivo": archivo,
+                "status": "ÉXITO",
+                "qr_url": qr_url,
+                "metodo": method_name,
+                "tokens": 0,
+                "costo": 0.0
+            }
+
+        if not use_api or not self.api_key:
+            return {
+                "archivo": archivo,
+                "status": "FALLO",
+                "qr_url": "",
+                "metodo": "ninguno",
+                "tokens": 0,
+                "costo": 0.0
+            }
+
+        # Último recurso: API con la mejor región disponible
+        payload = self.engine.timed(
+            "codificacion_api", lambda: self.encode_for_api(self.fallback_region(planes.image, template))
+        )
+
+        if defer_api:
+            return {
+                "archivo": archivo,
+                "status": "FALLO",
+                "qr_url": "",
+                "metodo": "ninguno",
+                "tokens": 0,
+                "costo": 0.0,
+                "_fallback": payload
+            }
+
+        self.log_debug("Métodos locales fallaron, usando API...")
+        answer = self.vision.ask(*payload, budget=self.budget)
+        if self.engine.timer is not None and answer.skipped is None:
+            self.engine.timer.add("api", answer.latency)
+        return self.api_result(archivo, answer)
+
+    def update_stats(self, result: Dict[str, Any]) -> None:
+        """Actualiza estadísticas globales"""
+        self.stats['total_processed'] += 1
+
+        if result['status'] == 'ÉXITO':
+            self.stats['successful'] += 1
+        else:
+            self.stats['failed'] += 1
+
+        self.stats['total_tokens'] += result.get('tokens', 0)
+        self.stats['total_cost'] += result.get('costo', 0.0)
+
+        if 'bytes_api' in result:
+            self.stats['api_calls'] += 1
+            self.stats['api_bytes'] += result['bytes_api']
+            self.stats['api_latency_ms'] += result['latencia_api_ms']
+
+        method = result.get('metodo', 'unknown')
+        self.stats['methods_used'][method] = self.stats['methods_used'].get(method, 0) + 1
+        record_timings(self.stats, result)
+
+    def merge_stats(self, stats: Dict[str, Any]) -> None:
+        """Suma a las estadísticas globales las de otro extractor (p. ej. un worker)"""
+        for key in ('total_processed', 'successful', 'failed', 'total_tokens', 'total_cost',
+                    'decode_passes', 'cache_hits', 'cache_misses', 'api_calls', 'api_bytes', 'api_latency_ms'):
+            self.stats[key] += stats.get(key, 0)
+
+        for method, count in stats.get('methods_used', {}).items():
+            self.stats['methods_used'][method] = self.stats['methods_used'].get(method, 0) + count
+        merge_timings(self.stats, stats)
+
+    @staticmethod
+    def iter_image_files(directory: str, extensions: List[str]) -> Iterator[str]:
+        """
+        Recorre el directorio de forma perezosa (sin cargar la lista completa).
+        Cada archivo se emite una sola vez aunque aparezca con varios nombres
+        (enlaces duros o simbólicos), según su (dispositivo, inodo).
+        """
+        suffixes = tuple(ext.lower() for ext in extensions)
+        seen: Set[Tuple[int, int]] = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(suffixes) or not entry.is_file():
+                    continue
+                try:
+                    info = entry.stat()
+                except OSError:
+                    # Se deja pasar para que el error se reporte al leerlo
+                    yield entry.path
+                    continue
+                key = (info.st_dev, info.st_ino)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield entry.path
+
+    @staticmethod
+    def load_processed(jsonl_path: str) -> Set[str]:
+        """Archivos ya registrados en un JSONL de una ejecución anterior"""
+        processed = set()
+        if not os.path.exists(jsonl_path):
+            return processed
+
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    processed.add(json.loads(line)['archivo'])
+                except (ValueError, KeyError):
+                    # Línea truncada por una interrupción: la imagen se reprocesa
+                    continue
+
+        return processed
+
+    def _iter_chunks(self, image_paths: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+        """Agrupa las rutas en bloques para enviarlas al pool"""
+        chunk = []
+        for image_path in image_paths:
+            chunk.append(image_path)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _merge_chunk(self, chunk_result: Tuple[List[Dict[str, Any]], Dict[str, Any], StrategyHistogram]
+                     ) -> List[Dict[str, Any]]:
+        """Sumar estadísticas e histograma de un bloque procesado por un worker"""
+        results, stats, histogram = chunk_result
+        self.merge_stats(stats)
+        self.histogram.merge(histogram)
+        return results
+
+    def iter_directory_results(self, image_paths: Iterable[str], workers: int = 1,
+                               chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               template: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Procesa las imágenes y emite los resultados en el orden de entrada.
+        Las consultas a la API se hacen de forma asíncrona mientras continúa
+        el procesamiento local (ver _resolve_fallbacks).
+
+        Con workers > 1 los bloques se envían a un ProcessPoolExecutor con una
+        ventana acotada (2 bloques por worker), de modo que la memoria no crece
+        con el tamaño del directorio. Las estadísticas y el histograma de
+        estrategias de cada bloque se suman a los propios a medida que llegan.
+        """
+        yield from self._resolve_fallbacks(self._iter_local_results(image_paths, workers, chunk_size, template))
+
+    def _resolve_fallbacks(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Enviar a la API los resultados diferidos sin detener el procesamiento
+        local y emitirlos en orden en cuanto su respuesta llega.
+        """
+        pending = deque()
+        try:
+            for result in results:
+                payload = result.get('_fallback')
+                future = self.vision.submit(*payload, budget=self.budget) if payload else None
+                pending.append((result, future))
+
+                while pending and (
+                    pending[0][1] is None or pending[0][1].done() or len(pending) > MAX_PENDING_FALLBACKS
+                ):
+                    yield self._finish_pending(*pending.popleft())
+
+            while pending:
+                yield self._finish_pending(*pending.popleft())
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    def _finish_pending(self, result: Dict[str, Any], future) -> Dict[str, Any]:
+        if future is not None:
+            self.finish_fallback(result, future.result())
+            self.update_stats(result)
+        return result
+
+    def _iter_local_results(self, image_paths: Iterable[str], workers: int, chunk_size: int,
+                            template: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """Estrategias locales (en este proceso o en el pool), con la API diferida"""
+        if workers <= 1:
+            for image_path, data in read_ahead(image_paths):
+                result = self.process_file(image_path, data, template, defer_api=True)
+                if '_fallback' not in result:
+                    self.update_stats(result)
+                yield result
+            return
+
+        chunks = self._iter_chunks(image_paths, max(1, chunk_size))
+        window = workers * 2
+        pending = deque()
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_directory_worker,
+            initargs=(
+                self.api_key, self.debug, self.prune_overlap_ratio, self.histogram, self.mask_dir,
+                self.cache.options() if self.cache is not None else None,
+                self.localize,
+                self.skip_unlocated,
+                self.pyramid,
+                self.timings
+            )
+        ) as executor:
+            try:
+                for chunk in chunks:
+                    pending.append(executor.submit(_process_chunk, chunk, template))
+                    if len(pending) < window:
+                        continue
+
+                    yield from self._merge_chunk(pending.popleft().result())
+
+                while pending:
+                    yield from self._merge_chunk(pending.popleft().result())
+            finally:
+                # Si el consumidor se detiene se descartan los bloques no iniciados
+                for future in pending:
+                    future.cancel()
+
+    def process_directory(self, directory: str, extensions: List[str] = None, workers: int = 1,
+                          jsonl_output: Optional[str] = None, resume: bool = False,
+                          collect_results: bool = True,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          template: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Procesa todas las imágenes en un directorio.
+
+        Con jsonl_output cada resultado se escribe (y se vacía a disco) en
+        cuanto está listo, así una interrupción no pierde el trabajo terminado;
+        con resume se omiten los archivos que ya figuran en ese JSONL. Para
+        directorios muy grandes, collect_results=False evita acumular los
+        resultados en memoria. Al terminar se persiste el histograma de
+        estrategias si hay un archivo configurado.
+        """
+        if extensions is None:
+            extensions = DEFAULT_EXTENSIONS
+
+        results = []
+
+        if not Path(directory).exists():
+            print(f"Error: El directorio {directory} no existe")
+            return results
+
+        image_paths = self.iter_image_files(directory, extensions)
+
+        if jsonl_output and resume:
+            processed = self.load_processed(jsonl_output)
+            if processed:
+                print(f"Reanudando: {len(processed)} imágenes ya procesadas en {jsonl_output}")
+                image_paths = (path for path in image_paths if os.path.basename(path) not in processed)
+
+        if workers > 1:
+            print(f"Procesando imágenes con {workers} procesos...")
+        else:
+            print("Procesando imágenes...")
+
+        jsonl_file = open(jsonl_output, 'a' if resume else 'w', encoding='utf-8') if jsonl_output else None
+        if jsonl_file and jsonl_file.tell() > 0:
+            # Cerrar una posible línea truncada antes de seguir escribiendo
+            with open(jsonl_output, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    jsonl_file.write("\n")
+        count = 0
+
+        try:
+            results_iter = self.iter_directory_results(image_paths, workers, chunk_size, template)
+            for count, result in enumerate(results_iter, 1):
+                if jsonl_file:
+                    jsonl_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    jsonl_file.flush()
+                if collect_results:
+                    results.append(result)
+
+                # Mostrar progreso
+                print(f"[{count}] {result['archivo']}")
+                if result['status'] == 'ÉXITO':
+                    print(f"  ✅ {result['metodo']} - {result['qr_url'][:50]}...")
+                else:
+                    print(f"  ❌ {result['metodo']}")
+        finally:
+            if jsonl_file:
+                jsonl_file.close()
+            self.save_strategy_stats()
+            self.close()
+
+        if count == 0:
+            print(f"No hay imágenes pendientes en {directory}" if resume else f"No se encontraron imágenes en {directory}")
+
+        return results
+
+    def save_report(self, results: List[Dict[str, Any]], output_file: str = None,
+                    jsonl_output: Optional[str] = None) -> str:
+        """Guarda reporte detallado (con jsonl_output los resultados quedan en ese archivo)"""
+        if output_file is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"reporte_qr_pro_{timestamp}.json"
+
+        report = {
+            "fecha": datetime.now().isoformat(),
+            "estadisticas": self.stats,
+            "tasa_exito": (self.stats['successful'] / self.stats['total_processed'] * 100) if self.stats['total_processed'] > 0 else 0,
+            "resultados": results
+        }
+        if jsonl_output:
+            report["resultados_jsonl"] = jsonl_output
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        return output_file
+
+    def print_summary(self) -> None:
+        """Imprime resumen de resultados"""
+        print("\n" + "="*80)
+        print("RESUMEN FINAL")
+        print("="*80)
+        print(f"📊 Total procesadas: {self.stats['total_processed']}")
+        print(f"✅ Exitosas: {self.stats['successful']}")
+        print(f"❌ Fallidas: {self.stats['failed']}")
+
+        if self.stats['total_processed'] > 0:
+            success_rate = self.stats['successful'] / self.stats['total_processed'] * 100
+            print(f"📈 Tasa de éxito: {success_rate:.1f}%")
+
+        print(f"💰 Tokens usados: {self.stats['total_tokens']}")
+        print(f"💰 Costo total: ${self.stats['total_cost']:.4f}")
+
+        if self.stats['cache_hits'] or self.stats['cache_misses']:
+            print(f"🗃️  Caché: {self.stats['cache_hits']} aciertos, {self.stats['cache_misses']} fallos")
+
+        if self.stats['api_calls']:
+            calls = self.stats['api_calls']
+            print(f"🌐 API: {calls} imágenes, {self.stats['api_bytes'] / calls / 1024:.1f} KiB y "
+                  f"{self.stats['total_tokens'] / calls:.0f} tokens por imagen, "
+                  f"latencia media {self.stats['api_latency_ms'] / calls:.0f} ms")
+
+        print("\n📋 Métodos utilizados:")
+        for method, count in self.stats['methods_used'].items():
+            print(f"   {method}: {count} imágenes")
+
+        if self.stats['tiempos_ms']:
+            self.print_timings()
+
+    def print_timings(self) -> None:
+        """Tiempos por etapa (media y cuantiles aproximados por cubeta de los histogramas)"""
+        def quantile(histogram: Dict[str, Any], q: float, buckets=None) -> str:
+            bound = histogram_quantile(histogram, q) if buckets is None else histogram_quantile(histogram, q, buckets)
+            return "más" if bound is None else f"≤{bound:g}"
+
+        def row(name: str, histogram: Dict[str, Any]) -> None:
+            mean = histogram['suma'] / histogram['conteo'] if histogram['conteo'] else 0.0
+            print(f"   {name:<46} {histogram['conteo']:>7} {mean:>9.1f} "
+                  f"{quantile(histogram, 0.5):>8} {quantile(histogram, 0.95):>8}")
+
+        timings = self.stats['tiempos_ms']
+        print("\n⏱️  Tiempos por etapa (ms):")
+        print(f"   {'etapa':<46} {'imágenes':>7} {'media':>9} {'p50':>8} {'p95':>8}")
+        for stage in STAGES + ('total',):
+            if stage in timings:
+                row(stage, timings[stage])
+        for method, histogram in sorted(self.stats['decodificacion_ms'].items(),
+                                        key=lambda item: -item[1]['suma']):
+            row(f"decodificacion:{method}", histogram)
+
+        attempts = self.stats['intentos_decodificacion']
+        if attempts['conteo']:
+            print(f"   Intentos de decodificación por imagen: media {attempts['suma'] / attempts['conteo']:.1f}, "
+                  f"p50 {quantile(attempts, 0.5, ATTEMPT_BUCKETS)}, p95 {quantile(attempts, 0.95, ATTEMPT_BUCKETS)}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="QR Extractor Pro - Sistema avanzado de extracción de códigos QR",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  %(prog)s imagen.png                    # Procesar una imagen
+  %(prog)s --directory ./imagenes        # Procesar directorio
+  %(prog)s --directory . --debug         # Procesar directorio actual con debug
+  %(prog)s imagen.png --output reporte.json  # Guardar reporte personalizado
+  %(prog)s -d ./lote --workers 8 --jsonl resultados.jsonl  # Directorio en paralelo
+  %(prog)s -d ./lote --workers 8 --jsonl resultados.jsonl --resume  # Reanudar
+        """
+    )
+
+    parser.add_argument(
+        'input',
+        nargs='?',
+        help='Archivo de imagen a procesar (opcional si se usa --directory)'
+    )
+
+    parser.add_argument(
+        '--directory', '-d',
+        help='Directorio con imágenes a procesar'
+    )
+
+    parser.add_argument(
+        '--output', '-o',
+        help='Archivo de salida para el reporte JSON'
+    )
+
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help='Habilitar modo debug (guarda imágenes de regiones)'
+    )
+
+    parser.add_argument(
+        '--extensions',
+        nargs='+',
+        default=DEFAULT_EXTENSIONS,
+        help='Extensiones de archivo a procesar (default: .png .jpg .jpeg)'
+    )
+
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='Procesos para --directory (0 = número de CPUs, default: 1)'
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f'Imágenes por tarea enviada a cada proceso (default: {DEFAULT_CHUNK_SIZE})'
+    )
+
+    parser.add_argument(
+        '--prune-overlap',
+        type=float,
+        default=None,
+        help='Omitir regiones que se solapan (intersección/unión >= valor) con una ya decodificada'
+    )
+
+    parser.add_argument(
+        '--no-localize',
+        action='store_true',
+        help='No ubicar el QR por sus patrones de posición (solo regiones fijas)'
+    )
+
+    parser.add_argument(
+        '--skip-unlocated',
+        action='store_true',
+        help='Omitir las regiones fijas si no se ubica ningún QR (más rápido, pierde QR borrosos)'
+    )
+
+    parser.add_argument(
+        '--no-pyramid',
+        action='store_true',
+        help='Decodificar siempre a la resolución original (sin intentar antes versiones reducidas)'
+    )
+
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Medir el tiempo de cada etapa (carga, realce, decodificación por estrategia, API) en cada resultado'
+    )
+
+    parser.add_argument(
+        '--template', '-t',
+        help='Plantilla de las credenciales (p. ej. t1_back); por defecto se infiere de la ruta'
+    )
+
+    parser.add_argument(
+        '--mask-dir',
+        help='Directorio con las máscaras de plantillas (default: samples/mask/editables)'
+    )
+
+    parser.add_argument(
+        '--strategy-stats',
+        help='Archivo JSON con el histograma de estrategias por plantilla (se lee y se actualiza)'
+    )
+
+    parser.add_argument(
+        '--cache',
+        help='Archivo SQLite para la caché de resultados por contenido (default: solo en memoria)'
+    )
+
+    parser.add_argument(
+        '--cache-ttl',
+        type=int,
+        default=30 * 24 * 3600,
+        help='Vigencia en segundos de los resultados en caché (default: 30 días)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Deshabilitar la caché de resultados'
+    )
+
+    parser.add_argument(
+        '--api-budget',
+        type=float,
+        default=None,
+        help='Costo máximo en USD de las consultas a la API en esta ejecución'
+    )
+
+    parser.add_argument(
+        '--api-concurrency',
+        type=int,
+        default=8,
+        help='Consultas simultáneas a la API (default: 8)'
+    )
+
+    parser.add_argument(
+        '--api-rate',
+        type=float,
+        default=5.0,
+        help='Consultas por segundo a la API (default: 5)'
+    )
+
+    parser.add_argument(
+        '--api-batch-size',
+        type=int,
+        default=4,
+        help='Imágenes por solicitud a la API (1 = una solicitud por imagen, default: 4)'
+    )
+
+    parser.add_argument(
+        '--api-batch-wait-ms',
+        type=float,
+        default=250.0,
+        help='Espera máxima para completar un grupo de imágenes (default: 250 ms)'
+    )
+
+    parser.add_argument(
+        '--api-detail',
+        choices=['low', 'high', 'auto'],
+        default='low',
+        help='Nivel de detalle de la imagen en la API; "low" cobra un solo bloque de 512 px (default: low)'
+    )
+
+    parser.add_argument(
+        '--api-base-url',
+        help='URL base de la API compatible con OpenAI (default: OPENAI_BASE_URL o api.openai.com)'
+    )
+
+    parser.add_argument(
+        '--jsonl',
+        help='Escribir cada resultado en este archivo JSONL a medida que se procesa'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Omitir las imágenes ya registradas en el archivo --jsonl'
+    )
+
+    args = parser.parse_args()
+
+    # Validar argumentos
+    if not args.input and not args.directory:
+        parser.error("Debe especificar una imagen o un directorio con --directory")
+    if args.resume and not args.jsonl:
+        parser.error("--resume requiere --jsonl")
+
+    # Crear extractor
+    extractor = QRExtractorPro(
+        debug=args.debug,
+        prune_overlap_ratio=args.prune_overlap,
+        strategy_stats_path=args.strategy_stats,
+        mask_dir=args.mask_dir,
+        localize=not args.no_localize,
+        skip_unlocated=args.skip_unlocated,
+        pyramid=not args.no_pyramid,
+        timings=args.timings,
+        cache=None if args.no_cache else ResultCache(path=args.cache, ttl_seconds=args.cache_ttl),
+        vision=BackgroundVisionClient(VisionClient(
+            os.getenv('OPENAI_API_KEY'),
+            base_url=args.api_base_url,
+            max_concurrency=args.api_concurrency,
+            rate_per_second=args.api_rate,
+            batch_size=args.api_batch_size,
+            batch_wait_ms=args.api_batch_wait_ms,
+            image_detail=args.api_detail
+        )),
+        api_budget=args.api_budget
+    )
+
+    results = []
+
+    if args.directory:
+        # Procesar directorio
+        # Con --jsonl los resultados viven en disco y no se acumulan en memoria
+        results = extractor.process_directory(
+            args.directory,
+            args.extensions,
+            workers=args.workers if args.workers > 0 else (os.cpu_count() or 1),
+            jsonl_output=args.jsonl,
+            resume=args.resume,
+            collect_results=not args.jsonl,
+            chunk_size=args.chunk_size,
+            template=args.template
+        )
+    else:
+        # Procesar archivo individual
+        if not os.path.exists(args.input):
+            print(f"Error: El archivo {args.input} no existe")
+            sys.exit(1)
+
+        result = extractor.process_image(args.input, args.template)
+        extractor.update_stats(result)
+        extractor.save_strategy_stats()
+        extractor.close()
+        results = [result]
+
+        # Mostrar resultado individual
+        print(f"\nResultado para {result['archivo']}:")
+        if result['status'] == 'ÉXITO':
+            print(f"✅ QR encontrado ({result['metodo']}): {result['qr_url']}")
+            print(f"💰 Costo: ${result['costo']:.4f}")
+        else:
+            print(f"❌ No se pudo extraer QR ({result['metodo']})")
+            if result.get('error'):
+                print(f"Error: {result['error']}")
+
+    # Guardar reporte
+    if results or extractor.stats['total_processed']:
+        report_file = extractor.save_report(results, args.output, args.jsonl)
+        print(f"\n📄 Reporte guardado en: {report_file}")
+
+    # Mostrar resumen
+    extractor.print_summary()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
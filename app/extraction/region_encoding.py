@@ -0,0 +1,115 @@
+"""
+Codificación compacta de la región que se envía a la API de visión.
+
+La API cobra por tamaño de imagen (bloques de 512 px) y el envío es base64,
+así que antes de consultarla la región se reduce a lo indispensable:
+
+1. Escala de grises y binarización (umbral adaptativo).
+2. Recorte ajustado a los patrones de posición del QR, con zona de silencio.
+3. Reducción a la escala más pequeña que conserva MIN_MODULE_PX px por módulo
+   y en la que los patrones de posición se siguen encontrando.
+4. El formato más pequeño entre PNG de 8 bits, PNG de 1 bit y JPEG.
+
+Si no se encuentra ningún patrón de posición la región se envía en escala de
+grises sin binarizar (el umbral podría borrar un QR que no se ve), limitada a
+MAX_SIDE px por lado.
+"""
+
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .finder_patterns import binarize, find_finder_patterns, locate_qr
+from .strategies import crop, to_gray
+
+# Lado máximo de la imagen enviada: cabe en un solo bloque de la API (detalle "low")
+MAX_SIDE = 512
+
+# Px por módulo por debajo de los cuales no se reduce la región. Por debajo de
+# MAX_SIDE el costo en tokens ya es el mínimo y reducir más solo ahorra bytes,
+# así que se deja margen para que el QR siga siendo legible.
+MIN_MODULE_PX = 6.0
+
+# Zona de silencio alrededor del QR recortado, en módulos
+QUIET_ZONE_MODULES = 4
+
+# Incremento de escala al buscar la más pequeña que conserva los patrones
+SCALE_STEP = 1.25
+
+JPEG_QUALITY = 90
+
+@dataclass(frozen=True)
+class EncodedRegion:
+    """Región codificada para la API"""
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    binarized: bool = False
+    cropped: bool = False
+
+def _resize(image: np.ndarray, scale: float) -> np.ndarray:
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def _smallest_binary(gray: np.ndarray, binary: np.ndarray, module: float, expected: int) -> np.ndarray:
+    """Binarización a la menor escala que conserva los patrones de posición"""
+    limit = min(1.0, MAX_SIDE / max(gray.shape[:2]))
+    scale = min(MIN_MODULE_PX / module, limit)
+    while scale < limit:
+        reduced = binarize(_resize(gray, scale))
+        if len(find_finder_patterns(reduced)) >= expected:
+            return reduced
+        scale *= SCALE_STEP
+    return binary if limit >= 1 else binarize(_resize(gray, limit))
+
+def _encode_candidates(image: np.ndarray, binarized: bool) -> List[Tuple[bytes, str]]:
+    """Codificaciones sin pérdida relevante para el QR"""
+    candidates = []
+    ok, buffer = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if ok:
+        candidates.append((buffer.tobytes(), "image/png"))
+
+    if binarized:
+        # Un bit por píxel
+        output = BytesIO()
+        Image.fromarray(image).convert('1', dither=Image.Dither.NONE).save(output, format='PNG', optimize=True)
+        candidates.append((output.getvalue(), "image/png"))
+    else:
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if ok:
+            candidates.append((buffer.tobytes(), "image/jpeg"))
+    return candidates
+
+def encode_region(region: np.ndarray) -> EncodedRegion:
+    """Preparar y codificar una región para la API (ver el docstring del módulo)"""
+    gray = to_gray(region)
+    binary = binarize(gray)
+    patterns = find_finder_patterns(binary)
+
+    image: Optional[np.ndarray] = None
+    binarized = cropped = False
+    if patterns:
+        location = locate_qr(binary, patterns)
+        if location is not None:
+            rect = location.bounding_rect(*gray.shape[:2], margin_modules=QUIET_ZONE_MODULES)
+            gray, binary = crop(gray, rect), crop(binary, rect)
+            module, expected, cropped = location.module, 3, True
+        else:
+            # Sin el trío completo solo se conoce el tamaño del módulo
+            module = sum(p.module for p in patterns) / len(patterns)
+            expected = min(len(patterns), 3)
+        image = _smallest_binary(gray, binary, module, expected)
+        binarized = True
+
+    if image is None:
+        image = _resize(gray, MAX_SIDE / max(gray.shape[:2]))
+
+    data, mime = min(_encode_candidates(image, binarized), key=lambda candidate: len(candidate[0]))
+    return EncodedRegion(data, mime, image.shape[1], image.shape[0], binarized, cropped)
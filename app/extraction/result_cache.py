@@ -0,0 +1,158 @@
+"""
+Caché de resultados de extracción por contenido de la imagen.
+
+La clave es un BLAKE2b de los bytes codificados (PNG/JPEG), así una imagen
+reenviada (reintentos, cargas duplicadas) cuesta un hash y una búsqueda en
+lugar de todas las estrategias y, sobre todo, una nueva consulta a la API.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Cambiar al modificar el formato de los resultados guardados
+CACHE_VERSION = b"qr-v1"
+
+# Campos del resultado que se guardan (el nombre del archivo no forma parte)
+CACHED_FIELDS = ("status", "qr_url", "metodo", "tokens", "costo")
+
+# Inserciones entre limpiezas de entradas expiradas o sobrantes en disco
+EVICT_EVERY = 256
+
+class ResultCache:
+    """
+    LRU en memoria respaldado opcionalmente por un archivo SQLite.
+
+    Las entradas expiran tras ttl_seconds; en memoria se conservan como
+    máximo memory_entries y en disco max_entries (se eliminan las más
+    antiguas). Varios procesos pueden compartir el archivo: cada uno abre su
+    propia conexión en modo WAL.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: int = 30 * 24 * 3600,
+                 max_entries: int = 100000, memory_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = min(memory_entries, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS qr_results ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_qr_results_created_at ON qr_results (created_at)")
+
+    def options(self) -> Dict[str, Any]:
+        """Parámetros para crear una caché equivalente en otro proceso"""
+        return {
+            "path": self.path,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "memory_entries": self.memory_entries,
+        }
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        """Hash del contenido codificado de la imagen"""
+        return hashlib.blake2b(data, digest_size=16, person=CACHE_VERSION).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Resultado guardado para la clave, o None si no existe o expiró"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["_created_at"] + self.ttl_seconds > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT result, created_at FROM qr_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] + self.ttl_seconds > now:
+                    entry = self._decode(row[0], row[1])
+                    if entry is not None:
+                        self._remember(key, entry)
+                        self.hits += 1
+                        return entry
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Guardar los campos relevantes de un resultado"""
+        entry = {field: result.get(field) for field in CACHED_FIELDS}
+        entry["_created_at"] = time.time()
+
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is None:
+                return
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO qr_results (key, result, created_at) VALUES (?, ?, ?)",
+                (key, self._encode(entry), entry["_created_at"])
+            )
+            self._inserts += 1
+            if self._inserts % EVICT_EVERY == 0:
+                self._evict_disk()
+
+    def clear(self) -> None:
+        """Vaciar la caché en memoria y en disco"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM qr_results")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.memory_entries:
+            self._entries.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Eliminar entradas expiradas y las más antiguas por encima de max_entries"""
+        self._db.execute("DELETE FROM qr_results WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM qr_results WHERE key IN ("
+            " SELECT key FROM qr_results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> str:
+        return json.dumps({field: entry[field] for field in CACHED_FIELDS}, ensure_ascii=False)
+
+    @staticmethod
+    def _decode(raw: str, created_at: float) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+        entry["_created_at"] = created_at
+        return entry
@@ -0,0 +1,123 @@
+"""
+Tiempos por etapa de la extracción de una imagen.
+
+Con la medición habilitada (QRExtractorPro(timings=True), --timings en el
+CLI o EXTRACTION_TIMINGS en la API) cada resultado incluye:
+
+- "tiempos_ms": milisegundos por etapa (ver STAGES) y el total local
+- "decodificacion_ms": milisegundos de pyzbar por estrategia
+- "intentos_decodificacion": llamadas a pyzbar de la imagen
+
+y las estadísticas del extractor los acumulan en histogramas de cubetas
+fijas (diccionarios simples, que se suman entre procesos con
+merge_timings). Deshabilitada, el motor solo comprueba que no hay
+cronómetro en cada etapa.
+"""
+
+import time
+from typing import Optional, Dict, Any, Tuple
+
+# Etapas medidas, en el orden en que ocurren
+STAGES = (
+    "lectura",           # Lectura del archivo (solo process_image; read_ahead la solapa)
+    "cache",             # Hash del contenido y búsqueda en caché
+    "carga",             # Decodificación de la imagen y niveles reducidos de la pirámide
+    "realce",            # Escala de grises, plano mejorado (suavizado y umbral adaptativo, una
+                         # vez por nivel) y binarización de los QR ubicados
+    "ubicacion",         # Búsqueda de los patrones de posición
+    "recorte",           # Recortes de región y QR enderezados
+    "decodificacion",    # pyzbar (el desglose por estrategia va en decodificacion_ms)
+    "codificacion_api",  # Región de respaldo codificada para la API
+    "api",               # Latencia de la consulta a la API de visión
+)
+
+# Límites superiores (ms) de las cubetas de los histogramas de tiempo; la última es abierta
+TIMING_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Límites superiores de las cubetas del histograma de intentos de decodificación
+ATTEMPT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+class StageTimer:
+    """Cronómetro de una imagen: segundos acumulados por etapa y por estrategia"""
+
+    __slots__ = ("started", "stages", "decode_by_method", "decode_attempts")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.decode_by_method: Dict[str, float] = {}
+        self.decode_attempts = 0
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_decode(self, method: Optional[str], seconds: float) -> None:
+        """Una llamada a pyzbar hecha por la estrategia method"""
+        self.decode_attempts += 1
+        self.add("decodificacion", seconds)
+        method = method or "ninguno"
+        self.decode_by_method[method] = self.decode_by_method.get(method, 0.0) + seconds
+
+    def attach(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Agregar los tiempos medidos al resultado de la imagen"""
+        timings = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        result["tiempos_ms"] = {**result.get("tiempos_ms", {}), **timings}
+        result["decodificacion_ms"] = {
+            method: round(seconds * 1000, 2) for method, seconds in self.decode_by_method.items()
+        }
+        result["intentos_decodificacion"] = self.decode_attempts
+        return result
+
+def new_histogram(buckets: Tuple[float, ...] = TIMING_BUCKETS_MS) -> Dict[str, Any]:
+    """Histograma vacío: conteo, suma y conteo por cubeta (len(buckets) + 1)"""
+    return {"conteo": 0, "suma": 0.0, "cubetas": [0] * (len(buckets) + 1)}
+
+def observe(histogram: Dict[str, Any], value: float, buckets: Tuple[float, ...] = TIMING_BUCKETS_MS) -> None:
+    histogram["conteo"] += 1
+    histogram["suma"] += value
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            histogram["cubetas"][index] += 1
+            return
+    histogram["cubetas"][-1] += 1
+
+def merge_histogram(target: Dict[str, Any], other: Dict[str, Any]) -> None:
+    """Sumar otro histograma con las mismas cubetas (p. ej. el de un worker)"""
+    target["conteo"] += other.get("conteo", 0)
+    target["suma"] += other.get("suma", 0.0)
+    for index, count in enumerate(other.get("cubetas", [])):
+        target["cubetas"][index] += count
+
+def histogram_quantile(histogram: Dict[str, Any], q: float,
+                       buckets: Tuple[float, ...] = TIMING_BUCKETS_MS) -> Optional[float]:
+    """Cota superior de la cubeta que contiene el cuantil q (None si cae en la cubeta abierta)"""
+    if not histogram["conteo"]:
+        return 0.0
+    rank = q * histogram["conteo"]
+    seen = 0
+    for index, count in enumerate(histogram["cubetas"]):
+        seen += count
+        if seen >= rank and count:
+            return buckets[index] if index < len(buckets) else None
+    return None
+
+def record_timings(stats: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """Acumular en las estadísticas del extractor los tiempos de un resultado"""
+    timings = result.get("tiempos_ms")
+    if not timings:
+        return
+    for stage, ms in timings.items():
+        observe(stats["tiempos_ms"].setdefault(stage, new_histogram()), ms)
+    for method, ms in result.get("decodificacion_ms", {}).items():
+        observe(stats["decodificacion_ms"].setdefault(method, new_histogram()), ms)
+    if "intentos_decodificacion" in result:
+        observe(stats["intentos_decodificacion"], result["intentos_decodificacion"], ATTEMPT_BUCKETS)
+
+def merge_timings(stats: Dict[str, Any], other: Dict[str, Any]) -> None:
+    """Sumar los histogramas de tiempos de otras estadísticas"""
+    for key in ("tiempos_ms", "decodificacion_ms"):
+        for name, histogram in other.get(key, {}).items():
+            merge_histogram(stats[key].setdefault(name, new_histogram()), histogram)
+    if "intentos_decodificacion" in other:
+        merge_histogram(stats["intentos_decodificacion"], other["intentos_decodificacion"])
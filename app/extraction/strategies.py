@@ -0,0 +1,561 @@
+"""
+Estrategias de búsqueda del QR por región de la credencial.
+
+Cada estrategia define un rectángulo (y0, y1, x0, x1) en función del tamaño de
+la imagen. El motor convierte a escala de grises y mejora la imagen completa
+una sola vez; las regiones son vistas de NumPy sobre esos planos (sin copias)
+y cada par (plano, rectángulo) se decodifica como máximo una vez.
+"""
+
+from io import BytesIO
+from typing import Optional, Tuple, Dict, List, Callable, Any, Union
+import json
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+from pyzbar import pyzbar
+from pyzbar.pyzbar import ZBarSymbol
+
+from .finder_patterns import binarize, localize
+from .stage_timings import StageTimer
+
+Rect = Tuple[int, int, int, int]  # (y0, y1, x0, x1)
+RectFunc = Callable[[int, int], Optional[Rect]]
+
+# Solo se buscan códigos QR: zbar no intenta las simbologías 1D en cada pasada
+QR_SYMBOLS = [ZBarSymbol.QRCODE]
+
+# Planos en el orden en que se intentan para cada región
+RAW_PLANE = "original"
+ENHANCED_PLANE = "mejorada"
+PLANES = (RAW_PLANE, ENHANCED_PLANE)
+
+def rect_full(height: int, width: int) -> Optional[Rect]:
+    """Imagen completa"""
+    return (0, height, 0, width)
+
+def rect_exact(height: int, width: int) -> Optional[Rect]:
+    """Región exacta del QR (560px-723px, altura completa)"""
+    start_x = 560
+    end_x = min(width, 723)
+    if start_x >= end_x:
+        return None
+    return (0, height, start_x, end_x)
+
+def rect_right(height: int, width: int) -> Optional[Rect]:
+    """Región derecha (70% del ancho hacia la derecha)"""
+    return (0, height, int(width * 0.7), width)
+
+def rect_right_top(height: int, width: int) -> Optional[Rect]:
+    """Región superior derecha"""
+    return (0, int(height * 0.5), int(width * 0.7), width)
+
+def rect_right_bottom(height: int, width: int) -> Optional[Rect]:
+    """Región inferior derecha"""
+    return (int(height * 0.5), height, int(width * 0.7), width)
+
+def rect_center_right(height: int, width: int) -> Optional[Rect]:
+    """Región centro derecha"""
+    return (int(height * 0.25), int(height * 0.75), int(width * 0.6), width)
+
+# Estrategias de extracción en orden de prioridad
+REGION_STRATEGIES: List[Tuple[str, RectFunc]] = [
+    ("local_completa", rect_full),
+    ("local_region_exacta", rect_exact),
+    ("local_region_derecha", rect_right),
+    ("local_region_superior_derecha", rect_right_top),
+    ("local_region_inferior_derecha", rect_right_bottom),
+    ("local_region_centro_derecha", rect_center_right),
+]
+
+# Estrategia de QR ubicados por sus patrones de posición (ver finder_patterns.py);
+# en la lista de estrategias va sin función de rectángulo
+LOCALIZED_METHOD = "local_localizado"
+
+# Escalas de la pirámide que se intentan antes de la imagen completa, y lado
+# mayor mínimo de un nivel: una credencial normalizada (790 px) tiene ~3 px por
+# módulo en el QR, por debajo de eso zbar ya no lo lee
+PYRAMID_SCALES = (0.25,)
+PYRAMID_MIN_SIDE = 720
+
+# Lectura directa a escala reducida y en grises (cv2.imdecode)
+REDUCED_READ_FLAGS = {
+    0.5: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    0.25: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    0.125: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Plantilla usada cuando no se conoce el tipo de credencial
+DEFAULT_TEMPLATE = "general"
+
+# Nombres de plantilla como en samples/mask/editables: t1_front, t2_back, ...
+_TEMPLATE_RE = re.compile(r"^(t\d+)[_-](front|back)$")
+_TYPE_RE = re.compile(r"^t\d+$")
+
+def template_from_path(path: str) -> Optional[str]:
+    """
+    Inferir la plantilla (p. ej. "t1_back") de la ruta de una imagen, ya sea
+    por directorios como samples/t1/back/ o por un componente "t1_back".
+    """
+    parts = [part.lower() for part in re.split(r"[\\/]+", path) if part]
+    for index, part in enumerate(parts):
+        if _TEMPLATE_RE.match(part):
+            return part.replace("-", "_")
+        if _TYPE_RE.match(part) and index + 1 < len(parts) and parts[index + 1] in ("front", "back"):
+            return f"{part}_{parts[index + 1]}"
+    return None
+
+def crop(image: np.ndarray, rect: Rect) -> np.ndarray:
+    """Vista de la región (no copia los píxeles)"""
+    y0, y1, x0, x1 = rect
+    return image[y0:y1, x0:x1]
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    """Convertir a escala de grises si es necesario"""
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+def enhance_gray(gray: np.ndarray) -> np.ndarray:
+    """Suavizado y umbral adaptativo sobre una imagen en escala de grises"""
+    enhanced = cv2.GaussianBlur(gray, (3, 3), 0)
+    return cv2.adaptiveThreshold(
+        enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+    )
+
+class ImagePlanes:
+    """
+    Planos de una imagen calculados bajo demanda y una sola vez.
+
+    El plano original es la imagen tal cual (pyzbar toma el primer canal de
+    una imagen a color); el mejorado se calcula sobre el cuadro completo, por
+    lo que solo difiere del de una región recortada en los 5 px del borde.
+
+    scaled() devuelve los planos de una versión reducida (un nivel de la
+    pirámide), que se calcula a partir de la escala de grises una sola vez.
+    Creados con from_encoded(), los niveles 1/2, 1/4 y 1/8 se decodifican
+    directamente reducidos y en grises (en JPEG sin descomprimir todos los
+    píxeles), y la imagen completa solo si alguna estrategia la necesita.
+    """
+
+    __slots__ = ("_image", "_data", "size_hint", "scale", "_gray", "_enhanced", "_levels")
+
+    def __init__(self, image: Optional[np.ndarray], scale: float = 1.0, data: Optional[bytes] = None,
+                 size_hint: Optional[Tuple[int, int]] = None):
+        self._image = image
+        self._data = data
+        self.size_hint = size_hint
+        self.scale = scale
+        self._gray: Optional[np.ndarray] = None
+        self._enhanced: Optional[np.ndarray] = None
+        self._levels: Dict[float, "ImagePlanes"] = {}
+
+    @classmethod
+    def from_encoded(cls, data: bytes) -> "ImagePlanes":
+        """Planos de una imagen codificada (PNG/JPEG); ValueError si no se puede decodificar"""
+        size = encoded_size(data)
+        if size is None or max(size) * min(PYRAMID_SCALES, default=1) < PYRAMID_MIN_SIDE:
+            # Sin niveles reducidos que intentar: se decodifica completa de una vez
+            return cls(decode_image(data))
+        return cls(None, data=data, size_hint=size)
+
+    @property
+    def image(self) -> np.ndarray:
+        if self._image is None:
+            self._image = decode_image(self._data)
+        return self._image
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.image.shape[:2]
+
+    @property
+    def longest_side(self) -> int:
+        """Lado mayor (sin decodificar la imagen si se conoce por el encabezado)"""
+        if self._image is None and self.size_hint is not None:
+            return max(self.size_hint)
+        return max(self.shape)
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = to_gray(self.image)
+        return self._gray
+
+    @property
+    def enhanced(self) -> np.ndarray:
+        if self._enhanced is None:
+            self._enhanced = enhance_gray(self.gray)
+        return self._enhanced
+
+    def plane(self, name: str) -> np.ndarray:
+        return self.enhanced if name == ENHANCED_PLANE else self.image
+
+    def scaled(self, scale: float) -> "ImagePlanes":
+        """Planos de la imagen reducida a scale (p. ej. 0.25)"""
+        if scale >= 1:
+            return self
+        level = self._levels.get(scale)
+        if level is None:
+            reduced = None
+            if self._image is None and scale in REDUCED_READ_FLAGS:
+                reduced = cv2.imdecode(np.frombuffer(self._data, dtype=np.uint8), REDUCED_READ_FLAGS[scale])
+            if reduced is None:
+                height, width = self.shape
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                reduced = cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+            level = ImagePlanes(reduced, self.scale * scale)
+            self._levels[scale] = level
+        return level
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decodificar una imagen completa a color (ValueError si no es una imagen válida)"""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("No se pudo decodificar la imagen")
+    return image
+
+def encoded_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(ancho, alto) leídos del encabezado de la imagen, sin decodificarla"""
+    try:
+        with Image.open(BytesIO(data)) as header:
+            return header.size
+    except Exception:
+        return None
+
+def _area(rect: Rect) -> int:
+    return max(0, rect[1] - rect[0]) * max(0, rect[3] - rect[2])
+
+def overlap_ratio(a: Rect, b: Rect) -> float:
+    """Intersección sobre unión de dos rectángulos"""
+    inter = _area((max(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])))
+    union = _area(a) + _area(b) - inter
+    return inter / union if union else 0.0
+
+class StrategyHistogram:
+    """
+    Histograma de éxito por plantilla y estrategia, persistido en JSON.
+
+    Para cada estrategia se guardan los intentos, los aciertos y el tiempo de
+    decodificación acumulado. Con suficientes imágenes de una plantilla las
+    estrategias se ordenan por probabilidad de acierto entre costo medio, que
+    es el orden que minimiza el tiempo esperado hasta encontrar el QR; antes
+    de eso se conserva el orden por defecto.
+    """
+
+    # Imágenes de una plantilla necesarias antes de reordenar
+    MIN_IMAGES = 20
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.data: Dict[str, Any] = data or {}
+
+    @classmethod
+    def load(cls, path: str) -> "StrategyHistogram":
+        """Cargar el histograma (vacío si el archivo no existe o es inválido)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f).get("plantillas", {}))
+        except (OSError, ValueError, AttributeError):
+            return cls()
+
+    def save(self, path: str) -> None:
+        """Guardar de forma atómica (escritura en temporal y reemplazo)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"plantillas": self.data}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _template(self, template: str) -> Dict[str, Any]:
+        return self.data.setdefault(template, {"imagenes": 0, "estrategias": {}})
+
+    def record_image(self, template: str) -> None:
+        self._template(template)["imagenes"] += 1
+
+    def record_attempt(self, template: str, method: str, hit: bool, seconds: float) -> None:
+        entry = self._template(template)["estrategias"].setdefault(
+            method, {"intentos": 0, "aciertos": 0, "segundos": 0.0}
+        )
+        entry["intentos"] += 1
+        entry["aciertos"] += int(hit)
+        entry["segundos"] += seconds
+
+    def copy(self) -> "StrategyHistogram":
+        return StrategyHistogram(json.loads(json.dumps(self.data)))
+
+    def merge(self, other: "StrategyHistogram", sign: int = 1) -> None:
+        """Sumar (o restar con sign=-1) otro histograma, p. ej. el de un proceso worker"""
+        for template, other_entry in other.data.items():
+            entry = self._template(template)
+            entry["imagenes"] += sign * other_entry.get("imagenes", 0)
+            for method, counts in other_entry.get("estrategias", {}).items():
+                target = entry["estrategias"].setdefault(
+                    method, {"intentos": 0, "aciertos": 0, "segundos": 0.0}
+                )
+                for key in ("intentos", "aciertos", "segundos"):
+                    target[key] += sign * counts.get(key, 0)
+
+    def difference(self, before: "StrategyHistogram") -> "StrategyHistogram":
+        """Lo registrado desde la copia before"""
+        delta = self.copy()
+        delta.merge(before, sign=-1)
+        return delta
+
+    def order(self, template: str, strategies: List[Tuple[str, RectFunc]]) -> List[Tuple[str, RectFunc]]:
+        """Estrategias ordenadas por aciertos/costo para la plantilla"""
+        entry = self.data.get(template)
+        if not entry or entry.get("imagenes", 0) < self.MIN_IMAGES:
+            return strategies
+
+        counts = entry.get("estrategias", {})
+        tried = [c for c in counts.values() if c["intentos"]]
+        # Costo por defecto para estrategias sin datos: el promedio observado
+        default_cost = (
+            sum(c["segundos"] for c in tried) / sum(c["intentos"] for c in tried) if tried else 1.0
+        )
+
+        def score(item: Tuple[int, Tuple[str, RectFunc]]) -> Tuple[float, int]:
+            position, (method, _) = item
+            c = counts.get(method, {"intentos": 0, "aciertos": 0, "segundos": 0.0})
+            # Suavizado de Laplace para no descartar estrategias con pocos intentos
+            hit_rate = (c["aciertos"] + 1) / (c["intentos"] + 2)
+            cost = c["segundos"] / c["intentos"] if c["intentos"] else default_cost
+            return (-hit_rate / max(cost, 1e-6), position)
+
+        return [strategy for _, strategy in sorted(enumerate(strategies), key=score)]
+
+class StrategyEngine:
+    """
+    Ejecuta las estrategias de región sobre planos compartidos.
+
+    Con un histograma, el orden de las estrategias se adapta a la plantilla
+    de la imagen y cada intento se registra en él. Con un registro de
+    plantillas (ver templates.py) se antepone el recorte directo del QR.
+
+    Los rectángulos repetidos (p. ej. en imágenes pequeñas donde varias
+    regiones coinciden) no se vuelven a decodificar. Orden de búsqueda en
+    cada nivel: recorte de la plantilla, QR ubicados por sus patrones de
+    posición (con localize; recortes enderezados, ver finder_patterns.py,
+    que encuentran QR desplazados o girados) y regiones fijas (el histograma
+    puede reordenarlas). Si la ubicación no encuentra ningún QR no se repite
+    en los niveles siguientes y las regiones fijas quedan como respaldo a
+    tamaño completo (un QR borroso o recortado puede no tener patrones
+    ubicables y decodificarse igual). Con skip_unlocated se omiten las
+    regiones fijas y los niveles restantes (más rápido con anversos, pero se
+    pierden esos QR).
+
+    Con pyramid, las imágenes cuyo lado mayor reducido a PYRAMID_SCALES (1/4)
+    sigue alcanzando PYRAMID_MIN_SIDE (fotos de 12 MP) se intentan primero a
+    1/4 solo con los recortes dirigidos (plantilla y QR ubicados) y, si no
+    aparece el QR, directamente a tamaño completo con todas las estrategias.
+    Cada nivel se calcula una vez y lo comparten todas las regiones. Las
+    imágenes ya normalizadas tienen un solo nivel.
+
+    Con prune_overlap_ratio
+    también se omite una región cuya intersección sobre unión con otra ya
+    intentada alcanza ese valor, ya que zbar recorrería casi los mismos
+    píxeles (p. ej. 0.6 omite la región derecha tras la exacta). Está
+    deshabilitado por defecto porque cambia qué región encuentra el QR.
+    """
+
+    def __init__(self, validator: Callable[[str], bool],
+                 strategies: Optional[List[Tuple[str, RectFunc]]] = None,
+                 prune_overlap_ratio: Optional[float] = None,
+                 on_region: Optional[Callable[[str, np.ndarray], None]] = None,
+                 log: Optional[Callable[[str], None]] = None,
+                 histogram: Optional[StrategyHistogram] = None,
+                 templates: Optional[Any] = None,
+                 localize: bool = True,
+                 skip_unlocated: bool = False,
+                 pyramid: Tuple[float, ...] = PYRAMID_SCALES):
+        self.validator = validator
+        self.strategies = strategies if strategies is not None else REGION_STRATEGIES
+        self.histogram = histogram
+        self.templates = templates
+        self.localize = localize
+        self.skip_unlocated = skip_unlocated
+        self.pyramid = pyramid or ()
+        self.last_scale: Optional[float] = None
+        self._located: Optional[bool] = None
+        self.prune_overlap_ratio = prune_overlap_ratio
+        self.on_region = on_region
+        self.log = log or (lambda message: None)
+        self.decode_passes = 0
+        # Cronómetro de la imagen en curso (None = sin medición, ver stage_timings.py)
+        self.timer: Optional[StageTimer] = None
+        self._method: Optional[str] = None
+
+    def timed(self, stage: str, func: Callable[..., Any], *args) -> Any:
+        """func(*args), sumando su duración a la etapa si se están midiendo tiempos"""
+        if self.timer is None:
+            return func(*args)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timer.add(stage, time.perf_counter() - started)
+
+    def decode(self, region: np.ndarray) -> Optional[str]:
+        """Decodificar una región y devolver el primer QR válido de INE"""
+        self.decode_passes += 1
+        if self.timer is None:
+            symbols = pyzbar.decode(region, symbols=QR_SYMBOLS)
+        else:
+            started = time.perf_counter()
+            symbols = pyzbar.decode(region, symbols=QR_SYMBOLS)
+            self.timer.add_decode(self._method, time.perf_counter() - started)
+        for qr in symbols:
+            qr_data = qr.data.decode('utf-8')
+            if self.validator(qr_data):
+                return qr_data
+        return None
+
+    def _already_covered(self, rect: Rect, tried: List[Rect]) -> bool:
+        if rect in tried:
+            return True
+        if not self.prune_overlap_ratio:
+            return False
+        return any(overlap_ratio(rect, previous) >= self.prune_overlap_ratio for previous in tried)
+
+    def decode_located(self, planes: ImagePlanes) -> Tuple[Optional[str], bool]:
+        """
+        Decodificar los QR ubicados por sus patrones de posición (enderezados
+        y binarizados). Devuelve el QR y si se ubicó alguno.
+        """
+        gray = self.timed("realce", lambda: planes.gray)
+        locations = self.timed("ubicacion", localize, gray)
+        for location in locations:
+            patch = self.timed("recorte", location.rectify, gray)
+            if self.on_region is not None:
+                self.on_region(LOCALIZED_METHOD, patch)
+            for candidate in (patch, self.timed("realce", binarize, patch)):
+                qr_url = self.decode(candidate)
+                if qr_url:
+                    return qr_url, True
+        return None, bool(locations)
+
+    def strategies_for(self, template: Optional[str]) -> List[Tuple[str, Optional[RectFunc]]]:
+        """Estrategias en el orden en que se intentan para la plantilla"""
+        strategies = self.strategies
+        if self.localize:
+            strategies = [(LOCALIZED_METHOD, None)] + strategies
+        if self.templates is not None:
+            strategies = self.templates.qr_strategies(template) + strategies
+        if self.histogram is not None:
+            strategies = self.histogram.order(template or DEFAULT_TEMPLATE, strategies)
+        return strategies
+
+    def levels(self, planes: ImagePlanes) -> List[ImagePlanes]:
+        """
+        Niveles de la pirámide a intentar, del más reducido a la imagen
+        completa. Se omiten los niveles cuyo lado mayor quedaría por debajo de
+        PYRAMID_MIN_SIDE (el QR ya no tendría suficientes px por módulo).
+        """
+        longest = planes.longest_side
+        scales = [scale for scale in sorted(self.pyramid) if scale < 1 and longest * scale >= PYRAMID_MIN_SIDE]
+        return [planes.scaled(scale) for scale in scales] + [planes]
+
+    def run(self, image: Union[np.ndarray, ImagePlanes],
+            template: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        Devuelve (método, qr_url) con la primera estrategia que encuentra un QR
+        válido, empezando por el nivel más reducido de la pirámide.
+        """
+        strategies = self.strategies_for(template)
+        template = template or DEFAULT_TEMPLATE
+        if self.histogram is not None:
+            self.histogram.record_image(template)
+
+        planes = image if isinstance(image, ImagePlanes) else ImagePlanes(image)
+        self.last_scale = None
+        skip_localize = False
+        for level in self.timed("carga", self.levels, planes):
+            found = self.run_level(level, strategies, template, skip_localize)
+            if found:
+                self.last_scale = level.scale
+                return found
+            if self._located is False:
+                if self.skip_unlocated:
+                    break
+                # La ubicación ya se hace sobre una copia de LOCATE_MAX_SIDE px:
+                # si en este nivel no hay QR, en los siguientes tampoco
+                skip_localize = True
+        return None
+
+    def run_level(self, planes: ImagePlanes, strategies: List[Tuple[str, Optional[RectFunc]]],
+                  template: str, skip_localize: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Estrategias sobre un nivel de la pirámide (planos compartidos por todas
+        las regiones). Con skip_localize no se vuelven a ubicar los QR.
+        """
+        height, width = self.timed("carga", lambda: planes.shape)
+        tried: Dict[str, List[Rect]] = {name: [] for name in PLANES}
+        # En los niveles reducidos solo se intentan los recortes dirigidos (plantilla
+        # y QR ubicados); las regiones fijas, que fallan más, una sola vez a tamaño completo
+        skip_regions = planes.scale < 1
+        self._located = None
+
+        for method_name, rect_func in strategies:
+            if skip_regions and (method_name, rect_func) in self.strategies:
+                continue
+            if skip_localize and rect_func is None:
+                continue
+            self.log(f"Intentando método: {method_name} (escala {planes.scale:g})")
+            self._method = method_name
+
+            if rect_func is None:
+                started = time.perf_counter()
+                try:
+                    qr_url, located = self.decode_located(planes)
+                except Exception as e:
+                    self.log(f"Error en {method_name}: {e}")
+                    qr_url, located = None, True
+                if self.histogram is not None:
+                    self.histogram.record_attempt(template, method_name, bool(qr_url),
+                                                  time.perf_counter() - started)
+                self._located = located
+                if qr_url:
+                    return method_name, qr_url
+                if not located and self.skip_unlocated:
+                    self.log("Ningún QR ubicado: se omiten las regiones fijas")
+                    skip_regions = True
+                continue
+
+            rect = rect_func(height, width)
+            if rect is None or _area(rect) == 0:
+                continue
+
+            if self.on_region is not None:
+                self.on_region(method_name, crop(planes.image, rect))
+
+            started = time.perf_counter()
+            attempted = False
+            qr_url = None
+
+            for plane_name in PLANES:
+                if self._already_covered(rect, tried[plane_name]):
+                    self.log(f"Omitiendo {method_name} ({plane_name}): región ya decodificada")
+                    continue
+                tried[plane_name].append(rect)
+                attempted = True
+
+                try:
+                    plane = self.timed("realce", planes.plane, plane_name)
+                    qr_url = self.decode(self.timed("recorte", crop, plane, rect))
+                except Exception as e:
+                    self.log(f"Error en {method_name}: {e}")
+                    continue
+
+                if qr_url:
+                    break
+
+            if attempted and self.histogram is not None:
+                self.histogram.record_attempt(template, method_name, bool(qr_url), time.perf_counter() - started)
+
+            if qr_url:
+                return method_name, qr_url
+
+        return None
@@ -0,0 +1,159 @@
+"""
+Registro de plantillas de credenciales a partir de las máscaras de
+samples/mask/editables (t1_front.png, t1_back.png, ...).
+
+Cada máscara es un PNG RGBA del tamaño del lienzo del editor de recorte
+(790x490): la zona roja es opaca y los huecos transparentes marcan las
+regiones de interés. El hueco casi cuadrado más grande es el QR; el resto son
+campos de la credencial.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple, Dict, List
+import re
+
+import cv2
+import numpy as np
+
+from .strategies import Rect, RectFunc
+
+# Lienzo del editor de recorte (image-crop-editor.html)
+CANVAS_WIDTH = 790
+CANVAS_HEIGHT = 490
+
+# Directorio de máscaras incluido en el repositorio
+DEFAULT_MASK_DIR = Path(__file__).resolve().parents[2] / "samples" / "mask" / "editables"
+
+# Tolerancia de relación de aspecto para considerar normalizada una imagen
+ASPECT_TOLERANCE = 0.03
+
+# Un hueco es candidato a QR si es casi cuadrado y suficientemente grande
+QR_MIN_AREA = 10000
+QR_MAX_ASPECT = 1.3
+
+# Margen alrededor del QR (zona de silencio que zbar necesita), en px del lienzo
+QR_MARGIN = 8
+
+# Huecos más pequeños se consideran ruido de la máscara
+MIN_REGION_AREA = 200
+
+_MASK_NAME_RE = re.compile(r"^t\d+_(front|back)$")
+
+@dataclass(frozen=True)
+class TemplateLayout:
+    """Regiones de interés de una plantilla, en coordenadas del lienzo (y0, y1, x0, x1)"""
+    name: str
+    width: int
+    height: int
+    qr_rect: Optional[Rect]
+    field_rects: Tuple[Rect, ...]
+
+    def scale(self, rect: Rect, height: int, width: int, margin: int = 0) -> Rect:
+        """Llevar un rectángulo del lienzo al tamaño de la imagen, con margen opcional"""
+        sy = height / self.height
+        sx = width / self.width
+        y0, y1, x0, x1 = rect
+        return (
+            max(0, int((y0 - margin) * sy)),
+            min(height, int(round((y1 + margin) * sy))),
+            max(0, int((x0 - margin) * sx)),
+            min(width, int(round((x1 + margin) * sx))),
+        )
+
+    def matches_aspect(self, height: int, width: int) -> bool:
+        """Indica si la imagen tiene la proporción del lienzo (imagen normalizada)"""
+        expected = self.width / self.height
+        return abs(width / height - expected) <= expected * ASPECT_TOLERANCE
+
+    def qr_rect_for(self, height: int, width: int) -> Optional[Rect]:
+        """Recorte del QR para una imagen normalizada de este tamaño"""
+        if self.qr_rect is None or not self.matches_aspect(height, width):
+            return None
+        return self.scale(self.qr_rect, height, width, QR_MARGIN)
+
+def layout_from_mask(name: str, mask: np.ndarray) -> TemplateLayout:
+    """Calcular las regiones de una máscara RGBA (huecos transparentes)"""
+    height, width = mask.shape[:2]
+    if mask.ndim == 3 and mask.shape[2] == 4:
+        holes = (mask[:, :, 3] == 0).astype(np.uint8)
+    else:
+        # Sin canal alfa: los huecos son las zonas que no son rojas
+        holes = (mask.reshape(height, width, -1)[:, :, -1] < 128).astype(np.uint8)
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(holes, connectivity=4)
+
+    regions: List[Tuple[int, Rect]] = []
+    for x, y, w, h, area in stats[1:count]:
+        if area >= MIN_REGION_AREA:
+            regions.append((int(area), (int(y), int(y + h), int(x), int(x + w))))
+
+    qr_rect = None
+    candidates = [
+        (area, rect) for area, rect in regions
+        if area >= QR_MIN_AREA
+        and max(rect[1] - rect[0], rect[3] - rect[2]) <= QR_MAX_ASPECT * min(rect[1] - rect[0], rect[3] - rect[2])
+    ]
+    if candidates:
+        qr_rect = max(candidates)[1]
+
+    fields = tuple(sorted(rect for _, rect in regions if rect != qr_rect))
+    return TemplateLayout(name=name, width=width, height=height, qr_rect=qr_rect, field_rects=fields)
+
+class TemplateRegistry:
+    """Plantillas cargadas una sola vez desde el directorio de máscaras"""
+
+    def __init__(self, layouts: Optional[Dict[str, TemplateLayout]] = None):
+        self.layouts: Dict[str, TemplateLayout] = layouts or {}
+
+    @classmethod
+    def load(cls, directory: Path = DEFAULT_MASK_DIR) -> "TemplateRegistry":
+        """Leer las máscaras t*_front.png / t*_back.png (registro vacío si no existen)"""
+        layouts = {}
+        directory = Path(directory)
+        if directory.is_dir():
+            for path in sorted(directory.glob("t*_*.png")):
+                if not _MASK_NAME_RE.match(path.stem):
+                    continue
+                mask = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+                if mask is None:
+                    continue
+                layouts[path.stem] = layout_from_mask(path.stem, mask)
+        return cls(layouts)
+
+    def get(self, name: Optional[str]) -> Optional[TemplateLayout]:
+        return self.layouts.get(name) if name else None
+
+    @property
+    def qr_templates(self) -> List[TemplateLayout]:
+        """Plantillas que tienen QR (p. ej. los reversos t1 y t2)"""
+        return [layout for layout in self.layouts.values() if layout.qr_rect is not None]
+
+    def qr_crop(self, image: np.ndarray, name: str) -> Optional[np.ndarray]:
+        """Recorte del QR de una imagen normalizada (vista, sin copia) o None"""
+        layout = self.get(name)
+        if layout is None:
+            return None
+        rect = layout.qr_rect_for(*image.shape[:2])
+        if rect is None:
+            return None
+        y0, y1, x0, x1 = rect
+        return image[y0:y1, x0:x1]
+
+    def qr_strategies(self, template: Optional[str]) -> List[Tuple[str, RectFunc]]:
+        """
+        Estrategias de recorte directo del QR: la de la plantilla indicada, o
+        las de todas las plantillas con QR si no se conoce.
+        """
+        layout = self.get(template)
+        if layout is not None:
+            layouts = [layout] if layout.qr_rect is not None else []
+        else:
+            layouts = self.qr_templates
+        return [(f"local_plantilla_{layout.name}", layout.qr_rect_for) for layout in layouts]
+
+@lru_cache(maxsize=None)
+def get_template_registry(directory: str = str(DEFAULT_MASK_DIR)) -> TemplateRegistry:
+    """Registro compartido por proceso (las máscaras se leen una sola vez)"""
+    return TemplateRegistry.load(Path(directory))
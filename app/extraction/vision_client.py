@@ -0,0 +1,415 @@
+"""
+Cliente asíncrono de la API de visión usada como último recurso.
+
+Una sola instancia de httpx.AsyncClient mantiene un pool de conexiones
+keep-alive (HTTP/2 si el paquete h2 está instalado). Las llamadas se limitan
+por concurrencia (semáforo) y por tasa (token bucket), se reintentan con
+backoff exponencial y jitter ante 429/5xx o errores de red, y se descuentan de
+un presupuesto de costo por lote.
+
+Con batch_size > 1 las imágenes se agrupan (hasta batch_size imágenes o
+batch_wait_ms desde la primera) y se envían como varias partes de un mismo
+mensaje; la respuesta numerada se asigna de vuelta a cada imagen. Así el texto
+de las instrucciones y el viaje de red se pagan una vez por grupo.
+
+Para código síncrono (el CLI), BackgroundVisionClient ejecuta el cliente en
+un event loop propio en otro hilo y devuelve concurrent.futures.Future, de
+modo que el procesamiento local continúa mientras las llamadas están en curso.
+"""
+
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, Any, List, Tuple, Set
+import asyncio
+import base64
+import os
+import random
+import re
+import threading
+import time
+
+import httpx
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Precio por token para gpt-4o-mini
+COST_PER_TOKEN = 0.00000525
+
+PROMPT = "Extrae únicamente la URL del código QR de esta imagen. Responde solo con la URL completa, sin texto adicional."
+
+BATCH_PROMPT = (
+    "Recibirás {count} imágenes numeradas, cada una con un código QR. Extrae la URL de cada QR. "
+    "Responde una línea por imagen con el formato \"<número>: <URL>\" (o \"<número>: NINGUNO\" si no es legible), "
+    "sin texto adicional."
+)
+
+# Línea "3: http://..." de una respuesta agrupada (también "- Imagen 3: ...")
+_BATCH_LINE_RE = re.compile(r"^\s*(?:[-•]\s*)?(?:imagen\s*)?(\d+)\s*[:.)\-]\s*(\S+)", re.IGNORECASE)
+
+# Marcas de markdown que el modelo agrega a veces ("**1:** url", "`url`"); los
+# guiones bajos no se quitan porque pueden ser parte de la URL
+_MARKDOWN_RE = re.compile(r"[`*]")
+
+# Respuestas que vale la pena reintentar
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+@dataclass(frozen=True)
+class VisionAnswer:
+    """Respuesta de la API: texto devuelto, tokens y costo"""
+    content: Optional[str]
+    tokens: int
+    cost: float
+    skipped: Optional[str] = None  # Motivo si la llamada no se realizó (p. ej. "presupuesto")
+    error: Optional[str] = None  # Motivo si la API no respondió (red, 4xx/5xx tras los reintentos, formato)
+    image_bytes: int = 0  # Tamaño de la imagen enviada
+    latency: float = 0.0  # Segundos de la solicitud (compartidos por las imágenes de un grupo)
+
+class TokenBucket:
+    """Limitador de tasa: rate solicitudes por segundo con ráfagas de hasta capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class CostBudget:
+    """
+    Presupuesto de costo de un lote.
+
+    Antes de cada llamada se reserva el costo estimado (promedio de las
+    llamadas anteriores) y al terminar se ajusta al costo real, así las
+    llamadas concurrentes no pueden exceder el límite más allá de una
+    estimación. Es seguro entre hilos.
+    """
+
+    def __init__(self, limit: Optional[float], estimated_call_cost: float = 0.005):
+        self.limit = limit
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.calls = 0
+        self._estimate = estimated_call_cost
+        self._lock = threading.Lock()
+
+    @property
+    def estimate(self) -> float:
+        return self.spent / self.calls if self.calls else self._estimate
+
+    def try_reserve(self) -> Optional[float]:
+        """Reservar el costo estimado de una llamada; None si no alcanza"""
+        with self._lock:
+            amount = self.estimate
+            if self.limit is not None and self.spent + self.reserved + amount > self.limit:
+                return None
+            self.reserved += amount
+            return amount
+
+    def settle(self, reserved: float, actual: float) -> None:
+        with self._lock:
+            self.reserved -= reserved
+            self.spent += actual
+            self.calls += 1
+
+    def release(self, reserved: float) -> None:
+        with self._lock:
+            self.reserved -= reserved
+
+class VisionClient:
+    """Cliente asíncrono con pool de conexiones, límite de concurrencia, de tasa y reintentos"""
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, model: str = DEFAULT_MODEL,
+                 max_concurrency: int = 8, rate_per_second: float = 5.0, burst: Optional[float] = None,
+                 timeout: float = 30.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, batch_size: int = 1, batch_wait_ms: float = 250.0,
+                 image_detail: str = "auto"):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv('OPENAI_BASE_URL') or DEFAULT_BASE_URL).rstrip("/")
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self.image_detail = image_detail
+        self.calls = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.images_sent = 0
+        self._batch: List[Tuple[bytes, str, asyncio.Future]] = []
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        # Envíos de grupos en curso: el event loop solo guarda referencias débiles a las tareas
+        self._send_tasks: Set["asyncio.Task[None]"] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _ensure_started(self) -> None:
+        """Crear el pool y los limitadores en el event loop actual"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_http2_available(),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_per_second, self.burst)
+
+    async def aclose(self) -> None:
+        # Enviar el grupo en formación y esperar los envíos en curso: toda imagen encolada recibe respuesta
+        self._flush_batch()
+        if self._send_tasks:
+            await asyncio.gather(*self._send_tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def build_payload(self, images: List[Tuple[bytes, str]]) -> Dict[str, Any]:
+        """Mensaje con una o varias imágenes (numeradas si son varias)"""
+        if len(images) == 1:
+            content = [{"type": "text", "text": PROMPT}]
+        else:
+            content = [{"type": "text", "text": BATCH_PROMPT.format(count=len(images))}]
+
+        for number, (image_bytes, mime) in enumerate(images, 1):
+            if len(images) > 1:
+                content.append({"type": "text", "text": f"Imagen {number}:"})
+            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{mime};base64,{image_base64}", "detail": self.image_detail}
+            })
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": 150 * len(images)
+        }
+
+    @staticmethod
+    def parse_content(content: str, count: int) -> List[Optional[str]]:
+        """
+        Asignar la respuesta a cada imagen (una línea numerada por imagen si
+        son varias). None indica que la respuesta no incluye esa imagen; un
+        "NINGUNO" se conserva como respuesta (el modelo vio la imagen).
+        """
+        content = _MARKDOWN_RE.sub("", content)
+        if count == 1:
+            return [content.strip() or None]
+
+        answers: List[Optional[str]] = [None] * count
+        for line in content.splitlines():
+            match = _BATCH_LINE_RE.match(line)
+            if not match:
+                continue
+            index = int(match.group(1)) - 1
+            if 0 <= index < count and answers[index] is None:
+                answers[index] = match.group(2)
+        return answers
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Backoff exponencial con jitter completo (respeta Retry-After si viene)"""
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def post(self, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Enviar una solicitud con límites y reintentos. Devuelve el JSON (o None)
+        y los segundos desde que obtuvo un lugar en el pool, reintentos incluidos.
+        """
+        self._ensure_started()
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    await self._bucket.acquire()
+                    retry_after = None
+                    try:
+                        self.calls += 1
+                        response = await self._client.post(f"{self.base_url}/chat/completions", json=payload)
+                        if response.status_code == 200:
+                            return response.json(), time.monotonic() - started
+                        if response.status_code not in RETRY_STATUS:
+                            return None, time.monotonic() - started
+                        retry_after = response.headers.get("retry-after")
+                    except (httpx.TransportError, ValueError):
+                        pass
+
+                    if attempt < self.max_retries:
+                        self.retries += 1
+                        await asyncio.sleep(self._backoff(attempt, retry_after))
+                return None, time.monotonic() - started
+            finally:
+                self.in_flight -= 1
+
+    async def request(self, images: List[Tuple[bytes, str]]) -> List[VisionAnswer]:
+        """Una solicitud con una o varias imágenes; tokens y costo se reparten entre ellas"""
+        self.images_sent += len(images)
+        data, latency = await self.post(self.build_payload(images))
+        if data is None:
+            return [VisionAnswer(None, 0, 0.0, error="sin_respuesta", image_bytes=len(image_bytes), latency=latency)
+                    for image_bytes, _ in images]
+
+        tokens = data.get('usage', {}).get('total_tokens', 0)
+        error = None
+        try:
+            contents = self.parse_content(data['choices'][0]['message']['content'], len(images))
+        except (KeyError, IndexError, TypeError, AttributeError):
+            contents = [None] * len(images)
+            error = "respuesta_invalida"
+
+        share = tokens // len(images)
+        shares = [share + (1 if i < tokens % len(images) else 0) for i in range(len(images))]
+        answers = [
+            VisionAnswer(content, n, n * COST_PER_TOKEN,
+                         error=error or (None if content is not None else "sin_linea"),
+                         image_bytes=len(image_bytes), latency=latency)
+            for content, n, (image_bytes, _) in zip(contents, shares, images)
+        ]
+
+        missing = [i for i, answer in enumerate(answers) if answer.error == "sin_linea"]
+        if len(images) > 1 and missing:
+            # Imágenes sin línea propia en la respuesta agrupada: se preguntan de una en una
+            retried = await asyncio.gather(*(self.request([images[i]]) for i in missing))
+            for i, (answer,) in zip(missing, retried):
+                n = answers[i].tokens + answer.tokens
+                answers[i] = replace(answer, tokens=n, cost=n * COST_PER_TOKEN, latency=latency + answer.latency)
+        return answers
+
+    def _enqueue(self, image_bytes: bytes, mime: str) -> "asyncio.Future[VisionAnswer]":
+        """Agregar una imagen al grupo en formación; se envía al llenarse o al vencer la espera"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((image_bytes, mime, future))
+
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = loop.call_later(self.batch_wait, self._flush_batch)
+        return future
+
+    def _flush_batch(self) -> None:
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.ensure_future(self._send_batch(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send_batch(self, batch: List[Tuple[bytes, str, asyncio.Future]]) -> None:
+        try:
+            answers = await self.request([(image_bytes, mime) for image_bytes, mime, _ in batch])
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
+
+    async def ask(self, image_bytes: bytes, mime: str = "image/png",
+                  budget: Optional[CostBudget] = None) -> VisionAnswer:
+        """Pedir a la API la URL del QR de una imagen codificada (agrupada si batch_size > 1)"""
+        if not self.enabled:
+            return VisionAnswer(None, 0, 0.0, skipped="sin_api_key")
+
+        reserved = budget.try_reserve() if budget is not None else 0.0
+        if reserved is None:
+            return VisionAnswer(None, 0, 0.0, skipped="presupuesto")
+
+        answer = VisionAnswer(None, 0, 0.0)
+        try:
+            if self.batch_size > 1:
+                self._ensure_started()
+                answer = await self._enqueue(image_bytes, mime)
+            else:
+                answer = (await self.request([(image_bytes, mime)]))[0]
+            return answer
+        finally:
+            if budget is not None:
+                budget.settle(reserved, answer.cost)
+
+class BackgroundVisionClient:
+    """Ejecuta un VisionClient en un event loop dedicado para usarlo desde código síncrono"""
+
+    def __init__(self, client: VisionClient):
+        self.client = client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="vision-client", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(self, image_bytes: bytes, mime: str = "image/png",
+               budget: Optional[CostBudget] = None) -> "Future[VisionAnswer]":
+        """Encolar una llamada; el resultado llega en el Future devuelto"""
+        loop = self._start()
+        return asyncio.run_coroutine_threadsafe(self.client.ask(image_bytes, mime, budget), loop)
+
+    def ask(self, image_bytes: bytes, mime: str = "image/png",
+            budget: Optional[CostBudget] = None) -> VisionAnswer:
+        """Llamada bloqueante (para procesar una sola imagen)"""
+        return self.submit(image_bytes, mime, budget).result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
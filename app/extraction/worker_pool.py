@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any
+import asyncio
+import os
+
+from ..config import settings
+from .qr_extractor_pro import QRExtractorPro
+from .result_cache import ResultCache
+from .vision_client import VisionClient, CostBudget
+
+# Extractor propio de cada proceso worker (se crea en el initializer)
+_extractor: Optional[QRExtractorPro] = None
+
+def _init_worker() -> None:
+    """
+    Inicializar el extractor una sola vez por proceso. El histograma de
+    estrategias configurado solo se lee: cada worker sigue aprendiendo en
+    memoria pero no escribe el archivo.
+    """
+    global _extractor
+    _extractor = _create_extractor()
+
+def _create_cache() -> Optional[ResultCache]:
+    if not settings.extraction_cache_enabled:
+        return None
+    return ResultCache(
+        path=settings.extraction_cache_path,
+        ttl_seconds=settings.extraction_cache_ttl_seconds,
+        max_entries=settings.extraction_cache_max_entries,
+        memory_entries=settings.extraction_cache_memory_entries
+    )
+
+def _create_extractor() -> QRExtractorPro:
+    return QRExtractorPro(
+        api_key=settings.openai_api_key,
+        strategy_stats_path=settings.extraction_strategy_stats_path,
+        mask_dir=settings.extraction_mask_dir,
+        localize=settings.extraction_localize,
+        skip_unlocated=settings.extraction_skip_unlocated,
+        pyramid=settings.extraction_pyramid,
+        timings=settings.extraction_timings,
+        cache=_create_cache()
+    )
+
+def extract_qr_from_bytes(archivo: str, data: bytes, use_api: bool,
+                          template: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extraer el QR de una imagen codificada (se ejecuta dentro del worker).
+    La consulta a la API queda diferida: la hace el proceso principal.
+    """
+    if _extractor is None:
+        _init_worker()
+    return _extractor.process_bytes(data, archivo, use_api=use_api, template=template, defer_api=True)
+
+class ExtractionPool:
+    """
+    Pool de procesos para la extracción de QR, dimensionado al número de núcleos.
+
+    Igual que el pool de bcrypt, los contadores solo se modifican desde el event
+    loop y se exponen para monitoreo (profundidad de cola, en curso, completados).
+
+    Los workers solo ejecutan las estrategias locales; cuando hace falta la API
+    la consulta se hace aquí con el cliente asíncrono, sin ocupar un worker
+    mientras se espera la respuesta.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._finisher: Optional[QRExtractorPro] = None
+        self.vision = VisionClient(
+            settings.openai_api_key,
+            base_url=settings.vision_api_base_url,
+            max_concurrency=settings.vision_api_max_concurrency,
+            rate_per_second=settings.vision_api_rate_per_second,
+            timeout=settings.vision_api_timeout_seconds,
+            max_retries=settings.vision_api_max_retries,
+            batch_size=settings.vision_api_batch_size,
+            batch_wait_ms=settings.vision_api_batch_wait_ms,
+            image_detail=settings.vision_api_image_detail
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Imágenes esperando un worker libre"""
+        return max(0, self.in_flight - self.workers)
+
+    @property
+    def broken(self) -> bool:
+        """El pool actual perdió un worker y aún no se reemplaza (ver extract)"""
+        return bool(getattr(self._executor, "_broken", False))
+
+    def start(self) -> None:
+        """Crear el pool de procesos si aún no existe"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def shutdown(self) -> None:
+        """Detener el pool cancelando las tareas que aún no iniciaron"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _discard_broken(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Descartar un pool cuyo worker murió (OOM, segfault en zbar/cv2): todas
+        sus tareas fallan con BrokenProcessPool. start() crea uno nuevo; solo
+        la primera imagen que lo detecta lo reemplaza.
+        """
+        if self._executor is executor:
+            self._executor = None
+            self.restarts += 1
+            print("Pool de extracción roto (un worker terminó abruptamente): se recrea")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def recover(self) -> bool:
+        """Descartar el pool si está roto sin esperar a la siguiente imagen; True si lo estaba"""
+        executor = self._executor
+        if executor is None or not self.broken:
+            return False
+        self._discard_broken(executor)
+        return True
+
+    async def aclose(self) -> None:
+        """Cerrar el pool de conexiones de la API"""
+        await self.vision.aclose()
+
+    def new_budget(self) -> CostBudget:
+        """Presupuesto de API para un lote"""
+        return CostBudget(settings.extraction_api_budget_usd)
+
+    async def extract(self, archivo: str, data: bytes, use_api: bool = True,
+                      template: Optional[str] = None, budget: Optional[CostBudget] = None) -> Dict[str, Any]:
+        """Extraer el QR de una imagen en un proceso worker (y con la API si hace falta)"""
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            # Si el pool se rompe la imagen se reintenta una vez en un pool nuevo
+            for attempt in range(2):
+                self.start()
+                executor = self._executor
+                try:
+                    result = await loop.run_in_executor(executor, extract_qr_from_bytes,
+                                                        archivo, data, use_api, template)
+                    break
+                except BrokenProcessPool:
+                    self._discard_broken(executor)
+                    if attempt:
+                        raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            return QRExtractorPro.error_result(archivo, f"Error en el worker de extracción: {e}")
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+        if '_fallback' in result:
+            image_bytes, mime = result['_fallback']
+            answer = await self.vision.ask(image_bytes, mime, budget)
+            if self._finisher is None:
+                # Solo valida y guarda en caché las respuestas de la API
+                self._finisher = _create_extractor()
+            # La escritura en la caché (SQLite si es compartida) no se hace en el event loop
+            await loop.run_in_executor(None, self._finisher.finish_fallback, result, answer)
+
+        return result
+
+# Instancia global del pool de extracción
+extraction_pool = ExtractionPool(workers=settings.extraction_workers)
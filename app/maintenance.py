@@ -0,0 +1,54 @@
+import asyncio
+
+from .config import settings
+from .database import SessionLocal
+from .auth_service import AuthService
+from .token_denylist import token_denylist
+
+async def purge_stale_refresh_tokens(batch_size: int) -> int:
+    """
+    Eliminar en lotes acotados todos los refresh tokens expirados o revocados.
+
+    Cada lote usa su propia sesión y transacción corta para no retener el
+    bloqueo de escritura de SQLite mientras se limpia la tabla.
+    """
+    total = 0
+    while True:
+        async with SessionLocal() as db:
+            deleted = await AuthService(db).purge_refresh_tokens(batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        # Ceder el event loop entre lotes
+        await asyncio.sleep(0)
+
+async def refresh_token_sweeper() -> None:
+    """Tarea de fondo que limpia la tabla refresh_tokens periódicamente"""
+    interval = settings.refresh_token_sweep_interval_seconds
+    while True:
+        try:
+            deleted = await purge_stale_refresh_tokens(settings.refresh_token_sweep_batch_size)
+            if deleted:
+                print(f"Limpieza de refresh tokens: {deleted} registros eliminados")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error en la limpieza de refresh tokens: {e}")
+        await asyncio.sleep(interval)
+
+async def sync_token_denylist() -> int:
+    """Sincronizar el mapa de revocación con la base de datos"""
+    async with SessionLocal() as db:
+        return await token_denylist.sync(db)
+
+async def token_denylist_syncer() -> None:
+    """Tarea de fondo que trae las revocaciones hechas por otros workers"""
+    interval = settings.token_revocation_sync_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_token_denylist()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error al sincronizar revocaciones de tokens: {e}")
@@ -0,0 +1,263 @@
+from typing import Optional, Dict, List, Tuple, Callable, Iterable, Any
+import math
+import time
+
+from sqlalchemy import event
+
+# Cubetas (segundos) de los histogramas de latencia; la última (+Inf) es implícita
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Etiqueta de las peticiones que no corresponden a ninguna ruta de la API (404,
+# archivos estáticos de la documentación): se agrupan para no crear una serie por URL
+UNMATCHED_ROUTE = "sin_ruta"
+
+# Starlette agrega "; charset=utf-8" a los tipos text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LabelValues = Tuple[str, ...]
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Contador monótono por combinación de etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Histograma de cubetas fijas por combinación de etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Por serie: conteo por cubeta (sin acumular; la última es +Inf) y [suma, conteo]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+        counts, totals = series
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        counts[index] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, (total, count)) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_format_value(count)}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Métricas del proceso en formato de exposición de Prometheus.
+
+    Los contadores e histogramas no usan locks: solo se actualizan desde el
+    event loop (middleware, dependencias y eventos del pool de SQLAlchemy,
+    que con el motor asíncrono corren en el mismo hilo). Los gauges se leen
+    del estado de cada componente (pools, cachés) solo al consultar /metrics,
+    sin costo por petición.
+    """
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self._gauges: List[Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+        self.requests = self.add(Counter(
+            "http_requests_total", "Peticiones HTTP por ruta, método y código de estado",
+            ("method", "route", "status")
+        ))
+        self.request_seconds = self.add(Histogram(
+            "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta y método",
+            ("method", "route")
+        ))
+        self.in_flight = 0
+        self.db_checkout_seconds = self.add(Histogram(
+            "db_pool_checkout_seconds", "Espera para obtener una conexión del pool de la base de datos"
+        ))
+        self.db_query_seconds = self.add(Histogram(
+            "db_query_duration_seconds", "Duración de las sentencias SQL"
+        ))
+        self.password_hash_seconds = self.add(Histogram(
+            "password_hash_duration_seconds", "Duración de las operaciones bcrypt (incluye la espera en cola)",
+            ("operation",)
+        ))
+        self.token_verifications = self.add(Counter(
+            "auth_token_verifications_total", "Verificaciones de access tokens por resultado",
+            ("result",)
+        ))
+
+        self.gauge("http_requests_in_flight", "Peticiones HTTP en curso", lambda: [({}, self.in_flight)])
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str,
+              collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        """Registrar un gauge (o contador ya acumulado por el componente) leído al exportar"""
+        self._gauges.append((name, documentation, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, documentation, collect in self._gauges:
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"])
+            for labels, value in collect():
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP.
+
+    La ruta se etiqueta con la plantilla de FastAPI (p. ej.
+    /api/v1/clients/{client_id}), que el router deja en scope["route"] al
+    resolver la petición, de modo que la cardinalidad no crece con los ids.
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight -= 1
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            registry.requests.inc(method, path, str(status_code))
+            registry.request_seconds.observe(elapsed, method, path)
+
+class TimedCheckoutPool:
+    """
+    Mixin de pool de SQLAlchemy que mide la espera de cada checkout (incluye
+    abrir la conexión si el pool no tiene una libre). Se combina con la clase
+    de pool del motor en timed_pool_class().
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.db_checkout_seconds.observe(time.perf_counter() - started)
+
+def timed_pool_class(pool_class: type) -> type:
+    """Subclase de pool_class que registra la espera de checkout en las métricas"""
+    return type(f"Timed{pool_class.__name__}", (TimedCheckoutPool, pool_class), {})
+
+def instrument_engine(sync_engine) -> None:
+    """Medir la duración de cada sentencia SQL del motor"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is not None:
+            metrics.db_query_seconds.observe(time.perf_counter() - started)
+
+def register_app_gauges(registry: "MetricsRegistry") -> None:
+    """Gauges de los componentes de la aplicación (pools y cachés), leídos al exportar"""
+    from .database import engine
+    from .password_hasher import password_hasher
+    from .token_cache import token_cache
+    from .extraction.worker_pool import extraction_pool
+
+    def db_pool():
+        pool = engine.sync_engine.pool
+        values = []
+        for state, method in (("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow")):
+            if hasattr(pool, method):
+                # QueuePool.overflow() es negativo mientras el pool no se llena
+                values.append(({"state": state}, max(0, getattr(pool, method)())))
+        return values
+
+    registry.gauge("db_pool_connections", "Conexiones del pool de la base de datos por estado", db_pool)
+
+    registry.gauge("password_hash_in_flight", "Operaciones bcrypt en curso o en cola",
+                   lambda: [({}, password_hasher.in_flight)])
+    registry.gauge("password_hash_queue_depth", "Operaciones bcrypt esperando un worker",
+                   lambda: [({}, password_hasher.queue_depth)])
+    registry.gauge("password_hash_rejected_total", "Operaciones bcrypt rechazadas con 503 por saturación",
+                   lambda: [({}, password_hasher.rejected)])
+
+    registry.gauge("token_cache_requests_total", "Búsquedas en el caché de access tokens por resultado",
+                   lambda: [({"result": "hit"}, token_cache.hits), ({"result": "miss"}, token_cache.misses)])
+    registry.gauge("token_cache_entries", "Entradas en el caché de access tokens",
+                   lambda: [({}, len(token_cache))])
+
+    registry.gauge("extraction_in_flight", "Imágenes en extracción o en cola en el pool de procesos",
+                   lambda: [({}, extraction_pool.in_flight)])
+    registry.gauge("extraction_queue_depth", "Imágenes esperando un worker de extracción",
+                   lambda: [({}, extraction_pool.queue_depth)])
+    registry.gauge("extraction_images_total", "Imágenes procesadas por el pool de extracción",
+                   lambda: [({}, extraction_pool.completed)])
+    registry.gauge("extraction_failures_total", "Imágenes cuyo worker de extracción falló",
+                   lambda: [({}, extraction_pool.failed)])
+
+# Registro global de métricas del proceso
+metrics = MetricsRegistry()
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
+import hashlib
 import secrets
 import string
 
@@ -29,6 +30,10 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
     
+    # Generación de tokens: los access tokens con una generación menor están revocados
+    token_generation = Column(Integer, default=0, server_default="0", nullable=False)
+    tokens_revoked_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    
     # Relación con clientes
     clients = relationship("Client", back_populates="user")
     
@@ -38,9 +43,13 @@ class User(Base):
 class RefreshToken(Base):
     """Modelo para tokens de refresh"""
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Respalda revoke_all_user_tokens
+        Index("ix_refresh_tokens_user_revoked", "user_id", "is_revoked"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(Text, unique=True, index=True, nullable=False)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256 del JWT, nunca el token
     user_id = Column(Integer, nullable=False)  # Foreign key a users.id
     expires_at = Column(DateTime(timezone=True), nullable=False)
     is_revoked = Column(Boolean, default=False)
@@ -56,11 +65,20 @@ class RefreshToken(Base):
     def is_valid(self) -> bool:
         """Verifica si el token es válido (no expirado y no revocado)"""
         return not self.is_expired() and not self.is_revoked
+    
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """Huella SHA-256 (hex, 64 caracteres) con la que se indexa el refresh token"""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
 class Client(Base):
     """Modelo de cliente para credenciales de identificación"""
     __tablename__ = "clients"
+    __table_args__ = (
+        # Respalda el listado paginado por cursor (orden created_at, id) filtrado por usuario y estado
+        Index("ix_clients_user_active_created", "user_id", "is_active", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)
@@ -89,4 +107,12 @@ class Client(Base):
     @staticmethod
     def generate_client_secret() -> str:
         """Genera un client_secret único de 64 caracteres"""
-        return ''.join(secrets.choice(string.ascii_letters + string.digits + string.punctuation.replace('"', '').replace("'", '')) for _ in range(64))
\ No newline at end of file
+        return ''.join(secrets.choice(string.ascii_letters + string.digits + string.punctuation.replace('"', '').replace("'", '')) for _ in range(64))
+
+class SchemaVersion(Base):
+    """Marcador de la versión del esquema (una sola fila, id=1); ver database.SCHEMA_VERSION"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,104 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from passlib.context import CryptContext
+from typing import Optional, Callable, Any
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException, status
+
+from .config import settings
+from .metrics import metrics
+
+# Contexto bcrypt único por proceso, compartido por AuthService y los workers del pool
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+def warm_up_crypto() -> None:
+    """Cargar el backend bcrypt por adelantado para no pagarlo en la primera petición"""
+    pwd_context.handler("bcrypt").get_backend()
+
+def _hash_password(password: str) -> str:
+    """Generar hash bcrypt (se ejecuta dentro del pool)"""
+    return pwd_context.hash(password)
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verificar contraseña bcrypt (se ejecuta dentro del pool)"""
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordHasherPool:
+    """
+    Pool dedicado para hash y verificación bcrypt fuera del event loop.
+
+    Los contadores solo se modifican desde el event loop, por lo que no requieren
+    locks. Cuando hay más de `workers + max_queue` operaciones pendientes se
+    responde 503 en lugar de acumular trabajo sin límite.
+    """
+
+    def __init__(self, workers: int = 0, max_queue: int = 64, executor_type: str = "thread"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.executor_type = executor_type
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Operaciones esperando un worker libre"""
+        return max(0, self.in_flight - self.workers)
+
+    def start(self) -> None:
+        """Crear el executor si aún no existe"""
+        if self._executor is not None:
+            return
+
+        warm_up_crypto()
+        if self.executor_type == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up_crypto)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self) -> None:
+        """Detener el executor esperando las operaciones en curso"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Ejecutar una operación en el pool respetando el límite de la cola"""
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio de autenticación saturado, intente nuevamente",
+                headers={"Retry-After": "1"},
+            )
+
+        self.start()
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            metrics.password_hash_seconds.observe(time.perf_counter() - started, operation)
+
+    async def hash(self, password: str) -> str:
+        """Generar hash de contraseña en el pool"""
+        return await self._run("hash", _hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verificar contraseña en el pool"""
+        return await self._run("verify", _verify_password, plain_password, hashed_password)
+
+# Instancia global del pool de hashing
+password_hasher = PasswordHasherPool(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    executor_type=settings.password_hash_executor
+)
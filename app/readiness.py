@@ -0,0 +1,93 @@
+from typing import Dict, Any, Tuple
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from .config import settings
+from .database import engine
+from .password_hasher import password_hasher
+from .extraction.worker_pool import extraction_pool
+
+async def _check_database() -> Dict[str, Any]:
+    """SELECT 1 con tiempo acotado (incluye obtener la conexión del pool)"""
+    started = time.perf_counter()
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout=settings.ready_db_timeout_seconds)
+    except asyncio.TimeoutError:
+        return {
+            "ok": False,
+            "error": f"Sin respuesta en {settings.ready_db_timeout_seconds:g} s",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    except Exception as e:
+        return {"ok": False, "error": str(e), "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {"ok": latency_ms <= settings.ready_db_max_latency_ms, "latency_ms": latency_ms}
+
+def _check_db_pool() -> Dict[str, Any]:
+    """Conexiones del pool; sin conexiones disponibles el worker no está listo"""
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        # NullPool/StaticPool (SQLite en desarrollo): cada sesión abre su conexión
+        return {"ok": True, "pool": type(pool).__name__}
+
+    checked_out = pool.checkedout()
+    # QueuePool.overflow() es negativo mientras el pool no se llena
+    overflow = max(0, pool.overflow())
+    capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+    return {
+        "ok": checked_out < capacity,
+        "pool": type(pool).__name__,
+        "checked_out": checked_out,
+        "overflow": overflow,
+        "capacity": capacity,
+    }
+
+def _check_extraction() -> Dict[str, Any]:
+    """
+    Cola del pool de procesos y su estado. Un pool roto (un worker murió)
+    solo devolvería errores: esta comprobación falla y lo descarta, de modo
+    que la siguiente imagen (o sonda) ya usa un pool nuevo aunque el
+    balanceador haya dejado de enviar tráfico.
+    """
+    queue_depth = extraction_pool.queue_depth
+    broken = extraction_pool.recover()
+    return {
+        "ok": queue_depth <= settings.ready_extraction_max_queue and not broken,
+        "queue_depth": queue_depth,
+        "in_flight": extraction_pool.in_flight,
+        "max_queue": settings.ready_extraction_max_queue,
+        "broken": broken,
+        "restarts": extraction_pool.restarts,
+    }
+
+def _check_password_hasher() -> Dict[str, Any]:
+    """El pool de bcrypt responde 503 a partir de max_queue operaciones en espera"""
+    queue_depth = password_hasher.queue_depth
+    return {
+        "ok": queue_depth < password_hasher.max_queue,
+        "queue_depth": queue_depth,
+        "max_queue": password_hasher.max_queue,
+    }
+
+async def check_readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    Estado de las dependencias del worker: base de datos (latencia de un
+    SELECT 1), pool de conexiones y colas de extracción y bcrypt. Devuelve
+    si el worker puede recibir tráfico y el detalle de cada comprobación.
+    """
+    checks = {
+        "database": await _check_database(),
+        "db_pool": _check_db_pool(),
+        "extraction": _check_extraction(),
+        "password_hasher": _check_password_hasher(),
+    }
+    ready = all(check["ok"] for check in checks.values())
+    return ready, {"status": "ready" if ready else "not_ready", "checks": checks}
@@ -1,36 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from ..database import get_db
 from ..auth_service import AuthService
+from ..token_cache import token_cache, CachedUser
+from ..token_denylist import token_denylist
 from ..schemas import (
     UserLogin, UserResponse, TokenResponse, 
-    RefreshTokenRequest, MessageResponse, ErrorResponse, UserRegister
+    RefreshTokenRequest, MessageResponse, ErrorResponse, UserRegister, UserActiveUpdate
 )
 from ..models import UserRole
 from ..config import settings
+from ..metrics import metrics
 
 router = APIRouter()
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), 
-                    db: Session = Depends(get_db)):
+def get_auth_service(db: AsyncSession = Depends(get_db)) -> AuthService:
+    """Dependencia que entrega el servicio de autenticación de la petición"""
+    return AuthService(db)
+
+def raise_revoked_token() -> None:
+    """Responder 401 para un access token revocado por cierre de sesión"""
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token revocado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), 
+                    auth_service: AuthService = Depends(get_auth_service)):
     """Dependencia para obtener el usuario actual desde el JWT"""
-    auth_service = AuthService(db)
+    token = credentials.credentials
+    
+    # Tokens ya verificados: se evita decodificar el JWT y consultar la base de datos
+    cached = token_cache.get(token)
+    if cached:
+        payload, current_user = cached
+        if token_denylist.is_revoked(current_user.id, payload.get("gen", 0)):
+            metrics.token_verifications.inc("revoked")
+            raise_revoked_token()
+        metrics.token_verifications.inc("cached")
+        return current_user
     
     # Verificar token
-    payload = auth_service.verify_token(credentials.credentials, "access")
+    payload = auth_service.verify_token(token, "access")
     if not payload:
+        metrics.token_verifications.inc("invalid")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Revocación por generación: comprobación O(1) en memoria, sin consulta
+    if token_denylist.is_revoked(payload.get("user_id"), payload.get("gen", 0)):
+        metrics.token_verifications.inc("revoked")
+        raise_revoked_token()
+    
     # Obtener usuario
-    user = auth_service.get_user_by_id(payload.get("user_id"))
+    user = await auth_service.get_user_by_id(payload.get("user_id"))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,11 +76,21 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    # La fila del usuario es la fuente de verdad si el mapa en memoria aún no se sincronizó
+    if user.token_generation > payload.get("gen", 0):
+        token_denylist.update(user.id, user.token_generation)
+        metrics.token_verifications.inc("revoked")
+        raise_revoked_token()
+    
+    metrics.token_verifications.inc("verified")
+    current_user = CachedUser.from_user(user)
+    token_cache.set(token, payload, current_user)
+    
+    return current_user
 
-def get_admin_user(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_admin_user(current_user = Depends(get_current_user), 
+                         auth_service: AuthService = Depends(get_auth_service)):
     """Dependencia para verificar que el usuario actual sea administrador"""
-    auth_service = AuthService(db)
     auth_service.require_admin_role(current_user)
     return current_user
 
@@ -64,12 +105,10 @@ def get_admin_user(current_user = Depends(get_current_user), db: Session = Depen
         422: {"description": "Error de validación", "model": ErrorResponse}
     }
 )
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, auth_service: AuthService = Depends(get_auth_service)):
     """Endpoint para autenticación de usuarios"""
-    auth_service = AuthService(db)
-    
     # Autenticar usuario
-    user = auth_service.authenticate_user(
+    user = await auth_service.authenticate_user(
         user_credentials.username, 
         user_credentials.password
     )
@@ -83,9 +122,9 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     
     # Crear tokens
     access_token = auth_service.create_access_token(
-        data={"sub": user.username, "user_id": user.id}
+        data={"sub": user.username, "user_id": user.id, "gen": user.token_generation}
     )
-    refresh_token = auth_service.create_refresh_token(user.id)
+    refresh_token = await auth_service.create_refresh_token(user.id)
     
     return TokenResponse(
         access_token=access_token,
@@ -105,12 +144,10 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         422: {"description": "Error de validación", "model": ErrorResponse}
     }
 )
-async def refresh_token(token_request: RefreshTokenRequest, db: Session = Depends(get_db)):
+async def refresh_token(token_request: RefreshTokenRequest, auth_service: AuthService = Depends(get_auth_service)):
     """Endpoint para renovar tokens de acceso"""
-    auth_service = AuthService(db)
-    
     # Renovar tokens
-    tokens = auth_service.refresh_access_token(token_request.refresh_token)
+    tokens = await auth_service.refresh_access_token(token_request.refresh_token)
     
     if not tokens:
         raise HTTPException(
@@ -136,12 +173,10 @@ async def refresh_token(token_request: RefreshTokenRequest, db: Session = Depend
         401: {"description": "Token inválido", "model": ErrorResponse}
     }
 )
-async def logout(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def logout(current_user = Depends(get_current_user), auth_service: AuthService = Depends(get_auth_service)):
     """Endpoint para cerrar sesión del usuario"""
-    auth_service = AuthService(db)
-    
     # Revocar todos los refresh tokens del usuario
-    revoked_count = auth_service.revoke_all_user_tokens(current_user.id)
+    revoked_count = await auth_service.revoke_all_user_tokens(current_user.id)
     
     return MessageResponse(
         message=f"Sesión cerrada exitosamente. {revoked_count} tokens revocados."
@@ -188,17 +223,15 @@ async def get_user_info(current_user = Depends(get_current_user)):
 async def register_user(
     user_data: UserRegister, 
     admin_user = Depends(get_admin_user), 
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """Registrar un nuevo usuario (solo administradores)"""
-    auth_service = AuthService(db)
-    
     try:
         # Convertir el enum de string a UserRole
         role = UserRole.ADMIN if user_data.role == "admin" else UserRole.USER
         
         # Crear el usuario
-        new_user = auth_service.create_user(
+        new_user = await auth_service.create_user(
             username=user_data.username,
             email=user_data.email,
             password=user_data.password,
@@ -223,6 +256,8 @@ async def register_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -243,4 +278,49 @@ async def verify_token(current_user = Depends(get_current_user)):
     """Verificar si el token de acceso es válido"""
     return MessageResponse(
         message=f"Token válido para el usuario: {current_user.username}"
-    )
\ No newline at end of file
+    )
+
+@router.patch(
+    "/users/{user_id}/active",
+    response_model=UserResponse,
+    summary="Activar o desactivar usuario",
+    description="Permite a administradores activar o desactivar usuarios; al desactivar se revocan sus tokens",
+    responses={
+        200: {"description": "Estado actualizado", "model": UserResponse},
+        400: {"description": "Un administrador no puede desactivarse a sí mismo", "model": ErrorResponse},
+        403: {"description": "Acceso denegado - Se requieren privilegios de administrador", "model": ErrorResponse},
+        404: {"description": "Usuario no encontrado", "model": ErrorResponse},
+        401: {"description": "Token inválido", "model": ErrorResponse}
+    }
+)
+async def set_user_active(
+    user_id: int,
+    update: UserActiveUpdate,
+    admin_user = Depends(get_admin_user),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Activar o desactivar un usuario (solo administradores)"""
+    if user_id == admin_user.id and not update.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Un administrador no puede desactivarse a sí mismo"
+        )
+    
+    # Al desactivar se revocan sus access tokens (caché incluido) en todos los workers
+    user = await auth_service.set_user_active(user_id, update.is_active)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuario no encontrado"
+        )
+    
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        full_name=user.full_name,
+        role=user.role.value,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        last_login=user.last_login
+    )
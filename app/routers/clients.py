@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
+import base64
+import json
 
 from ..database import get_db
 from ..models import Client, User, UserRole
@@ -11,7 +14,8 @@ from ..schemas import (
     ClientResponse, 
     ClientUpdate, 
     ClientListResponse,
-    ErrorResponse
+    ErrorResponse,
+    PaginationModeEnum
 )
 from .auth import get_current_user, get_admin_user
 
@@ -36,7 +40,7 @@ def can_view_all_clients(current_user: User) -> bool:
 async def create_client(
     client_data: ClientCreate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Crear un nuevo cliente.
@@ -50,7 +54,7 @@ async def create_client(
         client_secret = Client.generate_client_secret()
         
         # Verificar unicidad del client_id (aunque es muy improbable que se repita)
-        while db.query(Client).filter(Client.client_id == client_id).first():
+        while (await db.execute(select(Client.id).where(Client.client_id == client_id))).first():
             client_id = Client.generate_client_id()
         
         # Crear el cliente
@@ -63,30 +67,54 @@ async def create_client(
         )
         
         db.add(db_client)
-        db.commit()
-        db.refresh(db_client)
+        await db.commit()
+        await db.refresh(db_client)
         
         return db_client
         
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error al crear el cliente. Intente nuevamente."
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
         )
 
+def encode_cursor(client: Client) -> str:
+    """Generar un cursor opaco a partir de (created_at, id) del último cliente de la página"""
+    raw = json.dumps({
+        "c": client.created_at.isoformat() if client.created_at else None,
+        "i": client.id
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decodificar un cursor opaco; lanza 400 si es inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.fromisoformat(data["c"]) if data.get("c") else None
+        return created_at, int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
 @router.get("/clients", response_model=ClientListResponse)
 async def list_clients(
-    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir (modo offset)"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a devolver"),
     active_only: bool = Query(True, description="Mostrar solo clientes activos"),
-    db: Session = Depends(get_db),
+    pagination: PaginationModeEnum = Query(PaginationModeEnum.OFFSET, description="Modo de paginación: offset o cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor (implica modo cursor)"),
+    include_total: bool = Query(False, description="Calcular el total de registros en modo cursor"),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -94,34 +122,72 @@ async def list_clients(
     
     - Usuarios normales: ven solo sus propios clientes
     - Administradores: ven todos los clientes del sistema
+    
+    En modo cursor la paginación es por (created_at, id) sin OFFSET y el total
+    solo se calcula si se solicita con include_total=true.
     """
-    query = db.query(Client)
+    query = select(Client)
     
     # Filtrar por usuario si no es admin
     if not can_view_all_clients(current_user):
-        query = query.filter(Client.user_id == current_user.id)
+        query = query.where(Client.user_id == current_user.id)
     
     # Filtrar por estado activo si se solicita
     if active_only:
-        query = query.filter(Client.is_active == True)
+        query = query.where(Client.is_active == True)
+    
+    if cursor is None and pagination == PaginationModeEnum.OFFSET:
+        # Contar total de registros
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        
+        # Aplicar paginación
+        clients = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+        
+        return ClientListResponse(
+            clients=clients,
+            total=total,
+            skip=skip,
+            limit=limit
+        )
+    
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    
+    page_query = query
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        # Se compara contra el valor almacenado de la fila ancla para no depender del
+        # formato de fecha del driver; si la fila ya no existe se usa el del cursor
+        anchor = func.coalesce(
+            select(Client.created_at).where(Client.id == cursor_id).scalar_subquery(),
+            cursor_created_at
+        )
+        page_query = page_query.where(or_(
+            Client.created_at > anchor,
+            and_(Client.created_at == anchor, Client.id > cursor_id)
+        ))
     
-    # Contar total de registros
-    total = query.count()
+    # Se pide un registro extra para saber si hay más páginas
+    page_query = page_query.order_by(Client.created_at, Client.id).limit(limit + 1)
+    clients = (await db.execute(page_query)).scalars().all()
     
-    # Aplicar paginación
-    clients = query.offset(skip).limit(limit).all()
+    has_more = len(clients) > limit
+    clients = clients[:limit]
     
     return ClientListResponse(
         clients=clients,
         total=total,
-        skip=skip,
-        limit=limit
+        skip=0,
+        limit=limit,
+        next_cursor=encode_cursor(clients[-1]) if has_more else None,
+        has_more=has_more
     )
 
 @router.get("/{client_id}", response_model=ClientResponse)
 async def get_client(
     client_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -130,7 +196,7 @@ async def get_client(
     - Usuarios normales: solo pueden ver sus propios clientes
     - Administradores: pueden ver cualquier cliente
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     
     if not client:
         raise HTTPException(
@@ -151,7 +217,7 @@ async def get_client(
 async def update_client(
     client_id: int,
     client_data: ClientUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -160,7 +226,7 @@ async def update_client(
     - Usuarios normales: solo pueden actualizar sus propios clientes
     - Administradores: pueden actualizar cualquier cliente
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     
     if not client:
         raise HTTPException(
@@ -184,13 +250,13 @@ async def update_client(
         
         client.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(client)
+        await db.commit()
+        await db.refresh(client)
         
         return client
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al actualizar el cliente"
@@ -199,7 +265,7 @@ async def update_client(
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_client(
     client_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -208,7 +274,7 @@ async def delete_client(
     - Usuarios normales: solo pueden eliminar sus propios clientes
     - Administradores: pueden eliminar cualquier cliente
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     
     if not client:
         raise HTTPException(
@@ -224,11 +290,11 @@ async def delete_client(
         )
     
     try:
-        db.delete(client)
-        db.commit()
+        await db.delete(client)
+        await db.commit()
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al eliminar el cliente"
@@ -237,7 +303,7 @@ async def delete_client(
 @router.post("/{client_id}/regenerate-secret", response_model=ClientResponse)
 async def regenerate_client_secret(
     client_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -246,7 +312,7 @@ async def regenerate_client_secret(
     - Usuarios normales: solo pueden regenerar el secret de sus propios clientes
     - Administradores: pueden regenerar el secret de cualquier cliente
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     
     if not client:
         raise HTTPException(
@@ -266,13 +332,13 @@ async def regenerate_client_secret(
         client.client_secret = Client.generate_client_secret()
         client.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(client)
+        await db.commit()
+        await db.refresh(client)
         
         return client
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al regenerar el client secret"
@@ -0,0 +1,191 @@
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Tuple, AsyncIterator, Optional
+import asyncio
+import io
+import json
+import zipfile
+
+from ..config import settings
+from ..extraction.worker_pool import extraction_pool
+from ..extraction.qr_extractor_pro import QRExtractorPro
+from ..schemas import ErrorResponse
+from .auth import get_current_user
+
+router = APIRouter(
+    responses={
+        401: {"model": ErrorResponse, "description": "No autorizado"},
+        422: {"model": ErrorResponse, "description": "Error de validación"}
+    }
+)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def _too_many_files() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"El lote excede el máximo de {settings.extraction_max_files} imágenes"
+    )
+
+def _batch_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"El lote excede el tamaño máximo de {settings.extraction_max_batch_bytes // (1024 * 1024)} MB"
+    )
+
+def _is_zip(upload: UploadFile, data: bytes) -> bool:
+    """Detectar un archivo zip por nombre, tipo de contenido o firma"""
+    filename = (upload.filename or "").lower()
+    return (
+        filename.endswith(".zip")
+        or upload.content_type in ("application/zip", "application/x-zip-compressed")
+        or data[:4] == b"PK\x03\x04"
+    )
+
+def _expand_zip(data: bytes, items: List[Tuple[str, bytes]], total_bytes: int) -> int:
+    """
+    Agregar al lote las imágenes contenidas en un zip, con límites de tamaño.
+    Devuelve el total de bytes del lote incluidas las imágenes agregadas.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archivo zip inválido"
+        )
+
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if len(items) >= settings.extraction_max_files:
+                raise _too_many_files()
+            # Se valida el tamaño declarado antes de descomprimir
+            if info.file_size > settings.extraction_max_image_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"La imagen {info.filename} excede el tamaño máximo permitido"
+                )
+            if total_bytes + info.file_size > settings.extraction_max_batch_bytes:
+                raise _batch_too_large()
+            data = archive.read(info)
+            total_bytes += len(data)
+            items.append((info.filename, data))
+
+    return total_bytes
+
+async def collect_batch_items(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """Leer las imágenes del lote (archivos individuales o zips) como (nombre, bytes)"""
+    items: List[Tuple[str, bytes]] = []
+    total_bytes = 0
+
+    for upload in files:
+        # El tamaño del archivo subido se conoce antes de leerlo a memoria
+        if upload.size is not None and upload.size > settings.extraction_max_batch_bytes:
+            raise _batch_too_large()
+        data = await upload.read()
+        if _is_zip(upload, data):
+            total_bytes = _expand_zip(data, items, total_bytes)
+            continue
+
+        if len(items) >= settings.extraction_max_files:
+            raise _too_many_files()
+        if len(data) > settings.extraction_max_image_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"La imagen {upload.filename} excede el tamaño máximo permitido"
+            )
+        total_bytes += len(data)
+        if total_bytes > settings.extraction_max_batch_bytes:
+            raise _batch_too_large()
+        items.append((upload.filename or f"imagen_{len(items) + 1}", data))
+
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El lote no contiene imágenes (.png, .jpg, .jpeg)"
+        )
+
+    return items
+
+async def stream_batch_results(items: List[Tuple[str, bytes]], use_api: bool,
+                               template: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Enviar cada imagen al pool de procesos y emitir una línea NDJSON por
+    resultado en cuanto termina. Se mantiene una ventana acotada de tareas por
+    lote para que un lote grande no acapare la cola del pool.
+    """
+    window = extraction_pool.workers * 2 + extraction_pool.vision.max_concurrency
+    budget = extraction_pool.new_budget()
+    pending = set()
+    next_index = 0
+
+    def submit_next() -> None:
+        nonlocal next_index
+        index = next_index
+        archivo, data = items[index]
+        items[index] = (archivo, b"")  # Liberar los bytes una vez enviados
+        next_index += 1
+
+        async def run() -> dict:
+            try:
+                result = await extraction_pool.extract(archivo, data, use_api=use_api,
+                                                       template=template, budget=budget)
+            except Exception as e:
+                # Un fallo en el proceso principal (p. ej. la consulta a la API) no corta el stream
+                print(f"Error al extraer {archivo}: {e}")
+                result = QRExtractorPro.error_result(archivo, str(e))
+            result["indice"] = index
+            return result
+
+        pending.add(asyncio.ensure_future(run()))
+
+    try:
+        while next_index < len(items) and len(pending) < window:
+            submit_next()
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+                if next_index < len(items):
+                    submit_next()
+    finally:
+        # Si el cliente se desconecta se cancelan las imágenes aún no procesadas
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+@router.post(
+    "/extract/qr/batch",
+    summary="Extracción de QR por lote",
+    description=(
+        "Recibe múltiples imágenes de credenciales (o archivos zip con imágenes) y devuelve "
+        "un resultado por imagen en formato NDJSON a medida que se procesan"
+    ),
+    responses={
+        200: {"description": "Resultados por imagen (application/x-ndjson)", "content": {"application/x-ndjson": {}}},
+        400: {"description": "Lote inválido", "model": ErrorResponse},
+        413: {"description": "Lote demasiado grande", "model": ErrorResponse}
+    }
+)
+async def extract_qr_batch(
+    files: List[UploadFile] = File(..., description="Imágenes .png/.jpg/.jpeg o archivos .zip"),
+    use_api: bool = Query(True, description="Usar la API de visión como último recurso"),
+    plantilla: Optional[str] = Query(
+        None,
+        pattern=r"^t\d+_(front|back)$",
+        description="Plantilla de las credenciales (p. ej. t1_back); si se omite se infiere de la ruta dentro del zip"
+    ),
+    current_user = Depends(get_current_user)
+):
+    """Extraer los códigos QR de un lote de credenciales INE"""
+    items = await collect_batch_items(files)
+
+    return StreamingResponse(
+        stream_batch_results(items, use_api, plantilla),
+        media_type="application/x-ndjson"
+    )
@@ -9,6 +9,11 @@ class UserRoleEnum(str, Enum):
     ADMIN = "admin"
     USER = "user"
 
+class PaginationModeEnum(str, Enum):
+    """Enum para el modo de paginación de listados"""
+    OFFSET = "offset"
+    CURSOR = "cursor"
+
 # Esquemas para autenticación
 class UserLogin(BaseModel):
     """Esquema para login de usuario"""
@@ -67,6 +72,17 @@ class UserRegister(BaseModel):
             }
         }
 
+class UserActiveUpdate(BaseModel):
+    """Esquema para activar o desactivar un usuario"""
+    is_active: bool = Field(..., description="Nuevo estado del usuario")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "is_active": False
+            }
+        }
+
 class UserResponse(BaseModel):
     """Esquema para respuesta de información de usuario"""
     id: int
@@ -235,9 +251,11 @@ class ClientListItem(BaseModel):
 class ClientListResponse(BaseModel):
     """Esquema para respuesta de lista de clientes con paginación"""
     clients: List[ClientListItem] = Field(..., description="Lista de clientes")
-    total: int = Field(..., description="Total de clientes")
+    total: Optional[int] = Field(None, description="Total de clientes (en modo cursor solo con include_total=true)")
     skip: int = Field(..., description="Registros omitidos")
     limit: int = Field(..., description="Límite de registros")
+    next_cursor: Optional[str] = Field(None, description="Cursor opaco para la siguiente página (modo cursor)")
+    has_more: Optional[bool] = Field(None, description="Indica si existen más registros (modo cursor)")
     
     class Config:
         json_schema_extra = {
@@ -256,6 +274,8 @@ class ClientListResponse(BaseModel):
                 ],
                 "total": 1,
                 "skip": 0,
-                "limit": 100
+                "limit": 100,
+                "next_cursor": None,
+                "has_more": None
             }
         }
\ No newline at end of file
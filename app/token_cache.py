@@ -0,0 +1,160 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Dict, Any, Set, Tuple
+import hmac
+import threading
+import time
+
+from .models import User, UserRole
+from .config import settings
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Instantánea ligera del usuario autenticado, independiente de la sesión de BD"""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    role: UserRole
+    is_active: bool
+    created_at: Optional[datetime]
+    last_login: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        """Crear la instantánea a partir del modelo ORM"""
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            last_login=user.last_login
+        )
+
+class _CacheEntry:
+    """Entrada interna del caché de tokens"""
+    __slots__ = ("signing_input", "payload", "user", "expires_at")
+
+    def __init__(self, signing_input: str, payload: Dict[str, Any], user: CachedUser, expires_at: float):
+        self.signing_input = signing_input
+        self.payload = payload
+        self.user = user
+        self.expires_at = expires_at
+
+class TokenCache:
+    """
+    Caché LRU/TTL en proceso de tokens de acceso ya verificados.
+
+    La clave es la firma del JWT; cada entrada guarda además el resto del token
+    (header.payload) y se compara en cada acierto, de modo que no es posible
+    reutilizar una firma válida con otro contenido. Las entradas expiran en el
+    `exp` del token o tras `ttl_seconds`, lo que ocurra primero.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 300, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(token: str) -> Optional[Tuple[str, str]]:
+        """Separar el token en (header.payload, firma)"""
+        signing_input, sep, signature = token.rpartition(".")
+        if not sep or not signature:
+            return None
+        return signing_input, signature
+
+    def get(self, token: str) -> Optional[Tuple[Dict[str, Any], CachedUser]]:
+        """Obtener claims y usuario de un token cacheado, o None si no está o expiró"""
+        if not self.enabled:
+            return None
+
+        parts = self._split(token)
+        if parts is None:
+            return None
+        signing_input, signature = parts
+
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry.expires_at <= time.time() or not hmac.compare_digest(entry.signing_input, signing_input):
+                self._remove(signature)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry.payload, entry.user
+
+    def set(self, token: str, payload: Dict[str, Any], user: CachedUser) -> None:
+        """Guardar un token verificado junto con la instantánea del usuario"""
+        if not self.enabled or self.max_size <= 0:
+            return
+
+        parts = self._split(token)
+        if parts is None:
+            return
+        signing_input, signature = parts
+
+        expires_at = time.time() + self.ttl_seconds
+        exp = payload.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        with self._lock:
+            if signature in self._entries:
+                self._remove(signature)
+
+            self._entries[signature] = _CacheEntry(signing_input, payload, user, expires_at)
+            self._by_user.setdefault(user.id, set()).add(signature)
+
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Eliminar todas las entradas de un usuario. Devuelve cuántas se eliminaron"""
+        with self._lock:
+            signatures = self._by_user.pop(user_id, set())
+            for signature in signatures:
+                self._entries.pop(signature, None)
+            return len(signatures)
+
+    def clear(self) -> None:
+        """Vaciar el caché"""
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, signature: str) -> None:
+        """Eliminar una entrada (se asume el lock adquirido)"""
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        signatures = self._by_user.get(entry.user.id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry.user.id]
+
+# Instancia global del caché de tokens verificados
+token_cache = TokenCache(
+    max_size=settings.token_cache_max_size,
+    ttl_seconds=settings.token_cache_ttl_seconds,
+    enabled=settings.token_cache_enabled
+)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import User
+
+class TokenDenylist:
+    """
+    Mapa en memoria user_id -> generación de tokens vigente.
+
+    Cada access token lleva la generación del usuario en el claim `gen`; al
+    cerrar sesión la generación se incrementa en la base de datos y cualquier
+    token con una generación menor queda revocado. La comprobación por petición
+    es una búsqueda O(1) en un dict y el mapa se sincroniza de forma incremental
+    usando users.tokens_revoked_at como marca de agua.
+    """
+
+    # Margen para tolerar pequeñas diferencias de reloj entre workers
+    SYNC_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self):
+        self._generations: Dict[int, int] = {}
+        self._watermark: Optional[datetime] = None
+
+    def is_revoked(self, user_id: int, generation: int) -> bool:
+        """Indica si un token de la generación dada ya fue revocado"""
+        return self._generations.get(user_id, 0) > generation
+
+    def current_generation(self, user_id: int) -> int:
+        """Generación vigente conocida para el usuario"""
+        return self._generations.get(user_id, 0)
+
+    def update(self, user_id: int, generation: int) -> None:
+        """Registrar una generación (solo avanza, nunca retrocede)"""
+        if generation > self._generations.get(user_id, 0):
+            self._generations[user_id] = generation
+
+    def __len__(self) -> int:
+        return len(self._generations)
+
+    async def sync(self, db: AsyncSession) -> int:
+        """Traer de la base de datos las generaciones cambiadas desde la última sincronización"""
+        query = select(User.id, User.token_generation, User.tokens_revoked_at).where(
+            User.tokens_revoked_at.isnot(None)
+        )
+        if self._watermark is not None:
+            query = query.where(User.tokens_revoked_at >= self._watermark - self.SYNC_OVERLAP)
+
+        rows = (await db.execute(query)).all()
+        for user_id, generation, revoked_at in rows:
+            self.update(user_id, generation)
+            if self._watermark is None or revoked_at > self._watermark:
+                self._watermark = revoked_at
+
+        return len(rows)
+
+# Instancia global del mapa de revocación
+token_denylist = TokenDenylist()
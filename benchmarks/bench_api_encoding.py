@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la codificación de regiones para la API de visión
+
+Compara, sobre las regiones de respaldo de samples/, el PNG a resolución
+completa que se enviaba antes con la codificación compacta de
+region_encoding.py: bytes, tamaño, tokens, tiempo de codificación y si la
+imagen enviada sigue siendo legible para el decodificador local. Con --stub
+además envía ambas versiones al servidor simulado y mide tokens facturados y
+latencia por consulta.
+
+Uso:
+  python benchmarks/bench_api_encoding.py
+  python benchmarks/bench_api_encoding.py --samples samples/t1/back --stub --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+from pyzbar import pyzbar
+
+from app.extraction.qr_extractor_pro import QRExtractorPro, DEFAULT_EXTENSIONS
+from app.extraction.region_encoding import encode_region
+from app.extraction.strategies import QR_SYMBOLS, template_from_path
+from app.extraction.vision_client import VisionClient
+from vision_stub_server import image_tokens
+
+def load_regions(directory: str):
+    extractor = QRExtractorPro(api_key="bench")
+    regions = []
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() not in DEFAULT_EXTENSIONS:
+            continue
+        image = cv2.imread(str(path))
+        if image is not None:
+            regions.append(extractor.fallback_region(image, template_from_path(str(path))))
+    return extractor, regions
+
+def encode_raw(region: np.ndarray):
+    """Codificación anterior: PNG a resolución completa"""
+    _, buffer = cv2.imencode('.png', region)
+    return buffer.tobytes(), "image/png"
+
+def readable(extractor: QRExtractorPro, data: bytes) -> bool:
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    return any(
+        extractor.is_valid_ine_qr(qr.data.decode('utf-8', 'replace'))
+        for qr in pyzbar.decode(image, symbols=QR_SYMBOLS)
+    )
+
+async def send(payloads, port: int, detail: str):
+    client = VisionClient("bench", base_url=f"http://127.0.0.1:{port}/v1", rate_per_second=0, image_detail=detail)
+    answers = await asyncio.gather(*(client.ask(data, mime) for data, mime in payloads))
+    await client.aclose()
+    return answers
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la codificación de regiones para la API")
+    parser.add_argument("--samples", default="samples", help="Directorio con imágenes")
+    parser.add_argument("--stub", action="store_true", help="Enviar también al servidor simulado")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--port", type=int, default=8097)
+    args = parser.parse_args()
+
+    extractor, regions = load_regions(args.samples)
+    if not regions:
+        parser.error(f"No hay imágenes en {args.samples}")
+
+    variants = {}
+    for name, encode, detail in (("png_completo", encode_raw, "auto"), ("compacta", None, "low")):
+        started = time.perf_counter()
+        if encode is None:
+            encoded = [encode_region(region) for region in regions]
+            payloads = [(e.data, e.mime) for e in encoded]
+            sizes = [(e.width, e.height) for e in encoded]
+        else:
+            payloads = [encode(region) for region in regions]
+            sizes = [(region.shape[1], region.shape[0]) for region in regions]
+        elapsed = time.perf_counter() - started
+        variants[name] = {
+            "payloads": payloads,
+            "detail": detail,
+            "bytes": statistics.mean(len(data) for data, _ in payloads),
+            "side": statistics.mean(max(size) for size in sizes),
+            "tokens": statistics.mean(image_tokens(w, h, detail) for w, h in sizes),
+            "legibles": sum(readable(extractor, data) for data, _ in payloads),
+            "ms": elapsed / len(regions) * 1000,
+        }
+
+    print(f"Regiones: {len(regions)}")
+    print(f"{'variante':<14} {'KiB':>8} {'lado px':>8} {'tokens':>7} {'legibles':>9} {'ms/región':>10}")
+    for name, v in variants.items():
+        print(f"{name:<14} {v['bytes'] / 1024:>8.1f} {v['side']:>8.0f} {v['tokens']:>7.0f} "
+              f"{v['legibles']:>9} {v['ms']:>10.2f}")
+
+    if args.stub:
+        from bench_vision_batching import start_stub
+        server = start_stub(args.port, args.latency_ms)
+        print(f"\n{'variante':<14} {'tokens/img':>11} {'latencia ms':>12}")
+        for name, v in variants.items():
+            answers = asyncio.run(send(v["payloads"], args.port, v["detail"]))
+            print(f"{name:<14} {statistics.mean(a.tokens for a in answers):>11.0f} "
+                  f"{statistics.mean(a.latency for a in answers) * 1000:>12.0f}")
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de construcción de AuthService por petición
+
+Compara el esquema anterior (un CryptContext nuevo por cada AuthService) con el
+actual (contexto compartido a nivel de módulo y servicio ligero por petición),
+tanto en un bucle simple como bajo carga sostenida con varios hilos.
+
+Uso:
+  python benchmarks/bench_auth_service.py
+  python benchmarks/bench_auth_service.py --duration 10 --threads 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from passlib.context import CryptContext
+
+from app.auth_service import AuthService
+from app.password_hasher import pwd_context, warm_up_crypto
+
+class LegacyAuthService(AuthService):
+    """Réplica del comportamiento anterior: CryptContext nuevo en cada instancia"""
+    __slots__ = ("pwd_context",)
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return self.pwd_context.verify(plain_password, hashed_password)
+
+def per_request_cost(factory, iterations: int) -> float:
+    """Tiempo medio (µs) de crear el servicio de una petición"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        factory(None)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def sustained_throughput(factory, verify, duration: float, threads: int, hashed: str, verify_every: int) -> float:
+    """
+    Peticiones por segundo construyendo el servicio y verificando contraseña
+    cada N peticiones con verify(service, contraseña, hash)
+    """
+    deadline = time.perf_counter() + duration
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            service = factory(None)
+            if verify_every and count % verify_every == 0:
+                verify(service, "admin123", hashed)
+            count += 1
+        return count
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(f.result() for f in [executor.submit(worker) for _ in range(threads)])
+
+    return total / duration
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de AuthService por petición")
+    parser.add_argument("--iterations", type=int, default=5000, help="Iteraciones del bucle simple")
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos de carga sostenida por variante")
+    parser.add_argument("--threads", type=int, default=4, help="Hilos concurrentes en carga sostenida")
+    parser.add_argument("--verify-every", type=int, default=50,
+                        help="Verificar contraseña cada N peticiones (0 = nunca)")
+    args = parser.parse_args()
+
+    warm_up_crypto()
+    hashed = pwd_context.hash("admin123")
+
+    print("=" * 60)
+    print("COSTO POR PETICIÓN (construcción del servicio)")
+    print("=" * 60)
+    legacy_us = per_request_cost(LegacyAuthService, args.iterations)
+    shared_us = per_request_cost(AuthService, args.iterations)
+    print(f"Anterior (CryptContext por petición): {legacy_us:10.2f} µs")
+    print(f"Actual (contexto compartido):         {shared_us:10.2f} µs")
+    print(f"Ahorro por petición:                  {legacy_us - shared_us:10.2f} µs")
+
+    print("\n" + "=" * 60)
+    print(f"CARGA SOSTENIDA ({args.threads} hilos, {args.duration:.0f}s, BCRYPT_ROUNDS={os.environ['BCRYPT_ROUNDS']})")
+    print("=" * 60)
+    legacy_rps = sustained_throughput(LegacyAuthService, lambda service, *args: service.verify_password(*args),
+                                      args.duration, args.threads, hashed, args.verify_every)
+    # AuthService no verifica por sí mismo: el pool de bcrypt usa el contexto compartido
+    shared_rps = sustained_throughput(AuthService, lambda service, *args: pwd_context.verify(*args),
+                                      args.duration, args.threads, hashed, args.verify_every)
+    print(f"Anterior: {legacy_rps:12.0f} peticiones/s")
+    print(f"Actual:   {shared_rps:12.0f} peticiones/s")
+    if legacy_rps > 0:
+        print(f"Mejora:   {shared_rps / legacy_rps:12.2f}x")
+
+if __name__ == "__main__":
+    main()
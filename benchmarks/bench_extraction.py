@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Benchmark reproducible del extractor sobre samples/t1..t3
+
+Procesa cada imagen de samples/t1, t2 y t3 (anverso y reverso) con
+QRExtractorPro tal como lo hace el CLI, con la API de visión simulada en el
+mismo proceso (responde al instante una URL ficticia, sin red ni costo
+variable). Registra:
+
+- latencia por imagen (p50/p95/p99) y por grupo (t1/back, t2/front, ...)
+- tiempo, intentos y aciertos por estrategia (histograma de estrategias)
+- decodificaciones de pyzbar por imagen
+- imágenes por segundo, por segundo de CPU (un núcleo) y RSS máximo
+
+El resultado se guarda en JSON. Con --baseline se compara contra un JSON
+anterior y el proceso termina con código 1 si hay una regresión: menos
+aciertos, más decodificaciones o latencias/throughput peores que la
+tolerancia.
+
+El orden de las estrategias no se adapta durante la medición (el histograma
+solo registra), así que los aciertos y las decodificaciones son
+deterministas; OpenCV usa un solo hilo salvo que se indique --threads.
+
+Uso:
+  python benchmarks/bench_extraction.py --output base.json
+  python benchmarks/bench_extraction.py --baseline base.json --output actual.json
+  python benchmarks/bench_extraction.py --samples samples/t1 --repeat 5 --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from app.extraction.qr_extractor_pro import QRExtractorPro, DEFAULT_EXTENSIONS
+from app.extraction.strategies import StrategyHistogram, template_from_path
+from app.extraction.vision_client import BackgroundVisionClient, VisionAnswer, COST_PER_TOKEN
+
+FAKE_QR_URL = "http://qr.ine.mx/000000000000000000000000/20200101/P/000000"
+
+# Tokens de una imagen con detalle "low" (ver vision_stub_server.image_tokens)
+STUB_TOKENS = 85
+
+# Métricas comparadas con --baseline: (ruta en el JSON, mayor es mejor, tolerancia relativa)
+# None = se usa --tolerance; 0 = cualquier empeoramiento es regresión (métricas deterministas)
+COMPARED_METRICS = [
+    ("resumen.exitos_locales", True, 0),
+    ("resumen.decodificaciones_por_imagen", False, 0),
+    ("latencia_ms.p50", False, None),
+    ("latencia_ms.p95", False, None),
+    ("latencia_ms.p99", False, None),
+    ("throughput.imagenes_por_segundo_cpu", True, None),
+    ("memoria.rss_max_mib", False, None),
+]
+
+class StubVision(BackgroundVisionClient):
+    """Cliente de la API simulado: responde de inmediato, sin red"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def submit(self, image_bytes, mime="image/png", budget=None):
+        self.calls += 1
+        future = Future()
+        future.set_result(VisionAnswer(FAKE_QR_URL, STUB_TOKENS, STUB_TOKENS * COST_PER_TOKEN,
+                                       image_bytes=len(image_bytes)))
+        return future
+
+    def close(self):
+        pass
+
+def find_images(directories):
+    paths = []
+    for directory in directories:
+        paths.extend(
+            str(path) for path in sorted(Path(directory).rglob("*"))
+            if path.suffix.lower() in DEFAULT_EXTENSIONS and "mask" not in path.parts
+        )
+    return paths
+
+def group_of(path: str) -> str:
+    """Grupo de la imagen para el desglose, p. ej. "t1/back" """
+    template = template_from_path(path)
+    return template.replace("_", "/") if template else Path(path).parent.name
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def latency_summary(values):
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "media": round(statistics.mean(values), 2) if values else 0.0,
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB y macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_pass(extractor: QRExtractorPro, paths):
+    """(latencia ms, decodificaciones, resultado) de cada imagen en una pasada"""
+    measures = []
+    for path in paths:
+        passes_before = extractor.engine.decode_passes
+        started = time.perf_counter()
+        result = extractor.process_image(path)
+        elapsed = (time.perf_counter() - started) * 1000
+        measures.append((elapsed, extractor.engine.decode_passes - passes_before, result))
+    return measures
+
+def benchmark(paths, repeat: int, localize: bool, pyramid: bool):
+    vision = StubVision()
+    extractor = QRExtractorPro(api_key="bench", vision=vision, localize=localize, pyramid=pyramid)
+    # El histograma solo registra: el orden de las estrategias queda fijo durante la medición
+    histogram = StrategyHistogram()
+    histogram.MIN_IMAGES = sys.maxsize
+
+    # Calentamiento (máscaras de plantilla, inicialización de OpenCV), no se mide
+    run_pass(extractor, paths[:1])
+    extractor.set_histogram(histogram)
+    vision.calls = 0
+
+    best = None
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for _ in range(repeat):
+        measures = run_pass(extractor, paths)
+        # Por imagen se conserva la pasada más rápida (reduce el ruido del sistema)
+        best = measures if best is None else [min(a, b, key=lambda m: m[0]) for a, b in zip(best, measures)]
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    extractor.close()
+
+    latencies = [m[0] for m in best]
+    results = [m[2] for m in best]
+    processed = len(paths) * repeat
+
+    groups = defaultdict(list)
+    for path, (elapsed, passes, result) in zip(paths, best):
+        groups[group_of(path)].append((elapsed, passes, result))
+
+    strategies = {}
+    for template, entry in sorted(histogram.data.items()):
+        for method, counts in entry["estrategias"].items():
+            total = strategies.setdefault(method, {"intentos": 0, "aciertos": 0, "segundos": 0.0})
+            for key in ("intentos", "aciertos", "segundos"):
+                total[key] += counts[key]
+
+    methods = defaultdict(int)
+    for result in results:
+        methods[result["metodo"]] += 1
+
+    return {
+        "resumen": {
+            "imagenes": len(paths),
+            "exitos": sum(1 for r in results if r["status"] == "ÉXITO"),
+            "exitos_locales": sum(1 for r in results if r["metodo"].startswith("local_")),
+            "consultas_api": vision.calls // repeat,
+            "decodificaciones_por_imagen": round(sum(m[1] for m in best) / len(best), 2),
+            "metodos": dict(sorted(methods.items())),
+        },
+        "latencia_ms": latency_summary(latencies),
+        "throughput": {
+            "imagenes_por_segundo": round(processed / wall, 2),
+            # Segundos de CPU del proceso: imágenes por segundo de un núcleo
+            "imagenes_por_segundo_cpu": round(processed / cpu, 2) if cpu else None,
+        },
+        "memoria": {"rss_max_mib": peak_rss_mib()},
+        "estrategias": {
+            method: {
+                "intentos": counts["intentos"] // repeat,
+                "aciertos": counts["aciertos"] // repeat,
+                "ms_total": round(counts["segundos"] * 1000 / repeat, 1),
+                "ms_por_intento": round(counts["segundos"] * 1000 / counts["intentos"], 2) if counts["intentos"] else 0.0,
+            }
+            for method, counts in sorted(strategies.items(), key=lambda item: -item[1]["segundos"])
+        },
+        "grupos": {
+            group: {
+                "imagenes": len(items),
+                "exitos_locales": sum(1 for item in items if item[2]["metodo"].startswith("local_")),
+                "decodificaciones_por_imagen": round(sum(item[1] for item in items) / len(items), 2),
+                "latencia_ms": latency_summary([item[0] for item in items]),
+            }
+            for group, items in sorted(groups.items())
+        },
+        "imagenes": {
+            os.path.relpath(path): {"metodo": result["metodo"], "qr_url": result["qr_url"]}
+            for path, result in zip(paths, results)
+        },
+    }
+
+def lookup(report, dotted: str):
+    value = report
+    for key in dotted.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare(baseline, current, tolerance: float):
+    """Imprime la comparación y devuelve las regresiones encontradas"""
+    regressions = []
+    if baseline.get("parametros") != current.get("parametros"):
+        print(f"\n⚠️  Parámetros distintos a la línea base: {baseline.get('parametros')}")
+    print(f"\n{'métrica':<40} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for path, higher_is_better, metric_tolerance in COMPARED_METRICS:
+        before, after = lookup(baseline, path), lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        allowed = tolerance if metric_tolerance is None else metric_tolerance
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > allowed + 1e-9:
+            flag = "  REGRESIÓN"
+            regressions.append(path)
+        print(f"{path:<40} {before:>10} {after:>10} {change:>+8.1%}{flag}")
+
+    # Imágenes que antes se resolvían localmente y ahora no (o con otro QR)
+    changed = [
+        name for name, entry in baseline.get("imagenes", {}).items()
+        if name in current.get("imagenes", {}) and entry != current["imagenes"][name]
+    ]
+    if changed:
+        print(f"\nImágenes con resultado distinto: {len(changed)}")
+        for name in changed[:20]:
+            print(f"  {name}: {baseline['imagenes'][name]['metodo']} -> {current['imagenes'][name]['metodo']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reproducible del extractor de QR")
+    parser.add_argument("--samples", nargs="+", default=["samples/t1", "samples/t2", "samples/t3"])
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas (por imagen se reporta la más rápida)")
+    parser.add_argument("--threads", type=int, default=1, help="Hilos de OpenCV")
+    parser.add_argument("--no-localize", action="store_true")
+    parser.add_argument("--no-pyramid", action="store_true")
+    parser.add_argument("--output", help="JSON de resultados (por defecto bench_extraction_<fecha>.json)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Empeoramiento relativo tolerado en latencia, throughput y memoria")
+    args = parser.parse_args()
+
+    paths = find_images(args.samples)
+    if not paths:
+        parser.error(f"No hay imágenes en {' '.join(args.samples)}")
+    cv2.setNumThreads(args.threads)
+
+    print(f"Imágenes: {len(paths)}, pasadas: {args.repeat}")
+    report = {
+        "entorno": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_revision(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "nucleos": os.cpu_count(),
+            "hilos_opencv": args.threads,
+        },
+        "parametros": {
+            "samples": args.samples,
+            "repeat": args.repeat,
+            "localize": not args.no_localize,
+            "pyramid": not args.no_pyramid,
+        },
+        **benchmark(paths, args.repeat, not args.no_localize, not args.no_pyramid),
+    }
+
+    summary, latency = report["resumen"], report["latencia_ms"]
+    print(f"Éxitos locales: {summary['exitos_locales']}/{summary['imagenes']}, "
+          f"API simulada: {summary['consultas_api']}, "
+          f"decodificaciones/imagen: {summary['decodificaciones_por_imagen']}")
+    print(f"Latencia ms: p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}")
+    print(f"Imágenes/s: {report['throughput']['imagenes_por_segundo']} "
+          f"({report['throughput']['imagenes_por_segundo_cpu']} por segundo de CPU), "
+          f"RSS máximo: {report['memoria']['rss_max_mib']} MiB")
+
+    print(f"\n{'estrategia':<32} {'intentos':>9} {'aciertos':>9} {'ms total':>9} {'ms/intento':>11}")
+    for method, counts in report["estrategias"].items():
+        print(f"{method:<32} {counts['intentos']:>9} {counts['aciertos']:>9} "
+              f"{counts['ms_total']:>9.1f} {counts['ms_por_intento']:>11.2f}")
+
+    output = args.output or f"bench_extraction_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados: {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regresiones: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
+
+if __name__ == "__main__":
+    main()
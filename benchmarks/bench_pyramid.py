@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de decodificación por pirámide de escalas
+
+Para las imágenes de samples/t1..t3 mide la latencia y la tasa de éxito de
+cada nivel de la pirámide por separado (en los niveles reducidos solo se
+intentan la plantilla y los QR ubicados), del camino anterior (solo
+resolución completa) y del camino con pirámide (del nivel más reducido al
+completo, con salida temprana).
+
+Las muestras ya están normalizadas (790 px), donde la pirámide no aplica;
+con --upscale se amplían para simular fotos de teléfono de varios megapíxeles.
+
+Uso:
+  python benchmarks/bench_pyramid.py
+  python benchmarks/bench_pyramid.py --upscale 1 4 6 --samples samples/t1
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+
+from app.extraction.qr_extractor_pro import QRExtractorPro, DEFAULT_EXTENSIONS
+from app.extraction.strategies import ImagePlanes, PYRAMID_SCALES, template_from_path
+
+def load_images(directories):
+    images = []
+    for directory in directories:
+        for path in sorted(Path(directory).rglob("*")):
+            if path.suffix.lower() not in DEFAULT_EXTENSIONS:
+                continue
+            image = cv2.imread(str(path))
+            if image is not None:
+                images.append((template_from_path(str(path)), image))
+    return images
+
+def measure(images, run, repeat: int):
+    """(ms por imagen, imágenes con QR) de run(template, image) -> bool; el mejor de repeat pasadas"""
+    best = None
+    for _ in range(repeat):
+        times = []
+        hits = 0
+        for template, image in images:
+            started = time.perf_counter()
+            hits += bool(run(template, image))
+            times.append((time.perf_counter() - started) * 1000)
+        best = min(best or (float("inf"), 0), (statistics.mean(times), hits))
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación por pirámide")
+    parser.add_argument("--samples", nargs="+", default=["samples/t1", "samples/t2", "samples/t3"])
+    parser.add_argument("--upscale", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=2, help="Pasadas por camino (se reporta la más rápida)")
+    args = parser.parse_args()
+
+    base = load_images(args.samples)
+    current = QRExtractorPro(pyramid=False).engine
+    pyramid = QRExtractorPro(pyramid=True).engine
+
+    for factor in args.upscale:
+        images = base
+        if factor != 1:
+            images = [
+                (template, cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC))
+                for template, image in base
+            ]
+        height, width = images[0][1].shape[:2]
+        print(f"\nAmpliación x{factor:g} ({width}x{height} px, {len(images)} imágenes)")
+        print(f"{'camino':<22} {'ms/imagen':>10} {'con QR':>7}")
+
+        for scale in sorted(PYRAMID_SCALES) + [1.0]:
+            def run_level(template, image, scale=scale):
+                level = ImagePlanes(image).scaled(scale)
+                return current.run_level(level, current.strategies_for(template), template or "general")
+            ms, hits = measure(images, run_level, args.repeat)
+            print(f"{'solo escala ' + format(scale, 'g'):<22} {ms:>10.1f} {hits:>7}")
+
+        ms, hits = measure(images, lambda template, image: current.run(image, template), args.repeat)
+        print(f"{'actual (completa)':<22} {ms:>10.1f} {hits:>7}")
+
+        levels = Counter()
+        def run_pyramid(template, image):
+            found = pyramid.run(image, template)
+            if found:
+                levels[pyramid.last_scale] += 1
+            return found
+        ms, hits = measure(images, run_pyramid, args.repeat)
+        print(f"{'pirámide':<22} {ms:>10.1f} {hits:>7}   "
+              + ", ".join(f"escala {scale:g}: {count // args.repeat}" for scale, count in sorted(levels.items())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark de agrupación de consultas a la API de visión
+
+Envía las mismas regiones de respaldo (las que el extractor mandaría a la API
+para las imágenes de samples/) al servidor simulado con distintos tamaños de
+grupo, y compara solicitudes, tokens por imagen y tiempo total.
+
+Uso:
+  python benchmarks/bench_vision_batching.py
+  python benchmarks/bench_vision_batching.py --samples samples/t1/back --batch-sizes 1 4 8 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import uvicorn
+
+from app.extraction.qr_extractor_pro import QRExtractorPro, DEFAULT_EXTENSIONS
+from app.extraction.strategies import template_from_path
+from app.extraction.vision_client import VisionClient
+import vision_stub_server
+
+def load_regions(directory: str, limit: int):
+    """Regiones codificadas que el extractor enviaría a la API"""
+    extractor = QRExtractorPro(api_key="bench")
+    regions = []
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() not in DEFAULT_EXTENSIONS:
+            continue
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        regions.append(extractor.encode_for_api(extractor.fallback_region(image, template_from_path(str(path)))))
+        if len(regions) >= limit:
+            break
+    return regions
+
+def start_stub(port: int, latency_ms: float) -> uvicorn.Server:
+    vision_stub_server.app.state.latency_ms = latency_ms
+    server = uvicorn.Server(uvicorn.Config(vision_stub_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run(regions, port: int, batch_size: int, concurrency: int):
+    client = VisionClient(
+        "bench",
+        base_url=f"http://127.0.0.1:{port}/v1",
+        max_concurrency=concurrency,
+        rate_per_second=0,
+        batch_size=batch_size,
+        batch_wait_ms=100
+    )
+    started = time.perf_counter()
+    answers = await asyncio.gather(*(client.ask(data, mime) for data, mime in regions))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return client.calls, sum(a.tokens for a in answers), sum(1 for a in answers if a.content), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de agrupación de consultas a la API")
+    parser.add_argument("--samples", default="samples", help="Directorio con imágenes")
+    parser.add_argument("--limit", type=int, default=64, help="Número de regiones a enviar")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--port", type=int, default=8098)
+    args = parser.parse_args()
+
+    regions = load_regions(args.samples, args.limit)
+    print(f"Regiones: {len(regions)} ({sum(len(d) for d, _ in regions) / max(1, len(regions)) / 1024:.1f} KiB promedio)")
+    server = start_stub(args.port, args.latency_ms)
+
+    print(f"{'grupo':>6} {'solicitudes':>12} {'tokens/imagen':>14} {'respuestas':>11} {'tiempo (s)':>11}")
+    for batch_size in args.batch_sizes:
+        calls, tokens, answered, elapsed = asyncio.run(run(regions, args.port, batch_size, args.concurrency))
+        print(f"{batch_size:>6} {calls:>12} {tokens / len(regions):>14.1f} {answered:>11} {elapsed:>11.2f}")
+
+    server.should_exit = True
+
+if __name__ == "__main__":
+    main()
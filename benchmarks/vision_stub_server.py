@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Servidor simulado de la API de visión (compatible con /v1/chat/completions)
+
+Permite probar y medir el cliente de respaldo sin consumir la API real:
+latencia configurable, respuestas 429 con Retry-After y conteo de tokens
+aproximado según el tamaño de la imagen. Si la imagen contiene un QR legible
+responde su contenido; si no, responde una URL de INE ficticia.
+
+Uso:
+  python benchmarks/vision_stub_server.py --port 8099 --latency-ms 800 --error-rate 0.1
+  OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8099/v1 \\
+      python -m app.extraction.qr_extractor_pro -d samples/t1/back
+
+GET /stats devuelve las solicitudes recibidas, los 429 enviados, los bytes de
+imagen recibidos y los tokens facturados.
+"""
+
+import argparse
+import asyncio
+import base64
+import math
+import random
+
+import cv2
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FAKE_QR_URL = "http://qr.ine.mx/000000000000000000000000/20200101/P/000000"
+
+app = FastAPI(title="Vision API stub")
+app.state.latency_ms = 0.0
+app.state.error_rate = 0.0
+app.state.stats = {"requests": 0, "rate_limited": 0, "image_bytes": 0, "tokens": 0, "images": 0}
+
+def image_tokens(width: int, height: int, detail: str = "auto") -> int:
+    """Aproximación del costo en tokens de una imagen (85 + 170 por bloque de 512 px; 85 con detalle "low")"""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return 85 + 170 * tiles
+
+def read_qr(data: bytes) -> str:
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return ""
+    try:
+        text, _, _ = cv2.QRCodeDetector().detectAndDecode(image)
+    except cv2.error:
+        text = ""
+    return text or FAKE_QR_URL
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats = app.state.stats
+    stats["requests"] += 1
+
+    if random.random() < app.state.error_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"Retry-After": "0.2"})
+
+    body = await request.json()
+    answers = []
+    tokens = 40  # Texto del prompt
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if part.get("type") != "image_url":
+                continue
+            data = base64.b64decode(part["image_url"]["url"].split(",", 1)[1])
+            stats["image_bytes"] += len(data)
+            stats["images"] += 1
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+            if image is not None:
+                tokens += image_tokens(image.shape[1], image.shape[0], part["image_url"].get("detail", "auto"))
+            answers.append(read_qr(data))
+
+    await asyncio.sleep(app.state.latency_ms / 1000)
+
+    content = answers[0] if len(answers) == 1 else "\n".join(f"{i + 1}: {a}" for i, a in enumerate(answers))
+    tokens += 20 * max(1, len(answers))
+    stats["tokens"] += tokens
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"total_tokens": tokens}
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return app.state.stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor simulado de la API de visión")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Latencia simulada por solicitud")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de solicitudes que responden 429")
+    args = parser.parse_args()
+
+    app.state.latency_ms = args.latency_ms
+    app.state.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,69 @@
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.responses import Response, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager, suppress
+from typing import Dict
+import asyncio
+import time
 import uvicorn
 
-from app.database import init_db, create_test_user
-from app.routers import auth, clients
+from app.database import ensure_schema, create_test_user, engine
+from app.routers import auth, clients, extraction
 from app.config import settings
+from app.password_hasher import password_hasher
+from app.extraction.worker_pool import extraction_pool
+from app.maintenance import refresh_token_sweeper, sync_token_denylist, token_denylist_syncer
+from app.metrics import metrics, MetricsMiddleware, register_app_gauges, CONTENT_TYPE
+from app.readiness import check_readiness
+
+@contextmanager
+def startup_phase(timings: Dict[str, float], phase: str):
+    """Medir una fase del arranque del worker (milisegundos)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round((time.perf_counter() - started) * 1000, 2)
 
 # Configuración del contexto de la aplicación
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Inicializar base de datos al arrancar
-    init_db()
-    # Crear usuario de prueba
-    create_test_user()
+    started = time.perf_counter()
+    timings = app.state.startup_ms = {}
+    # Pool dedicado para bcrypt (no bloquea el event loop)
+    with startup_phase(timings, "bcrypt"):
+        password_hasher.start()
+    # Marcador de versión del esquema; solo se migra si no está al día
+    with startup_phase(timings, "esquema"):
+        migrated = await ensure_schema()
+    # Usuario de prueba solo si este worker acaba de crear o migrar la base
+    # (desarrollo); en despliegues se crea con `python -m app.cli init-db --seed`
+    if migrated:
+        with startup_phase(timings, "usuario_prueba"):
+            await create_test_user()
+    # Estado inicial de revocaciones de access tokens
+    with startup_phase(timings, "revocaciones"):
+        await sync_token_denylist()
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    print("Arranque en {total} ms ({phases})".format(
+        total=timings["total"],
+        phases=", ".join(f"{phase} {ms}" for phase, ms in timings.items() if phase != "total")
+    ))
+    background_tasks = [asyncio.create_task(token_denylist_syncer())]
+    # Limpieza periódica de refresh tokens
+    if settings.refresh_token_sweep_interval_seconds > 0:
+        background_tasks.append(asyncio.create_task(refresh_token_sweeper()))
     yield
-    # Cleanup al cerrar (si es necesario)
+    # Cleanup al cerrar
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    password_hasher.shutdown()
+    extraction_pool.shutdown()
+    await extraction_pool.aclose()
+    await engine.dispose()
 
 # Crear instancia de FastAPI
 app = FastAPI(
@@ -37,9 +84,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por petición (latencia por ruta, peticiones en curso); se agrega al
+# final para que envuelva también a CORS
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    register_app_gauges(metrics)
+    metrics.gauge("startup_phase_seconds", "Duración de cada fase del arranque del worker",
+                  lambda: [({"phase": phase}, round(ms / 1000, 6)) for phase, ms in getattr(app.state, "startup_ms", {}).items()])
+
 # Incluir routers
 app.include_router(auth.router, prefix="/api/v1", tags=["Autenticación"])
 app.include_router(clients.router, prefix="/api/v1", tags=["Clientes"])
+app.include_router(extraction.router, prefix="/api/v1", tags=["Extracción"])
 
 # Endpoint de salud
 @app.get("/health", tags=["Sistema"])
@@ -47,6 +103,24 @@ async def health_check():
     """Endpoint para verificar el estado de la API"""
     return {"status": "ok", "message": "API funcionando correctamente"}
 
+# Disponibilidad para el balanceador: 503 si una dependencia está lenta o saturada
+@app.get("/ready", tags=["Sistema"])
+async def readiness_check():
+    """Verificar la base de datos (SELECT 1 con tiempo acotado), el pool de conexiones y las colas de trabajo"""
+    ready, details = await check_readiness()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=details
+    )
+
+# Métricas en formato de exposición de Prometheus
+@app.get("/metrics", tags=["Sistema"], include_in_schema=settings.metrics_enabled)
+async def metrics_endpoint():
+    """Métricas del proceso (latencia por ruta, pools de base de datos, bcrypt y extracción, cachés)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Métricas deshabilitadas")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
 # Endpoint raíz
 @app.get("/", tags=["Sistema"])
 async def root():
@@ -55,7 +129,8 @@ async def root():
         "message": "Atom OCR AI - API de Autenticación",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+"""Configuración de las pruebas: base de datos SQLite temporal y bcrypt rápido"""
+
+import os
+import tempfile
+
+# Antes de importar la aplicación: settings se lee al importar app.config
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("DEBUG", "false")
+# La base temporal se crea y se siembra (admin / admin123) al arrancar la aplicación
+os.environ.setdefault("DB_AUTO_MIGRATE", "true")
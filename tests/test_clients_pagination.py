@@ -0,0 +1,121 @@
+"""Listado de clientes paginado por cursor (created_at, id)"""
+
+import base64
+import sqlite3
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from main import app
+
+def login(client: TestClient, username: str, password: str) -> dict:
+    response = client.post("/api/v1/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def set_created_at(values: dict) -> None:
+    """Fijar created_at por id directamente en la base (CURRENT_TIMESTAMP solo tiene segundos)"""
+    with sqlite3.connect(make_url(settings.database_url).database) as conn:
+        conn.executemany("UPDATE clients SET created_at = ? WHERE id = ?",
+                         [(created_at, client_id) for client_id, created_at in values.items()])
+
+def list_page(client: TestClient, headers: dict, **params) -> dict:
+    response = client.get("/api/v1/clients", headers=headers, params={"pagination": "cursor", **params})
+    assert response.status_code == 200
+    return response.json()
+
+def walk(client: TestClient, headers: dict, limit: int) -> list:
+    """Recorrer todas las páginas siguiendo next_cursor"""
+    pages = [list_page(client, headers, limit=limit)]
+    while pages[-1]["has_more"]:
+        pages.append(list_page(client, headers, limit=limit, cursor=pages[-1]["next_cursor"]))
+    return pages
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def owner(client):
+    """Usuario propio de cada prueba: solo ve sus clientes"""
+    username = f"paginador_{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/v1/register", headers=login(client, "admin", "admin123"), json={
+        "username": username,
+        "email": f"{username}@ejemplo.com",
+        "password": "secreto123",
+        "role": "user"
+    })
+    assert response.status_code == 201
+    return login(client, username, "secreto123")
+
+def create_clients(client: TestClient, headers: dict, count: int) -> list:
+    ids = []
+    for number in range(count):
+        response = client.post("/api/v1/clients", headers=headers, json={"name": f"Cliente {number}"})
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    return ids
+
+def test_cursor_round_trip_visits_every_client_once(client, owner):
+    ids = create_clients(client, owner, 5)
+    set_created_at({client_id: f"2024-01-01 00:00:0{i}" for i, client_id in enumerate(ids)})
+
+    pages = walk(client, owner, limit=2)
+
+    assert [len(page["clients"]) for page in pages] == [2, 2, 1]
+    assert [item["id"] for page in pages for item in page["clients"]] == ids
+    assert all(page["has_more"] and page["next_cursor"] for page in pages[:-1])
+
+def test_ties_on_created_at_are_ordered_by_id(client, owner):
+    first, second, third, fourth, fifth = create_clients(client, owner, 5)
+    # Tres clientes con el mismo created_at, y el orden por fecha distinto del de creación
+    set_created_at({
+        first: "2024-01-01 00:00:02",
+        second: "2024-01-01 00:00:01",
+        third: "2024-01-01 00:00:01",
+        fourth: "2024-01-01 00:00:01",
+        fifth: "2024-01-01 00:00:00",
+    })
+
+    pages = walk(client, owner, limit=2)
+
+    assert [item["id"] for page in pages for item in page["clients"]] == [fifth, second, third, fourth, first]
+
+def test_last_page_has_no_cursor(client, owner):
+    ids = create_clients(client, owner, 3)
+
+    page = list_page(client, owner, limit=3)
+
+    assert [item["id"] for item in page["clients"]] == ids
+    assert page["has_more"] is False
+    assert page["next_cursor"] is None
+
+    page = list_page(client, owner, limit=2)
+    last = list_page(client, owner, limit=2, cursor=page["next_cursor"])
+    assert page["has_more"] is True
+    assert [item["id"] for item in last["clients"]] == ids[2:]
+    assert last["has_more"] is False
+    assert last["next_cursor"] is None
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-un-cursor",
+    base64.urlsafe_b64encode(b'{"x":1}').decode("ascii"),
+    base64.urlsafe_b64encode(b'{"c":"ayer","i":1}').decode("ascii"),
+])
+def test_invalid_cursor_is_rejected(client, owner, cursor):
+    response = client.get("/api/v1/clients", headers=owner, params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor de paginación inválido"
+
+def test_total_only_when_requested(client, owner):
+    create_clients(client, owner, 3)
+
+    assert list_page(client, owner, limit=2)["total"] is None
+    page = list_page(client, owner, limit=2, include_total=True)
+    assert page["total"] == 3
+    assert list_page(client, owner, limit=2, cursor=page["next_cursor"], include_total=True)["total"] == 3
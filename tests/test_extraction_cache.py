@@ -0,0 +1,73 @@
+"""Caché de resultados del extractor frente a respuestas de la API de visión"""
+
+import cv2
+import numpy as np
+import pytest
+
+from app.extraction.qr_extractor_pro import QRExtractorPro
+from app.extraction.result_cache import ResultCache
+from app.extraction.vision_client import VisionAnswer
+
+class StubVision:
+    """Cliente de la API simulado: siempre devuelve la misma respuesta"""
+
+    def __init__(self, answer: VisionAnswer):
+        self.answer = answer
+        self.calls = 0
+
+    def ask(self, image_bytes, mime="image/png", budget=None) -> VisionAnswer:
+        self.calls += 1
+        return self.answer
+
+    def close(self) -> None:
+        pass
+
+@pytest.fixture
+def blank_image() -> bytes:
+    """Imagen sin QR: las estrategias locales fallan y se consulta la API"""
+    ok, encoded = cv2.imencode(".png", np.full((490, 790, 3), 255, dtype=np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+def make_extractor(answer: VisionAnswer) -> QRExtractorPro:
+    return QRExtractorPro(api_key="test", cache=ResultCache(), vision=StubVision(answer))
+
+@pytest.mark.parametrize("answer, metodo", [
+    (VisionAnswer(None, 0, 0.0, error="sin_respuesta"), "api_error"),
+    (VisionAnswer(None, 0, 0.0, skipped="presupuesto"), "api_sin_presupuesto"),
+])
+def test_api_failure_is_not_cached(blank_image, answer, metodo):
+    extractor = make_extractor(answer)
+
+    first = extractor.process_bytes(blank_image, "reverso.png")
+    second = extractor.process_bytes(blank_image, "reverso.png")
+
+    assert first["status"] == "FALLO" and first["metodo"] == metodo
+    assert "cache" not in second
+    assert extractor.vision.calls == 2
+
+@pytest.mark.parametrize("answer", [
+    VisionAnswer(None, 0, 0.0, error="sin_respuesta"),
+    VisionAnswer(None, 0, 0.0, error="sin_linea"),
+    # Sin contenido para la imagen aunque no se haya marcado el error
+    VisionAnswer(None, 10, 0.0001),
+])
+def test_api_failure_is_not_cached_when_deferred(blank_image, answer):
+    extractor = make_extractor(answer)
+
+    pending = extractor.process_bytes(blank_image, "reverso.png", defer_api=True)
+    result = extractor.finish_fallback(pending, extractor.vision.ask(*pending["_fallback"]))
+    retry = extractor.process_bytes(blank_image, "reverso.png", defer_api=True)
+
+    assert result["metodo"] == "api_error"
+    assert "_fallback" in retry
+
+def test_api_answer_without_qr_is_cached(blank_image):
+    extractor = make_extractor(VisionAnswer("NINGUNO", 85, 0.0001, image_bytes=100))
+
+    first = extractor.process_bytes(blank_image, "reverso.png")
+    second = extractor.process_bytes(blank_image, "reverso.png")
+
+    assert first["status"] == "FALLO" and first["metodo"] == "ninguno"
+    assert second["cache"] is True and second["tokens"] == 0
+    assert extractor.vision.calls == 1
@@ -0,0 +1,47 @@
+"""Motor de estrategias: regiones fijas como respaldo cuando la ubicación falla"""
+
+import cv2
+import numpy as np
+import pytest
+
+from app.extraction.finder_patterns import localize
+from app.extraction.strategies import REGION_STRATEGIES, StrategyEngine
+
+QR_URL = "http://qr.ine.mx/P/1234567890123456789012345678"
+
+def small_qr_card() -> np.ndarray:
+    """
+    Tarjeta de 2800x1760 px con un QR de 3 px por módulo: se decodifica a
+    tamaño completo, pero en la copia de 1024 px sobre la que se ubica el QR
+    sus patrones de posición miden menos de MIN_FINDER_SIZE.
+    """
+    qr = cv2.QRCodeEncoder.create().encode(QR_URL)
+    qr = cv2.resize(qr, None, fx=3, fy=3, interpolation=cv2.INTER_NEAREST)
+    card = np.full((1760, 2800), 255, dtype=np.uint8)
+    height, width = qr.shape
+    card[1000:1000 + height, 2300:2300 + width] = qr
+    return cv2.cvtColor(card, cv2.COLOR_GRAY2BGR)
+
+def is_ine_qr(data: str) -> bool:
+    return data.startswith("http://qr.ine.mx/")
+
+def test_fixed_regions_decode_when_localization_misses():
+    card = small_qr_card()
+    assert localize(cv2.cvtColor(card, cv2.COLOR_BGR2GRAY)) == []
+
+    found = StrategyEngine(is_ine_qr).run(card)
+
+    assert found is not None
+    method, qr_url = found
+    assert qr_url == QR_URL
+    assert method in dict(REGION_STRATEGIES)
+
+@pytest.mark.parametrize("skip_unlocated, expected", [(False, QR_URL), (True, None)])
+def test_skip_unlocated_is_opt_in(skip_unlocated, expected):
+    engine = StrategyEngine(is_ine_qr, skip_unlocated=skip_unlocated)
+
+    found = engine.run(small_qr_card())
+
+    assert (found[1] if found else None) == expected
+    if skip_unlocated:
+        assert engine.decode_passes == 0
@@ -0,0 +1,96 @@
+"""Revocación de access tokens por generación (token_denylist)"""
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.config import settings
+from app.database import engine
+from app.token_denylist import TokenDenylist
+from main import app
+
+def login(client: TestClient, username: str, password: str) -> dict:
+    response = client.post("/api/v1/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def user(client):
+    """Usuario nuevo de cada prueba: (id, username)"""
+    username = f"revocable_{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/v1/register", headers=login(client, "admin", "admin123"), json={
+        "username": username,
+        "email": f"{username}@ejemplo.com",
+        "password": "secreto123",
+        "role": "user"
+    })
+    assert response.status_code == 201
+    return response.json()["id"], username
+
+def sync(denylist: TokenDenylist) -> int:
+    """Sincronizar como lo haría otro worker: motor y conexión propios"""
+    url = make_url(settings.database_url).set(drivername="sqlite+aiosqlite")
+
+    async def run() -> int:
+        worker_engine = create_async_engine(url)
+        try:
+            async with AsyncSession(worker_engine) as db:
+                return await denylist.sync(db)
+        finally:
+            await worker_engine.dispose()
+
+    return asyncio.run(run())
+
+def test_old_generation_is_rejected_without_database_query(client, user):
+    _, username = user
+    old = login(client, username, "secreto123")
+    assert client.get("/api/v1/userinfo", headers=old).status_code == 200
+    assert client.post("/api/v1/logout", headers=old).status_code == 200
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/api/v1/userinfo", headers=old)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revocado"
+    assert statements == []
+
+    # Un token emitido después del cierre de sesión lleva la nueva generación
+    assert client.get("/api/v1/userinfo", headers=login(client, username, "secreto123")).status_code == 200
+
+def test_sync_picks_up_revocations_from_another_worker(client, user):
+    user_id, username = user
+    # Mapa de otro worker, al día antes de que se cierre la sesión
+    denylist = TokenDenylist()
+    sync(denylist)
+    assert not denylist.is_revoked(user_id, 0)
+
+    assert client.post("/api/v1/logout", headers=login(client, username, "secreto123")).status_code == 200
+    assert sync(denylist) >= 1
+    assert denylist.is_revoked(user_id, 0)
+    assert denylist.current_generation(user_id) == 1
+    watermark = denylist._watermark
+
+    # La marca de agua avanza y la sincronización siguiente trae solo lo nuevo
+    assert client.post("/api/v1/logout", headers=login(client, username, "secreto123")).status_code == 200
+    sync(denylist)
+    assert denylist.is_revoked(user_id, 1)
+    assert denylist.current_generation(user_id) == 2
+    assert denylist._watermark > watermark
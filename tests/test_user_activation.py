@@ -0,0 +1,55 @@
+"""Activación y desactivación de usuarios por un administrador"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+def login(client: TestClient, username: str, password: str) -> dict:
+    response = client.post("/api/v1/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_deactivated_user_token_is_rejected(client):
+    admin = login(client, "admin", "admin123")
+    response = client.post("/api/v1/register", headers=admin, json={
+        "username": "desactivable",
+        "email": "desactivable@ejemplo.com",
+        "password": "secreto123",
+        "role": "user"
+    })
+    assert response.status_code == 201
+    user_id = response.json()["id"]
+
+    user = login(client, "desactivable", "secreto123")
+    # La primera petición deja el token en el caché de tokens verificados
+    assert client.get("/api/v1/userinfo", headers=user).status_code == 200
+
+    response = client.patch(f"/api/v1/users/{user_id}/active", headers=admin, json={"is_active": False})
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+
+    assert client.get("/api/v1/userinfo", headers=user).status_code == 401
+    assert client.post("/api/v1/login", json={"username": "desactivable", "password": "secreto123"}).status_code == 401
+
+def test_only_admins_change_user_state(client):
+    admin = login(client, "admin", "admin123")
+    response = client.post("/api/v1/register", headers=admin, json={
+        "username": "sin_privilegios",
+        "email": "sin_privilegios@ejemplo.com",
+        "password": "secreto123",
+        "role": "user"
+    })
+    user = login(client, "sin_privilegios", "secreto123")
+
+    response = client.patch("/api/v1/users/1/active", headers=user, json={"is_active": False})
+    assert response.status_code == 403
+    response = client.patch("/api/v1/users/1/active", headers=admin, json={"is_active": False})
+    assert response.status_code == 400
+    response = client.patch("/api/v1/users/9999/active", headers=admin, json={"is_active": True})
+    assert response.status_code == 404
@@ -0,0 +1,58 @@
+"""Respuestas agrupadas de la API de visión"""
+
+import asyncio
+
+import pytest
+
+from app.extraction.vision_client import VisionClient
+
+URL = "http://qr.ine.mx/000000000000000000000000/20200101/P/000000"
+
+@pytest.mark.parametrize("content, expected", [
+    (f"1: {URL}\n2: NINGUNO\n3: {URL}", [URL, "NINGUNO", URL]),
+    (f"1: {URL}\n3: {URL}", [URL, None, URL]),
+    (f"**1:** {URL}\n**2:** `{URL}`\n- Imagen 3: {URL}", [URL, URL, URL]),
+    (f"```\n1: {URL}\n2: {URL}\n3: {URL}\n```", [URL, URL, URL]),
+    ("No puedo leer las imágenes.", [None, None, None]),
+])
+def test_parse_batch_content(content, expected):
+    assert VisionClient.parse_content(content, 3) == expected
+
+def test_parse_single_content():
+    assert VisionClient.parse_content(f"`{URL}`\n", 1) == [URL]
+    assert VisionClient.parse_content("  ", 1) == [None]
+
+class ScriptedClient(VisionClient):
+    """Cliente sin red: responde según el número de imágenes de cada solicitud"""
+
+    def __init__(self, batch_reply: str, single_reply: str):
+        super().__init__("test", batch_size=3)
+        self.replies = {3: batch_reply, 1: single_reply}
+        self.requests = []
+
+    async def post(self, payload):
+        count = sum(1 for part in payload["messages"][0]["content"] if part["type"] == "image_url")
+        self.requests.append(count)
+        return {"choices": [{"message": {"content": self.replies[count]}}], "usage": {"total_tokens": 30}}, 0.1
+
+def images():
+    return [(bytes([i]), "image/png") for i in range(3)]
+
+def test_missing_line_is_asked_again_alone():
+    client = ScriptedClient(f"1: {URL}\n3: {URL}", "NINGUNO")
+
+    answers = asyncio.run(client.request(images()))
+
+    assert client.requests == [3, 1]
+    assert [answer.content for answer in answers] == [URL, "NINGUNO", URL]
+    assert all(answer.error is None for answer in answers)
+    # La imagen repetida acumula su parte del grupo y la solicitud individual
+    assert answers[1].tokens == 40
+
+def test_missing_line_without_answer_is_an_error():
+    client = ScriptedClient(f"1: {URL}\n3: {URL}", "")
+
+    answers = asyncio.run(client.request(images()))
+
+    assert answers[1].content is None
+    assert answers[1].error == "sin_linea"
@@ -0,0 +1,38 @@
+"""Pool de procesos de extracción: recuperación cuando un worker muere"""
+
+import asyncio
+import os
+import signal
+
+import cv2
+import numpy as np
+
+from app.extraction.worker_pool import ExtractionPool
+
+def blank_png() -> bytes:
+    ok, encoded = cv2.imencode(".png", np.full((100, 100, 3), 255, dtype=np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+def test_pool_is_recreated_after_a_worker_dies():
+    pool = ExtractionPool(workers=1)
+    data = blank_png()
+
+    async def scenario():
+        first = await pool.extract("a.png", data, use_api=False)
+        # Simular un OOM o un segfault en zbar/cv2
+        for pid in list(pool._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        await asyncio.sleep(0.5)
+        following = [await pool.extract(f"{name}.png", data, use_api=False) for name in "bcd"]
+        return first, following
+
+    try:
+        first, following = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert first["status"] == "FALLO"
+    assert [result["status"] for result in following] == ["FALLO"] * 3
+    assert pool.restarts == 1
+    assert pool.failed == 0